@@ -1,44 +1,147 @@
-from typing import Dict, List, Any
-from app.schemas.document_schemas import ResearchState
-from app.core.config import get_settings
+from typing import Dict, List, Any, Optional, Set, Tuple
+from collections import OrderedDict
+import asyncio
+import threading
+from app.schemas.document_schemas import ResearchState, ScrapedPage
+from app.core.llm import get_llm
+from app.utils.llm_cache import llm_cache_bypass
 
 # LLM and Tool Imports
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.tools import DuckDuckGoSearchRun
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from duckduckgo_search import DDGS
-import time
-import asyncio
+from langchain_core.runnables import RunnableConfig
 
-settings = get_settings()
+from app.agents.scrapping_agent_nodes import SearchHitScraper
+from app.core.config import get_settings
+from app.core.jobs import raises_node_errors
+from app.core.log import get_logger
+from app.core.metrics import CACHE_REQUESTS, RESEARCH_ITERATIONS, RESEARCH_NEW_TOKENS
+from app.tools.http_client import get_http_client
+from app.tools.search_cache import normalize_query
+from app.tools.search_executor import get_search_executor
+from app.tools.search_provider import SearchUnavailableError, is_rate_limit_result, is_rate_limit_signal
+from app.tools.web_search import NO_RESULTS_MESSAGE
+from app.utils.context_packing import SOURCE_TYPE_SEARCH, SOURCE_TYPE_SEARCH_PAGE
+from app.utils.dedup import NoveltyTracker
+from app.utils.local_index import get_local_index, index_documents
 
-llm = None
-if settings.GOOGLE_API_KEY and settings.GOOGLE_API_KEY != "API_KEY_PLACEHOLDER":
-    try:
-        llm = ChatGoogleGenerativeAI(
-            model=settings.DEFAULT_LLM_MODEL,
-            google_api_key=settings.GOOGLE_API_KEY,
-            temperature=0.3,
-            convert_system_message_to_human=True
-        )
+logger = get_logger("research")
 
-    except Exception as e:
-        print(f"Error initializing Google Generative AI LLM: {e}")
-        llm = None
-else:
-    print("GOOGLE_API_KEY not found.")
+# `source` of result sets answered from the cross-run local index instead of the web
+LOCAL_INDEX_SOURCE = "local_index"
+
+# `error_kind` of failed result sets where the search providers, not the query, were the problem
+SEARCH_ERROR_UNAVAILABLE = "search_unavailable"
+SEARCH_ERROR_RATE_LIMITED = "rate_limited"
+
+# Novelty trackers of recent runs, keyed by run id (the graph's thread id), least recently used first
+MAX_NOVELTY_TRACKERS = 128
+_novelty_trackers: "OrderedDict[str, NoveltyTracker]" = OrderedDict()
+_novelty_trackers_lock = threading.Lock()
+
+
+def completed_query_keys(search_queries_history: List[Dict[str, Any]]) -> Set[str]:
+    """Normalized queries that already returned results (queries that only errored may be retried)."""
+
+    return {
+        normalize_query(entry["query"])
+        for entry in search_queries_history
+        if entry.get("query") and "results_summary" in entry
+    }
+
+
+def usable_search_content(result: Dict[str, Any]) -> str:
+    """The snippet text of a search result set, or "" if it errored or found nothing."""
+
+    content_summary = result.get("content_summary") or ""
+    if result.get("error") or NO_RESULTS_MESSAGE.lower() in content_summary.lower():
+        return ""
+    return content_summary
+
+
+def search_local_index(queries: List[str], run_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Answers the queries the cross-run local index already covers (at least LOCAL_INDEX_MIN_HITS
+    documents contain every query term), leaving out documents run `run_id` indexed itself.
+    Returns those result sets, built from the matching snippets, and the queries that still
+    need a web search.
+    """
+
+    local_index = get_local_index()
+    if local_index is None:
+        return [], list(queries)
+
+    settings = get_settings()
+    local_results = []
+    remaining_queries = []
+    for query in queries:
+        hits = local_index.search(query, limit=settings.LOCAL_INDEX_MAX_HITS, exclude_run_id=run_id)
+        if len(hits) < settings.LOCAL_INDEX_MIN_HITS:
+            CACHE_REQUESTS.inc(cache="local_index", result="miss")
+            remaining_queries.append(query)
+            continue
+
+        CACHE_REQUESTS.inc(cache="local_index", result="hit")
+        local_results.append({
+            "query": query,
+            "content_summary": " ".join(hit["snippet"] for hit in hits),
+            "links": [],
+            "source": LOCAL_INDEX_SOURCE,
+            "local_sources": [hit["source"] for hit in hits],
+        })
+
+    return local_results, remaining_queries
+
+
+def _iteration_texts(results: List[Dict[str, Any]], pages: List[ScrapedPage]) -> List[str]:
+    return [usable_search_content(res) for res in results] + [page.extracted_text or "" for page in pages]
+
+
+def measure_new_tokens(
+    run_id: Optional[str],
+    previous_results: List[Dict[str, Any]],
+    previous_pages: List[ScrapedPage],
+    new_results: List[Dict[str, Any]],
+    new_pages: List[ScrapedPage],
+) -> int:
+    """
+    Estimates how many tokens of an iteration's search results and scraped pages are not
+    (near-)duplicates of earlier iterations' or of each other, i.e. the marginal content it added.
+    The run's novelty tracker already holds the earlier iterations, so only the new texts are
+    processed. A tracker that does not match the state (first iteration, a run resumed in
+    another process, a retried node) is rebuilt from the previous results.
+    """
+
+    with _novelty_trackers_lock:
+        tracker = _novelty_trackers.pop(run_id, None) if run_id else None
+
+    if tracker is None or (tracker.search_results_seen, tracker.pages_seen) != (len(previous_results), len(previous_pages)):
+        settings = get_settings()
+        tracker = NoveltyTracker(settings.DEDUP_SHINGLE_SIZE, settings.DEDUP_JACCARD_THRESHOLD)
+        tracker.add(_iteration_texts(previous_results, previous_pages))
+
+    new_tokens = tracker.add(_iteration_texts(new_results, new_pages))
+    tracker.search_results_seen = len(previous_results) + len(new_results)
+    tracker.pages_seen = len(previous_pages) + len(new_pages)
+
+    if run_id:
+        with _novelty_trackers_lock:
+            _novelty_trackers[run_id] = tracker
+            while len(_novelty_trackers) > MAX_NOVELTY_TRACKERS:
+                _novelty_trackers.popitem(last=False)
+    return new_tokens
 
-search_tool = DuckDuckGoSearchRun()
 
 # Node functions
-async def generate_search_queries_node(state: ResearchState) -> Dict[str, Any]:
+async def generate_search_queries_node(state: ResearchState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     Node to generate specific search queries based on the initial topic using an LLM.
     Now considers critique_feedback if present.
+    A failed LLM call is reported as an error state, or raised for job runs (see RAISE_NODE_ERRORS_CONFIG_KEY).
     """
     
     # Make sure LLM is initialized
+    llm = get_llm()
     if not llm:
         return {
             "status_message": "LLM not initialized; cannot generate search queries.",
@@ -65,6 +168,13 @@ async def generate_search_queries_node(state: ResearchState) -> Dict[str, Any]:
             "Avoid repeating previous failing query patterns."
         )
     
+    # Queries that already returned results are skipped by the search node, so ask for different ones
+    previous_queries = [entry["query"] for entry in state.search_queries_history if "results_summary" in entry]
+    if previous_queries:
+        prompt_text += (
+            "\n\nThese queries were already run; do not repeat or merely rephrase them:\n{previous_queries}"
+        )
+
     prompt = ChatPromptTemplate.from_messages([
         ("system", prompt_text),
         ("human", "Topic: {topic}")
@@ -74,7 +184,11 @@ async def generate_search_queries_node(state: ResearchState) -> Dict[str, Any]:
     query_generation_chain = prompt | llm | StrOutputParser()
 
     try:
-        generated_queries_str = await query_generation_chain.ainvoke({ "topic": initial_topic })
+        with llm_cache_bypass(state.bypass_llm_cache):
+            generated_queries_str = await query_generation_chain.ainvoke({
+                "topic": initial_topic,
+                "previous_queries": "\n".join(previous_queries)
+            })
 
         # Split the generated queries by newlines and strip whitespace
         generated_queries = [
@@ -91,7 +205,7 @@ async def generate_search_queries_node(state: ResearchState) -> Dict[str, Any]:
                 "is_information_sufficient": False
             }
     
-        print(f"\n\n--------------Generated Queries:\n{generated_queries_str}\n--------------\n\n")
+        logger.info("Generated search queries", extra={"query_count": len(generated_queries), "queries": generated_queries})
         
         return {
             "generated_search_queries": generated_queries,
@@ -100,7 +214,10 @@ async def generate_search_queries_node(state: ResearchState) -> Dict[str, Any]:
         }
     
     except Exception as e:
-        print(f"Error during search query generation: {e}")
+        if raises_node_errors(config):
+            # Transient (LLM/HTTP): the job run stops here and its retry runs the research phase again
+            raise RuntimeError(f"Search query generation failed: {e}") from e
+        logger.error("Error during search query generation: %s", e)
         return {
             "status_message": "Error generating search queries.",
             "error_message": str(e),
@@ -108,96 +225,190 @@ async def generate_search_queries_node(state: ResearchState) -> Dict[str, Any]:
         }
 
 
-async def perform_search_node(state: ResearchState) -> Dict[str, Any]:
+async def perform_search_node(state: ResearchState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     Node to perform web searches using DuckDuckGo for the generated queries.
-    Includes small delays to be gentler.
+    Queries run concurrently through the rate-limited search executor, and the top
+    result pages of each query are scraped into `scraped_content_from_search` meanwhile.
+    Results accumulate across iterations; queries that already returned results are skipped,
+    and queries the cross-run local index already covers are answered from it (unless
+    `bypass_local_index` is set). New results and scraped pages are added to that index
+    for later runs.
     """
     
     # Make sure we have generated search queries
     queries = state.generated_search_queries
     
     if not queries:
-        print("No search queries provided. Skipping search.")
+        logger.warning("No search queries provided. Skipping search.")
         return {
             "status_message": "No search queries to perform search.",
-            "raw_search_results": [],
             "error_message": "NO_SEARCH_QUERIES_PROVIDED"
         }
 
 
-    all_results = []
-    current_history = list(state.search_queries_history) 
-
-    for i, query in enumerate(queries):
-        if i > 0:
-            # wait a bit between queries to avoid hitting rate limits
-            await asyncio.sleep(4)
-
-        try:
-            # results = DDGS(timeout=20).text(
-            #     query,
-            #     max_results=10
-            # )
-            # print("\n\n\n\n\n results: \n")
-            # print(results)
-            # print("\n\n\n\n\n")
-
-            # query_results_str = "\n".join(
-            #     [f"{result['title']}: {result['body']}" for result in results if 'title' in result and 'body' in result]
-            # )
-            # if not query_results_str.strip():
-            #     query_results_str = "No good DuckDuckGo search result was found for this query."
-
-            # current_history.append({
-            #     "query": query,
-            #     "results_summary": query_results_str 
-            # })
-            # all_results.append({
-            #     "query": query,
-            #     "content_summary": query_results_str
-            # })
-
-            # Use the search tool perform the search
-            query_results_str = search_tool.invoke(query)
-            
-            # Create a summary of the results to store in the state
-            results_for_this_query = [{
-                "query": query,
-                "content_summary": query_results_str
-            }]
-            all_results.extend(results_for_this_query)
-            
-            current_history.append({
-                "query": query,
-                "results_summary": query_results_str 
-            })
-            
-        except Exception as e:
-            print(f"Error during search for query '{query}': {e}")
+    # Skip queries that (after normalization) already ran, or repeat within this batch
+    seen_queries = completed_query_keys(state.search_queries_history)
+    new_queries = []
+    skipped_queries = []
+    for query in queries:
+        query_key = normalize_query(query)
+        if query_key in seen_queries:
+            skipped_queries.append(query)
+            continue
+        seen_queries.add(query_key)
+        new_queries.append(query)
+
+    iteration_stats = {
+        "iteration": state.iteration_count,
+        "queries_run": len(new_queries),
+        "queries_skipped": len(skipped_queries),
+        "new_tokens": 0,
+    }
+
+    if not new_queries:
+        logger.info("All generated queries were already run. Skipping search.", extra={"skipped_queries": len(queries)})
+        return {
+            "search_iteration_stats": [iteration_stats],
+            "status_message": f"All {len(queries)} generated queries were already run; no new searches performed."
+        }
+
+    # Content earlier runs gathered answers some queries without any network work; this
+    # run's own documents are left out, as they hold no links to scrape and no new tokens
+    run_id = (config or {}).get("configurable", {}).get("thread_id")
+    local_results: List[Dict[str, Any]] = []
+    web_queries = new_queries
+    if not state.bypass_local_index:
+        local_results, web_queries = await asyncio.to_thread(search_local_index, new_queries, run_id)
+    iteration_stats["queries_answered_locally"] = len(local_results)
+
+    all_results = list(local_results)
+    new_history = [
+        {"query": res["query"], "results_summary": res["content_summary"], "source": LOCAL_INDEX_SOURCE}
+        for res in local_results
+    ]
+
+    # Top result URLs are scraped in the background as soon as each query's results arrive
+    settings = get_settings()
+    hit_scraper = None
+    if settings.SEARCH_HIT_SCRAPE_ENABLED and settings.SEARCH_HIT_SCRAPE_TOP_K > 0:
+        hit_scraper = SearchHitScraper(
+            get_http_client(),
+            already_fetched=state.reference_urls,
+            already_scraped=[page.url for page in state.scraped_content_from_search],
+            top_k=settings.SEARCH_HIT_SCRAPE_TOP_K,
+            max_concurrency=settings.SEARCH_HIT_SCRAPE_CONCURRENCY,
+            per_domain_concurrency=settings.SEARCH_HIT_SCRAPE_PER_DOMAIN_CONCURRENCY,
+            max_pages_per_domain=settings.SEARCH_HIT_SCRAPE_MAX_PAGES_PER_DOMAIN
+        )
+
+    # Run every query concurrently and handle each one as soon as it completes
+    outcomes = []
+    async for outcome in get_search_executor().iter_queries(web_queries):
+        outcomes.append(outcome)
+        if hit_scraper and "result" in outcome:
+            hit_scraper.submit(outcome["result"].get("links", []))
 
-            all_results.append({
+    # Keep results in the same order as the queries
+    outcomes.sort(key=lambda outcome: outcome["index"])
+
+    for outcome in outcomes:
+        query = outcome["query"]
+
+        if "error" in outcome:
+            e = outcome["error"]
+            logger.warning("Search failed for query %r: %s", query, e)
+
+            failed_result = {
                 "query": query,
                 "error": str(e),
                 "content_summary": f"Error searching for: {query}"
-            })
-            current_history.append({
+            }
+            if isinstance(e, SearchUnavailableError):
+                failed_result["error_kind"] = SEARCH_ERROR_UNAVAILABLE
+            elif is_rate_limit_signal(e):
+                failed_result["error_kind"] = SEARCH_ERROR_RATE_LIMITED
+            all_results.append(failed_result)
+            new_history.append({
                 "query": query,
                 "error": str(e)
             })
+            continue
 
-    print(f"\n\n\n\n------------------Search results: \n for {all_results} queries \n------------------\n")
+        query_results_str = outcome["result"]["content_summary"]
 
-    return {
-        "raw_search_results": all_results, 
-        "search_queries_history": current_history,
-        "status_message": f"Performed search for {len(queries)} queries. Found {len(all_results)} result sets."
+        # Create a summary of the results to store in the state
+        all_results.append({
+            "query": query,
+            "content_summary": query_results_str,
+            "links": outcome["result"].get("links", [])
+        })
+        
+        new_history.append({
+            "query": query,
+            "results_summary": query_results_str 
+        })
+
+    logger.info(
+        "Search completed",
+        extra={
+            "queries_run": len(web_queries),
+            "queries_answered_locally": len(local_results),
+            "queries_skipped": len(skipped_queries),
+            "result_sets": len(all_results),
+        }
+    )
+
+    # The list fields append (see `append_items`), so only the new items are returned
+    updates = {
+        "raw_search_results": all_results,
+        "search_queries_history": new_history,
+        "status_message": f"Performed search for {len(web_queries)} queries. Found {len(all_results)} result sets."
     }
+    if local_results:
+        updates["status_message"] += f" Answered {len(local_results)} queries from the local index."
+    if skipped_queries:
+        updates["status_message"] += f" Skipped {len(skipped_queries)} already-run queries."
+
+    scraped_pages = []
+    if hit_scraper:
+        scraped_pages = await hit_scraper.results()
+        if scraped_pages:
+            successful_scrapes = sum(1 for page in scraped_pages if not page.error)
+            updates["scraped_content_from_search"] = scraped_pages
+            updates["status_message"] += f" Scraped {successful_scrapes}/{len(scraped_pages)} top result pages."
+
+    # How much genuinely new content this iteration added, for the evaluator's early stop
+    iteration_stats["new_tokens"] = await asyncio.to_thread(
+        measure_new_tokens,
+        run_id,
+        state.raw_search_results,
+        state.scraped_content_from_search,
+        all_results,
+        scraped_pages
+    )
+    RESEARCH_NEW_TOKENS.inc(iteration_stats["new_tokens"])
+    updates["search_iteration_stats"] = [iteration_stats]
+
+    # Make this iteration's web content available to later runs
+    await index_documents(
+        [
+            {"source_type": SOURCE_TYPE_SEARCH, "source": res["query"], "title": res["query"], "text": usable_search_content(res)}
+            for res in all_results if res.get("source") != LOCAL_INDEX_SOURCE
+        ] + [
+            {"source_type": SOURCE_TYPE_SEARCH_PAGE, "source": page.url, "title": page.title, "text": page.extracted_text}
+            for page in scraped_pages if not page.error and page.extracted_text
+        ],
+        run_id
+    )
+
+    return updates
 
 async def evaluate_search_results_node(state: ResearchState) -> Dict[str, Any]:
     """
     Node to evaluate the quality and sufficiency of search results.
-    Decides if more searching is needed.
+    Decides if more searching is needed. Results accumulate across iterations, so the
+    loop also stops once an iteration adds too little new content to be worth repeating.
     """
     
     # Start evaluation details
@@ -236,7 +447,7 @@ async def evaluate_search_results_node(state: ResearchState) -> Dict[str, Any]:
                 problematic_queries_details.append(f"Query '{query}' found no good DDG results.")
                 is_problematic = True
 
-            elif "ratelimit" in content_summary or "202 ratelimit" in content_summary :
+            elif is_rate_limit_result(res_set.get("content_summary")):
                 problematic_queries_details.append(f"Query '{query}' hit a rate limit.")
                 is_problematic = True
             
@@ -247,10 +458,34 @@ async def evaluate_search_results_node(state: ResearchState) -> Dict[str, Any]:
             sufficient_results_found = True
             if problematic_queries_details:
                 pass
+        elif all(res_set.get("error_kind") in (SEARCH_ERROR_UNAVAILABLE, SEARCH_ERROR_RATE_LIMITED) for res_set in current_results):
+            # Every backend is throttled or switched off by its circuit breaker; new queries would fail the same way
+            feedback_for_requery += "Search providers are unavailable or rate-limited; proceeding without web results."
+            logger.warning("Stopping research: search providers are unavailable", extra={"iteration": search_iteration + 1})
+            sufficient_results_found = True
         else:
             feedback_for_requery += f"All queries resulted in no content, errors, or rate limits. Issues: {problematic_queries_details}. Consider rephrasing or broadening."
             sufficient_results_found = False
 
+    # Stop early when another round of searching is not adding new content
+    last_iteration_stats = state.search_iteration_stats[-1] if state.search_iteration_stats else None
+    min_new_tokens = get_settings().RESEARCH_MIN_NEW_TOKENS_PER_ITERATION
+    if (
+        not sufficient_results_found
+        and search_iteration >= 1
+        and last_iteration_stats is not None
+        and last_iteration_stats["new_tokens"] < min_new_tokens
+    ):
+        feedback_for_requery += (
+            f" The last iteration added only {last_iteration_stats['new_tokens']} new tokens, "
+            "proceeding with current results if any."
+        )
+        logger.info(
+            "Stopping research early: the last iteration added little new content",
+            extra={"iteration": search_iteration + 1, "new_tokens": last_iteration_stats["new_tokens"]}
+        )
+        sufficient_results_found = True
+
     # Check max iterations
     if search_iteration >= max_search_iters -1:
         if not sufficient_results_found:
@@ -267,14 +502,15 @@ async def evaluate_search_results_node(state: ResearchState) -> Dict[str, Any]:
 
     if not sufficient_results_found and search_iteration < max_search_iters -1 :
         updates["iteration_count"] = search_iteration + 1 
+        # Results are kept and accumulate; only the queries are regenerated
         updates["generated_search_queries"] = [] 
-        updates["raw_search_results"] = []
         
     else:
         # If we are stopping (either sufficient or max iterations reached),
         # ensure iteration_count reflects the final attempt count for clarity in state.
         updates["iteration_count"] = search_iteration + 1 
-        print(f"Evaluation: Search loop ending. Final iteration count: {search_iteration + 1}.")
+        logger.info("Research loop ending", extra={"iterations": search_iteration + 1})
+        RESEARCH_ITERATIONS.observe(search_iteration + 1)
 
 
     return updates
@@ -1,66 +1,213 @@
-from typing import Dict, List, Any
+from typing import Dict, Iterable, List, Any, Optional, Set
+from urllib.parse import urlsplit, urlunsplit
 import asyncio
+import time
 import httpx
-from bs4 import BeautifulSoup
+from langchain_core.runnables import RunnableConfig
 
 from app.schemas.document_schemas import ResearchState, ScrapedPage
+from app.core.config import get_settings
+from app.core.log import get_logger
+from app.core.metrics import CACHE_REQUESTS, HTTP_FETCH_BYTES, HTTP_FETCH_DURATION, HTTP_FETCH_ERRORS
+from app.tools.http_cache import CACHE_STATUS_HEADER, CachingHTTPClient, ContentTypeNotAllowedError, TRUNCATED_HEADER, media_type
+from app.tools.http_client import get_http_client
+from app.tools.html_extractor import PDF_CONTENT_TYPE, extract_html
+from app.utils.blob_store import get_blob_store
+from app.utils.context_packing import SOURCE_TYPE_REFERENCE
+from app.utils.local_index import index_documents
+
+HTML_CONTENT_TYPES = ["text/html", "application/xhtml+xml"]
+
+logger = get_logger("scraping")
+
 
 # Helper function to fetch and parse
-async def fetch_and_extract_content(url:str, client: httpx.AsyncClient) -> ScrapedPage:
-    """Fetches a single URL and extracts basic info"""
+async def fetch_and_extract_content(url:str, client: CachingHTTPClient, defer_extraction: bool = False) -> ScrapedPage:
+    """
+    Fetches a single URL (through the shared, cached client) and extracts basic info.
+    The body is streamed with a per-URL byte cap; non-HTML content types that are not
+    explicitly allowed are rejected before their body is downloaded.
+    With `defer_extraction` the raw body goes to the blob store and the returned page only
+    holds its key, for a later node to extract; otherwise the title and text are extracted
+    here and the body is dropped.
+    """
+
+    settings = get_settings()
 
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+        started_at = time.perf_counter()
         response = await client.get(
-            url, 
-            timeout = 20.0, 
-            headers = headers, 
-            follow_redirects = True
+            url,
+            max_bytes = settings.SCRAPER_MAX_BYTES_PER_URL,
+            allowed_content_types = HTML_CONTENT_TYPES + settings.SCRAPER_ALLOWED_EXTRA_CONTENT_TYPES
         )
+        cache_status = response.headers.get(CACHE_STATUS_HEADER, "MISS").lower()
+        HTTP_FETCH_DURATION.observe(time.perf_counter() - started_at, cache_status=cache_status)
+        HTTP_FETCH_BYTES.inc(len(response.content), cache_status=cache_status)
+        CACHE_REQUESTS.inc(cache="http", result=cache_status)
         response.raise_for_status()
         
-        raw_html = response.text
-        soup = BeautifulSoup(raw_html, "lxml")
-        
-        title_tag = soup.find("title")
-        title = title_tag.string.strip() if title_tag else "N/A"
-        
+        content_type = response.headers.get("content-type")
+        truncated = response.headers.get(TRUNCATED_HEADER) == "true"
+        if truncated:
+            logger.info("Page exceeded the size limit; content truncated", extra={"url": url, "max_bytes": settings.SCRAPER_MAX_BYTES_PER_URL})
+
+        raw_bytes = response.content
+        if truncated and media_type(content_type) == PDF_CONTENT_TYPE:
+            # A cut-off PDF is missing its cross-reference table and cannot be parsed
+            return ScrapedPage(
+                url = url,
+                content_type = content_type,
+                bytes_downloaded = len(raw_bytes),
+                truncated = True,
+                error = f"PDF larger than the {settings.SCRAPER_MAX_BYTES_PER_URL}-byte limit; not extracted"
+            )
+
+        if defer_extraction:
+            return ScrapedPage(
+                url = url,
+                content_ref = await get_blob_store().put_async(raw_bytes),
+                content_type = content_type,
+                bytes_downloaded = len(raw_bytes),
+                truncated = truncated
+            )
+
+        # Parse once, off the event loop, straight from the raw bytes
+        extracted = await extract_html(raw_bytes, content_type)
         return ScrapedPage(
             url = url, 
-            content = raw_html, 
-            title = title
+            title = extracted["title"],
+            extracted_text = extracted["text"],
+            content_type = content_type,
+            bytes_downloaded = len(raw_bytes),
+            truncated = truncated
+        )
+
+    except ContentTypeNotAllowedError as e:
+        HTTP_FETCH_ERRORS.inc(kind="content_type")
+        logger.info("Skipping page with unsupported content type", extra={"url": url, "content_type": e.content_type})
+        return ScrapedPage(
+            url = url,
+            content_type = e.content_type,
+            error = f"Unsupported Content-Type: {e.content_type}"
         )
 
     except httpx.HTTPStatusError as e:
-        print(f"Scraping Node: HTTP error fetching {url}: {e.response.status_code} - {e.response.reason_phrase}")
+        HTTP_FETCH_ERRORS.inc(kind="http_status")
+        logger.warning("HTTP error fetching page", extra={"url": url, "status_code": e.response.status_code})
         return ScrapedPage(
             url = url,
-            content = "",
             error = f"HTTP Error: {e.response.status_code} - {e.response.reason_phrase}"
         )
     
     except httpx.RequestError as e:
-        print(f"Scraping Node: Request error fetching {url}: {e}")
+        HTTP_FETCH_ERRORS.inc(kind="request")
+        logger.warning("Request error fetching %s: %s", url, e)
         return ScrapedPage(
             url = url, 
-            content = "", 
             error = f"Request Error: {e}"
         )
     
     except Exception as e:
-        print(f"Scraping Node: General error fetching {url}: {e}")
+        HTTP_FETCH_ERRORS.inc(kind="other")
+        logger.exception("Unexpected error fetching %s", url)
         return ScrapedPage(
             url = url, 
-            content = "", 
             error = f"General Error: {str(e)}"
         )
 
+def normalize_url(url: str) -> str:
+    """Normalizes a URL for de-duplication: lower-case scheme/host, no fragment, no trailing slash."""
+
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+class SearchHitScraper:
+    """
+    Scrapes the top result URLs of each search query in the background while the
+    remaining queries are still running.
+    URLs already fetched (or already requested) are skipped, and each domain gets both a
+    concurrency limit and a cap on how many of its pages are scraped per run. The scraper
+    lives for one research iteration, so `already_scraped` (search-hit pages earlier
+    iterations of the run scraped, taken from the state) counts toward the per-domain cap.
+    """
+
+    def __init__(
+        self,
+        client: CachingHTTPClient,
+        already_fetched: Iterable[str] = (),
+        already_scraped: Iterable[str] = (),
+        top_k: int = 3,
+        max_concurrency: int = 8,
+        per_domain_concurrency: int = 2,
+        max_pages_per_domain: int = 2,
+    ):
+        self.client = client
+        self.top_k = top_k
+        self.per_domain_concurrency = max(per_domain_concurrency, 1)
+        self.max_pages_per_domain = max_pages_per_domain
+
+        self._seen: Set[str] = {normalize_url(url) for url in already_fetched}
+        self._pages_per_domain: Dict[str, int] = {}
+        for url in already_scraped:
+            key = normalize_url(url)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            domain = urlsplit(key).netloc
+            self._pages_per_domain[domain] = self._pages_per_domain.get(domain, 0) + 1
+        self._domain_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+        self._tasks: List[asyncio.Task] = []
+
+    def _domain_semaphore(self, domain: str) -> asyncio.Semaphore:
+        if domain not in self._domain_semaphores:
+            self._domain_semaphores[domain] = asyncio.Semaphore(self.per_domain_concurrency)
+        return self._domain_semaphores[domain]
+
+    async def _scrape(self, url: str, domain: str) -> ScrapedPage:
+        async with self._semaphore, self._domain_semaphore(domain):
+            return await fetch_and_extract_content(url, self.client)
+
+    def submit(self, links: List[Dict[str, str]]) -> int:
+        """
+        Starts scraping the top-K new links of one query's results. Returns how many were scheduled.
+        """
+
+        scheduled = 0
+        for link in links:
+            if scheduled >= self.top_k:
+                break
+
+            url = link.get("url")
+            if not url or not url.startswith(("http://", "https://")):
+                continue
+            key = normalize_url(url)
+            domain = urlsplit(key).netloc
+            if key in self._seen or self._pages_per_domain.get(domain, 0) >= self.max_pages_per_domain:
+                continue
+
+            self._seen.add(key)
+            self._pages_per_domain[domain] = self._pages_per_domain.get(domain, 0) + 1
+            self._tasks.append(asyncio.create_task(self._scrape(url, domain)))
+            scheduled += 1
+        return scheduled
+
+    async def results(self) -> List[ScrapedPage]:
+        """Waits for every scheduled scrape and returns the pages in scheduling order."""
+
+        if not self._tasks:
+            return []
+        return list(await asyncio.gather(*self._tasks))
+
+
 async def scrape_reference_urls_node(state: ResearchState) -> Dict[str, Any]:
     """
     Node to scrape content from user-provided reference URLs.
-    Populates `scraped_content_from_references`.
+    Populates `scraped_content_from_references` with blob store references to the raw
+    bodies; their text is extracted by the next node.
     """
 
     urls_to_scrape = state.reference_urls
@@ -75,12 +222,12 @@ async def scrape_reference_urls_node(state: ResearchState) -> Dict[str, Any]:
     # Initialize a list to hold the scraped pages
     scraped_pages: List[ScrapedPage] = []
 
-    print(f"\n\nScraping Node: Starting to scrape \n\n{len(urls_to_scrape)} \nreference URLs...\n\n")
-    # Use an async HTTP client to fetch all URLs concurrently
-    async with httpx.AsyncClient() as client:
-        tasks = [fetch_and_extract_content(url, client) for url in urls_to_scrape]
-        results = await asyncio.gather(*tasks, return_exceptions=False)
-        scraped_pages.extend(results)
+    logger.info("Scraping reference URLs", extra={"url_count": len(urls_to_scrape)})
+    # Use the shared, pooled HTTP client to fetch all URLs concurrently
+    client = get_http_client()
+    tasks = [fetch_and_extract_content(url, client, defer_extraction=True) for url in urls_to_scrape]
+    results = await asyncio.gather(*tasks, return_exceptions=False)
+    scraped_pages.extend(results)
     
     
     successful_scrapes = sum(1 for page in scraped_pages if not page.error)
@@ -89,20 +236,26 @@ async def scrape_reference_urls_node(state: ResearchState) -> Dict[str, Any]:
     status_msg = f"Scraped {successful_scrapes}/{len(urls_to_scrape)} reference URLs."
     if failed_scrapes > 0:
         status_msg += f" {failed_scrapes} failed."
+    truncated_scrapes = sum(1 for page in scraped_pages if page.truncated)
+    if truncated_scrapes > 0:
+        status_msg += f" {truncated_scrapes} truncated at the size limit."
 
 
-    print(f"\n\n scrapped contnet \n{scraped_pages}\n\n")
+    logger.info(
+        status_msg,
+        extra={"pages": len(scraped_pages), "bytes": sum(page.bytes_downloaded or 0 for page in scraped_pages)}
+    )
     return {
         "scraped_content_from_references": scraped_pages,
-        "status_message": status_msg,
-        "error_message": None 
+        "status_message": status_msg
     }
 
-async def extract_text_from_scraped_content_node(state: ResearchState) -> Dict[str, Any]:
+async def extract_text_from_scraped_content_node(state: ResearchState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     Node to extract clean text from previously scraped HTML content.
-    Populates `extracted_text_from_references`.
-    Uses BeautifulSoup for basic text extraction. For articles, consider `trafilatura`.
+    Populates `extracted_text_from_references` and adds the texts to the cross-run local index.
+    Raw bodies are read back from the blob store and parsed concurrently in the extraction
+    pool (see `app.tools.html_extractor`).
     """
 
     scraped_data = state.scraped_content_from_references
@@ -114,44 +267,49 @@ async def extract_text_from_scraped_content_node(state: ResearchState) -> Dict[s
             "status_message": "No scraped content for text extraction."
         }
 
-    extracted_texts: List[Dict[str, str]] = []
-    
-    for page in scraped_data:
-        if page.error or not page.content:
-            extracted_texts.append({
+    async def extract_page(page: ScrapedPage) -> Dict[str, str]:
+        if page.error or not (page.content_ref or page.extracted_text):
+            return {
                 "url": page.url,
                 "extracted_text": "",
                 "title": page.title or "N/A",
                 "error": page.error or "No content to extract"
-            })
-            continue
+            }
 
         try:
-            soup = BeautifulSoup(page.content, "lxml")
-            
-            # Basic text extraction: get all text from the body
-            body = soup.find("body")
-            if body:
-                # Get text and join paragraphs. Replace multiple newlines/spaces.
-                page_text = ' '.join(body.get_text(separator=' ', strip=True).split())
+            # Pages from runs checkpointed before extraction was deferred already carry their text
+            if page.extracted_text is not None:
+                title, page_text = page.title, page.extracted_text
             else:
-                page_text = ' '.join(soup.get_text(separator=' ', strip=True).split())
+                raw_bytes = await get_blob_store().get_async(page.content_ref)
+                if raw_bytes is None:
+                    raise ValueError("Raw content is no longer in the blob store")
+                extracted = await extract_html(raw_bytes, page.content_type)
+                title, page_text = extracted["title"], extracted["text"]
 
-            extracted_texts.append({
+            return {
                 "url": page.url,
-                "title": page.title or "N/A",
+                "title": title or "N/A",
                 "extracted_text": page_text
-            })
+            }
             
         except Exception as e:
-            extracted_texts.append({
+            return {
                 "url": page.url,
                 "title": page.title or "N/A",
                 "extracted_text": "",
                 "error": f"Extraction error: {str(e)}"
-            })
+            }
+
+    extracted_texts: List[Dict[str, str]] = list(await asyncio.gather(*(extract_page(page) for page in scraped_data)))
 
     status_msg = f"Extracted text from {len(extracted_texts)} sources."
+
+    # Reference pages are added to the cross-run index that research consults before the web
+    await index_documents([
+        {"source_type": SOURCE_TYPE_REFERENCE, "source": text["url"], "title": text["title"], "text": text["extracted_text"]}
+        for text in extracted_texts if text["extracted_text"]
+    ], (config or {}).get("configurable", {}).get("thread_id"))
     
     return {
         "extracted_text_from_references": extracted_texts,
@@ -1,34 +1,196 @@
 from app.schemas.document_schemas import ResearchState
-from typing import Dict, List, Any
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
 
 from app.core.config import get_settings
+from app.core.jobs import raises_node_errors
+from app.core.llm import get_llm
+from app.core.log import get_logger
+from app.tools.html_extractor import run_in_extraction_pool
+from app.utils.context_packing import ContextChunk, batch_chunks, build_packed_context, format_packed_context, pack_chunks
+from app.utils.dedup import NearDuplicateFilter, deduplicate_texts, merge_dedup_stats
+from app.utils.llm_cache import llm_cache_bypass
+from app.utils.tokens import estimate_tokens
 
-settings = get_settings()
+logger = get_logger("synthesis")
 
-llm = None
-if settings.GOOGLE_API_KEY and settings.GOOGLE_API_KEY != "API_KEY_PLACEHOLDER":
-    try:
-        llm = ChatGoogleGenerativeAI(
-            model=settings.DEFAULT_LLM_MODEL,
-            google_api_key=settings.GOOGLE_API_KEY,
-            temperature=0.3,
-            convert_system_message_to_human=True
-        )
+# Tag of the final synthesis call; streaming clients forward only this call's tokens
+SYNTHESIS_STREAM_TAG = "synthesis_output"
 
-    except Exception as e:
-        print(f"Error initializing Google Generative AI LLM: {e}")
-        llm = None
-else:
-    print("GOOGLE_API_KEY not found.")
+# Run config key (under "configurable") set when a client streams the synthesis as it is written
+SYNTHESIS_STREAM_CONFIG_KEY = "stream_synthesis"
+
+SYNTHESIS_SYSTEM_PROMPT = (
+    "You are an expert research assistant and information synthesizer. "
+    "Your task is to review the provided information, which comes from web search snippets and content scraped from specific URLs. "
+    "Based on this information, create a comprehensive, coherent, and de-duplicated summary that is highly relevant to the 'Original Topic'. "
+    "Focus on extracting and organizing key facts, arguments, data points, and important concepts. "
+    "The goal is to produce a structured knowledge base that can be used by another AI to write a detailed document. "
+    "Do not add information that is not present in the provided texts. "
+    "If the provided information is contradictory, point it out. "
+    "Organize the output logically, perhaps using markdown for structure if appropriate (e.g., headings for different aspects of the topic if they emerge from the content)."
+)
+
+SYNTHESIS_HUMAN_PROMPT_TEMPLATE = (
+    "Original Topic: {topic}\n\n"
+    "Collected Information to Synthesize:\n"
+    "-------------------------------------\n"
+    "{context}\n"
+    "-------------------------------------\n\n"
+    "Please synthesize the above information thoroughly, keeping the original topic in mind. "
+    "Produce a clean, consolidated text. If no relevant information is found for the topic in the provided context, state that clearly."
+)
+
+MAP_SYSTEM_PROMPT = (
+    "You are an expert research assistant. You are given one batch out of a larger set of sources "
+    "(web search snippets and content scraped from specific URLs). "
+    "Extract every fact, argument, data point and important concept in this batch that is relevant to the 'Original Topic'. "
+    "Keep the source URL or query next to each point. "
+    "Do not add information that is not present in the provided texts. Be concise but do not drop relevant details."
+)
+
+MAP_HUMAN_PROMPT_TEMPLATE = (
+    "Original Topic: {topic}\n\n"
+    "Source Batch:\n"
+    "-------------------------------------\n"
+    "{context}\n"
+    "-------------------------------------\n\n"
+    "List the relevant information from this batch. If nothing in it is relevant to the topic, reply with 'NO RELEVANT INFORMATION'."
+)
+
+
+def deduplicate_sources(
+    search_results: List[Dict[str, Any]],
+    reference_texts: List[Dict[str, str]],
+    search_page_texts: List[Dict[str, str]],
+    shingle_size: int = 2,
+    threshold: float = 0.7,
+    max_units_per_text: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]], List[Dict[str, str]], Dict[str, int]]:
+    """
+    Drops duplicate and near-duplicate sentences across all sources before they reach the LLM.
+    Full pages (references, then scraped search results) are processed first so the fuller
+    text wins over overlapping search snippets.
+    Returns copies of the three lists with cleaned text, plus removal statistics.
+    Takes its settings as arguments so it can run in the extraction process pool.
+    """
 
+    dedup_filter = NearDuplicateFilter(shingle_size=shingle_size, threshold=threshold)
+
+    cleaned_reference_texts, reference_stats = deduplicate_texts(
+        [ref.get('extracted_text', '') for ref in reference_texts], dedup_filter, max_units_per_text
+    )
+    cleaned_page_texts, page_stats = deduplicate_texts(
+        [page.get('extracted_text', '') for page in search_page_texts], dedup_filter, max_units_per_text
+    )
+    cleaned_snippets, search_stats = deduplicate_texts(
+        [res.get('content_summary', '') for res in search_results], dedup_filter, max_units_per_text
+    )
+
+    deduped_references = [
+        {**ref, 'extracted_text': text} for ref, text in zip(reference_texts, cleaned_reference_texts)
+    ]
+    deduped_search_pages = [
+        {**page, 'extracted_text': text} for page, text in zip(search_page_texts, cleaned_page_texts)
+    ]
+    deduped_search_results = [
+        {**res, 'content_summary': text} for res, text in zip(search_results, cleaned_snippets)
+    ]
+    return (
+        deduped_search_results,
+        deduped_references,
+        deduped_search_pages,
+        merge_dedup_stats(reference_stats, page_stats, search_stats)
+    )
 
 
-async def synthesize_information_node(state: ResearchState) -> Dict[str, Any]:
+async def _map_summaries(llm, topic: str, contexts: List[str], max_concurrency: int) -> List[str]:
+    """
+    Runs the map prompt over every context concurrently, at most `max_concurrency` at a time.
+    Batches without relevant information are dropped.
+    """
+
+    map_chain = ChatPromptTemplate.from_messages([
+        ("system", MAP_SYSTEM_PROMPT),
+        ("human", MAP_HUMAN_PROMPT_TEMPLATE)
+    ]) | llm | StrOutputParser()
+
+    semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+
+    async def _summarize(context: str) -> str:
+        async with semaphore:
+            return await map_chain.ainvoke({"topic": topic, "context": context})
+
+    summaries = await asyncio.gather(*[_summarize(context) for context in contexts])
+    return [
+        summary.strip() for summary in summaries
+        if summary and summary.strip() and "NO RELEVANT INFORMATION" not in summary.upper()
+    ]
+
+
+async def map_reduce_context(llm, topic: str, chunks: List[ContextChunk]) -> Tuple[str, List[ContextChunk]]:
+    """
+    Map step of map-reduce synthesis: the most relevant chunks (up to SYNTHESIS_MAP_MAX_BATCHES
+    batches) are summarized per batch concurrently, and the summaries are collapsed again until
+    they fit the synthesis token budget. Returns the context for the final (reduce) call and
+    the chunks that were used.
+    """
+
+    settings = get_settings()
+    batch_tokens = settings.SYNTHESIS_MAP_BATCH_TOKENS
+
+    selected = pack_chunks(chunks, batch_tokens * settings.SYNTHESIS_MAP_MAX_BATCHES)
+    batches = batch_chunks(selected, batch_tokens)
+    logger.info("Map-reduce synthesis", extra={"chunks": len(selected), "batches": len(batches)})
+
+    summaries = await _map_summaries(
+        llm,
+        topic,
+        [format_packed_context(batch) for batch in batches],
+        settings.SYNTHESIS_MAP_CONCURRENCY
+    )
+
+    # Collapse summaries that still do not fit into the reduce prompt
+    for _ in range(settings.SYNTHESIS_MAP_MAX_COLLAPSE_ROUNDS):
+        if len(summaries) <= 1 or sum(estimate_tokens(summary) for summary in summaries) <= settings.SYNTHESIS_CONTEXT_TOKEN_BUDGET:
+            break
+
+        groups: List[List[str]] = [[]]
+        group_tokens = 0
+        for summary in summaries:
+            summary_tokens = estimate_tokens(summary)
+            if groups[-1] and group_tokens + summary_tokens > batch_tokens:
+                groups.append([])
+                group_tokens = 0
+            groups[-1].append(summary)
+            group_tokens += summary_tokens
+
+        summaries = await _map_summaries(
+            llm,
+            topic,
+            ["\n\n".join(group) for group in groups],
+            settings.SYNTHESIS_MAP_CONCURRENCY
+        )
+
+    context = "\n\n".join(
+        f"Partial Summary {index + 1}:\n{summary}" for index, summary in enumerate(summaries)
+    )
+    return context, selected
+
+
+async def synthesize_information_node(state: ResearchState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     Synthesizes information from web search results and scraped reference texts
     into a consolidated knowledge base.
+    The final LLM call is streamed only when a client is listening (SYNTHESIS_STREAM_CONFIG_KEY);
+    otherwise it is a regular call, which the LLM cache can answer.
+    A failed LLM call is reported as an error state, or raised for job runs (see RAISE_NODE_ERRORS_CONFIG_KEY).
     """
+    llm = get_llm()
     if not llm:
         return {
             "consolidated_information": "LLM not available for synthesis.",
@@ -41,101 +203,107 @@ async def synthesize_information_node(state: ResearchState) -> Dict[str, Any]:
     initial_topic = state.initial_topic
     search_results = state.raw_search_results
     reference_texts = state.extracted_text_from_references
+    search_page_texts = [
+        {"url": page.url, "title": page.title or "N/A", "extracted_text": page.extracted_text}
+        for page in state.scraped_content_from_search
+        if not page.error and page.extracted_text
+    ]
 
-    formatted_input_parts = []
-
-    if search_results:
-        search_snippets_text = "\n\n".join(
-            [
-                f"Source (Search Query: '{res.get('query', 'N/A')}'):\n{res.get('content_summary', 'No snippet available.')}"
-                for res in search_results if res.get('content_summary')
-            ]
-        )
-        if search_snippets_text.strip():
-            formatted_input_parts.append(
-                f"Information from Web Search Snippets: \n{search_snippets_text}"
-            )
-
-    if reference_texts:
-        scraped_content_text = "\n\n".join(
-            [
-                f"Source (Reference URL: {ref.get('url', 'N/A')}, Title: '{ref.get('title', 'N/A')}'):\n{ref.get('extracted_text', 'No text extracted.')}"
-                for ref in reference_texts if ref.get('extracted_text') 
-            ]
+    settings = get_settings()
+    dedup_stats: Dict[str, int] = {}
+    if settings.DEDUP_ENABLED:
+        # CPU-bound pure Python, so it runs in the extraction process pool rather than holding the GIL
+        search_results, reference_texts, search_page_texts, dedup_stats = await run_in_extraction_pool(
+            deduplicate_sources,
+            search_results,
+            reference_texts,
+            search_page_texts,
+            settings.DEDUP_SHINGLE_SIZE,
+            settings.DEDUP_JACCARD_THRESHOLD,
+            settings.DEDUP_MAX_UNITS_PER_TEXT or None
         )
-        if scraped_content_text.strip():
-            formatted_input_parts.append(
-                f"Information from Scraped Reference URLs: \n{scraped_content_text}"
-            )
+        logger.info("Near-duplicate sentences removed", extra=dedup_stats)
 
-    if not formatted_input_parts:
-        print("No relevant information found to synthesize.")
+    # Rank chunks of every source against the topic and pack the best ones into the token budget
+    packed = await asyncio.to_thread(
+        build_packed_context,
+        search_results,
+        reference_texts,
+        initial_topic,
+        settings.SYNTHESIS_CONTEXT_TOKEN_BUDGET,
+        settings.SYNTHESIS_CHUNK_TOKENS,
+        search_page_texts
+    )
+    context_chunks_used = [chunk.describe() for chunk in packed["selected_chunks"]]
+
+    if not packed["selected_chunks"]:
+        logger.warning("No relevant information found to synthesize.")
 
         return {
             "consolidated_information": "No information gathered from previous steps to synthesize.",
             "status_message": "Synthesis complete: No input information.",
+            "dedup_stats": dedup_stats,
+            "context_chunks_used": context_chunks_used
         }
 
-    full_context_for_llm = "\n\n".join(formatted_input_parts)
-    
-    # Limit the context length if necessary
-    if len(full_context_for_llm) > 30000:
-        full_context_for_llm = full_context_for_llm[:30000]
-
-    system_prompt = (
-        "You are an expert research assistant and information synthesizer. "
-        "Your task is to review the provided information, which comes from web search snippets and content scraped from specific URLs. "
-        "Based on this information, create a comprehensive, coherent, and de-duplicated summary that is highly relevant to the 'Original Topic'. "
-        "Focus on extracting and organizing key facts, arguments, data points, and important concepts. "
-        "The goal is to produce a structured knowledge base that can be used by another AI to write a detailed document. "
-        "Do not add information that is not present in the provided texts. "
-        "If the provided information is contradictory, point it out. "
-        "Organize the output logically, perhaps using markdown for structure if appropriate (e.g., headings for different aspects of the topic if they emerge from the content)."
-    )
+    full_context_for_llm = packed["context"]
+    packing_stats = packed["stats"]
+    logger.info("Packed synthesis context", extra=packing_stats)
 
-    human_prompt_template = (
-        "Original Topic: {topic}\n\n"
-        "Collected Information to Synthesize:\n"
-        "-------------------------------------\n"
-        "{context}\n"
-        "-------------------------------------\n\n"
-        "Please synthesize the above information thoroughly, keeping the original topic in mind. "
-        "Produce a clean, consolidated text. If no relevant information is found for the topic in the provided context, state that clearly."
+    # Large source sets: summarize batches concurrently (map), then synthesize the summaries (reduce)
+    use_map_reduce = (
+        settings.SYNTHESIS_MAP_REDUCE_ENABLED
+        and packing_stats["tokens_total"] > settings.SYNTHESIS_MAP_REDUCE_THRESHOLD_TOKENS
     )
 
     # LangChain prompt structure
-    from langchain_core.prompts import ChatPromptTemplate
     prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("human", human_prompt_template)
+        ("system", SYNTHESIS_SYSTEM_PROMPT),
+        ("human", SYNTHESIS_HUMAN_PROMPT_TEMPLATE)
     ])
 
-    # Create the chain and invoke the LLM
+    # Create the chain and stream the LLM's answer
     try:
-        synthesis_chain = prompt | llm
+        synthesis_chain = prompt | llm | StrOutputParser()
         
-        llm_response = await synthesis_chain.ainvoke({
-            "topic": initial_topic,
-            "context": full_context_for_llm
-        })
-        
-        # The response from ChatGoogleGenerativeAI is an AIMessage
-        synthesized_text = llm_response.content if hasattr(llm_response, 'content') else str(llm_response)
+        with llm_cache_bypass(state.bypass_llm_cache):
+            if use_map_reduce:
+                reduced_context, used_chunks = await map_reduce_context(llm, initial_topic, packed["chunks"])
+                # If no batch had anything relevant, fall back to the packed single-pass context
+                if reduced_context:
+                    full_context_for_llm = reduced_context
+                    context_chunks_used = [chunk.describe() for chunk in used_chunks]
+
+            synthesis_input = {"topic": initial_topic, "context": full_context_for_llm}
+            synthesis_config = {"tags": [SYNTHESIS_STREAM_TAG], "run_name": "synthesis"}
+            if (config or {}).get("configurable", {}).get(SYNTHESIS_STREAM_CONFIG_KEY):
+                # Streamed, so the graph's event stream (POST /document/generate/stream) sees tokens as they arrive.
+                # Chat-model streaming skips the LLM cache.
+                parts: List[str] = []
+                async for part in synthesis_chain.astream(synthesis_input, config=synthesis_config):
+                    parts.append(part)
+                synthesized_text = "".join(parts)
+            else:
+                synthesized_text = await synthesis_chain.ainvoke(synthesis_input, config=synthesis_config)
 
         if not synthesized_text.strip():
             synthesized_text = "LLM returned no synthesized text."
         else:
-            print(f"\n\nSynthesis Node: \nLLM synthesis successful. Output length (chars): {len(synthesized_text)}\n\n")
+            logger.info("LLM synthesis successful", extra={"output_chars": len(synthesized_text)})
 
         return {
             "consolidated_information": synthesized_text,
-            "status_message": "Information synthesis complete.",
-            "error_message": None
+            "status_message": f"Information synthesis complete{' (map-reduce)' if use_map_reduce else ''}.",
+            "dedup_stats": dedup_stats,
+            "context_chunks_used": context_chunks_used
         }
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        if raises_node_errors(config):
+            logger.warning("Synthesis failed: %s", e)
+            # The run stops before this node, so a job retry or resume runs the synthesis again
+            raise RuntimeError(f"SYNTHESIS_LLM_INVOCATION_ERROR: {e}") from e
+        logger.exception("Synthesis failed")
         return {
             "consolidated_information": f"Error during synthesis: {str(e)}",
             "status_message": "Synthesis failed due to an error.",
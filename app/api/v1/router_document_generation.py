@@ -1,11 +1,30 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional
+import asyncio
+import json
+import uuid
 
-from app.graph.master_orchestrator_graph import compiled_master_orchestrator_graph
+from app.agents.synthesis_nodes import SYNTHESIS_STREAM_CONFIG_KEY, SYNTHESIS_STREAM_TAG
+from app.graph.master_orchestrator_graph import get_compiled_master_orchestrator_graph
+from app.core.config import get_settings
+from app.core.jobs import Job, JobNotResumableError, get_job_manager, run_config
+from app.core.log import get_logger
+from app.core.request_cache import CACHE_BYPASS, CACHE_HIT, CACHE_MISS, get_request_cache, make_request_cache_key
+from app.core.scheduler import DEFAULT_TENANT, get_graph_run_scheduler
 
 router = APIRouter()
 
+logger = get_logger("api")
+
+# Seconds without an event after which an SSE keep-alive comment is sent
+SSE_KEEPALIVE_SECONDS = 15.0
+
+# Per-item outcome in a batch response
+BATCH_ITEM_COMPLETED = "completed"
+BATCH_ITEM_FAILED = "failed"
+
 class StartDocumentGenerationRequest(BaseModel):
     topic: str = Field(
         ...,
@@ -20,15 +39,288 @@ class StartDocumentGenerationRequest(BaseModel):
             "https://blog.example.com/post2"
         ]
     )
+    bypass_cache: bool = Field(
+        False,
+        description="If True, skip cached results and LLM responses and run again."
+    )
+    bypass_local_index: bool = Field(
+        False,
+        description="If True, search the web for every query instead of answering from content earlier runs gathered."
+    )
 
 class DocumentGenerationResponse(BaseModel):
     message: str = Field(description = "Status message of the operation.")
+    run_id: Optional[str] = Field(None, description = "Run id; a failed run can be resumed with POST /jobs/{run_id}/resume.")
+    cache_status: Optional[str] = Field(None, description = "How the request was served: hit, stale, miss, coalesced or bypass.")
     initial_topic: Optional[str] = None 
     generated_queries: Optional[List[str]] = None
     search_results_summary: Optional[List[Dict[str, Any]]] = None 
     error_message: Optional[str] = None
 
 
+class BatchDocumentGenerationRequest(BaseModel):
+    tenant_id: str = Field(
+        DEFAULT_TENANT,
+        description="Caller identity used for fair queuing between concurrent batches."
+    )
+    items: List[StartDocumentGenerationRequest] = Field(
+        ...,
+        min_length=1,
+        description="The documents to generate."
+    )
+
+
+class BatchItemResult(BaseModel):
+    index: int = Field(description = "Position of the item in the request.")
+    topic: str
+    status: str = Field(description = "completed or failed.")
+    result: Optional[DocumentGenerationResponse] = None
+    error_message: Optional[str] = None
+
+
+class BatchDocumentGenerationResponse(BaseModel):
+    tenant_id: str
+    total: int
+    completed: int
+    failed: int
+    items: List[BatchItemResult]
+
+
+class DocumentGenerationJobResponse(BaseModel):
+    job_id: str = Field(description = "Identifier of the background document generation job.")
+    status: str = Field(description = "Job state: pending, running, completed or failed.")
+    status_message: Optional[str] = None
+    iteration_count: int = 0
+    created_at: float
+    updated_at: float
+    result: Optional[DocumentGenerationResponse] = None
+    error_message: Optional[str] = None
+
+
+def build_initial_graph_input(request_body: StartDocumentGenerationRequest) -> Dict[str, Any]:
+    """
+    Maps an API request onto the master graph's input state.
+    """
+
+    return {
+        "initial_topic": request_body.topic,
+        "reference_urls": request_body.reference_urls,
+        "bypass_llm_cache": request_body.bypass_cache,
+        "bypass_local_index": request_body.bypass_local_index,
+    }
+
+
+def build_document_generation_response(
+    final_master_graph_state_dict: Dict[str, Any],
+    run_id: Optional[str] = None,
+    cache_status: Optional[str] = None
+) -> DocumentGenerationResponse:
+    """
+    Builds the API response from the master graph's final state.
+    """
+
+    generated_queries = final_master_graph_state_dict.get("generated_search_queries", [])
+    raw_search_results = final_master_graph_state_dict.get("raw_search_results", [])
+    
+    search_summary = []
+    if raw_search_results:
+        for res_set in raw_search_results:
+            query = res_set.get("query", "Unknown query")
+            content = res_set.get("content_summary", res_set.get("error", "No content/error"))
+            search_summary.append({
+                "query": query,
+                "summary_snippet": content[:150] + "..." if content and len(content) > 150 else content
+            })
+
+    return DocumentGenerationResponse(
+        message = "Document generation process initiated and initial research phase completed.",
+        run_id = run_id,
+        cache_status = cache_status,
+        initial_topic = final_master_graph_state_dict.get("initial_topic"),
+        generated_queries = generated_queries if generated_queries else None,
+        search_results_summary = search_summary if search_summary else None,
+        error_message = final_master_graph_state_dict.get("error_message")
+    )
+
+
+def build_job_response(job: Job) -> DocumentGenerationJobResponse:
+    return DocumentGenerationJobResponse(
+        job_id = job.job_id,
+        status = job.status,
+        status_message = job.status_message,
+        iteration_count = job.iteration_count,
+        created_at = job.created_at,
+        updated_at = job.updated_at,
+        result = build_document_generation_response(job.result, job.job_id) if job.result is not None else None,
+        error_message = job.error
+    )
+
+
+def format_sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _message_chunk_text(chunk: Any) -> str:
+    """Text of a streamed message chunk; content may be a string or a list of content blocks."""
+
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block if isinstance(block, str) else block.get("text", "")
+            for block in content
+            if isinstance(block, (str, dict))
+        )
+    return ""
+
+
+def build_stream_done_event(
+    final_master_graph_state_dict: Dict[str, Any],
+    run_id: Optional[str],
+    cache_status: Optional[str]
+) -> Dict[str, Any]:
+    """The final SSE payload: the regular response plus the full synthesized text."""
+
+    data = build_document_generation_response(final_master_graph_state_dict, run_id, cache_status).model_dump()
+    data["consolidated_information"] = final_master_graph_state_dict.get("consolidated_information")
+    return data
+
+
+async def stream_document_generation(
+    request_body: StartDocumentGenerationRequest,
+    tenant_id: str = DEFAULT_TENANT
+) -> AsyncIterator[str]:
+    """
+    Runs one document generation and yields it as Server-Sent Events:
+    `start` (run id) right away, `token` for every piece of the synthesized text as the LLM
+    produces it, then `done` (the regular response plus `consolidated_information`) or `error`.
+    The run waits for a slot in the shared fair scheduler like any other; it executes in this
+    process also in worker mode, since the tokens come from its event stream. A fresh request-cache
+    entry is replayed as a single token instead of running again, and a completed run is stored
+    in the request cache, so later identical requests (streaming or not) reuse it.
+    Closing the connection cancels the run; with checkpointing it can be resumed by run id.
+    """
+
+    settings = get_settings()
+    cache_key = make_request_cache_key(request_body.topic, request_body.reference_urls, request_body.bypass_local_index)
+
+    if settings.REQUEST_CACHE_ENABLED and not request_body.bypass_cache:
+        cached = get_request_cache().get_fresh(cache_key)
+        if cached is not None:
+            run_id, final_master_graph_state_dict = cached
+            yield format_sse_event("start", {"run_id": run_id})
+            if final_master_graph_state_dict.get("consolidated_information"):
+                yield format_sse_event("token", {"text": final_master_graph_state_dict["consolidated_information"]})
+            yield format_sse_event("done", build_stream_done_event(final_master_graph_state_dict, run_id, CACHE_HIT))
+            return
+
+    cache_status = (CACHE_BYPASS if request_body.bypass_cache else CACHE_MISS) if settings.REQUEST_CACHE_ENABLED else None
+    initial_input_for_master_graph = build_initial_graph_input(request_body)
+    run_id = uuid.uuid4().hex
+    # (event, data) pairs for the client; None once the run is over
+    outbox: asyncio.Queue = asyncio.Queue()
+
+    async def run_master_graph() -> Dict[str, Any]:
+        final_state: Optional[Dict[str, Any]] = None
+        config = run_config(run_id)
+        config["configurable"][SYNTHESIS_STREAM_CONFIG_KEY] = True
+        events = get_compiled_master_orchestrator_graph().astream_events(
+            initial_input_for_master_graph,
+            config = config,
+            version = "v2"
+        )
+        async for event in events:
+            if event["event"] == "on_chat_model_stream" and SYNTHESIS_STREAM_TAG in event.get("tags", []):
+                text = _message_chunk_text(event["data"]["chunk"])
+                if text:
+                    outbox.put_nowait(("token", {"text": text}))
+            elif event["event"] == "on_chain_end" and not event.get("parent_ids"):
+                # The root graph's end event carries the final state
+                final_state = event["data"].get("output")
+
+        if not isinstance(final_state, dict):
+            raise RuntimeError(f"Graph run ended without a final state (run id {run_id})")
+        return final_state
+
+    async def produce() -> None:
+        try:
+            final_state = await get_graph_run_scheduler().run(tenant_id, run_master_graph)
+            # Only complete runs get here (a disconnect cancels before), and `put` skips runs that reported an error
+            if settings.REQUEST_CACHE_ENABLED:
+                get_request_cache().put(cache_key, (run_id, final_state))
+            outbox.put_nowait(("done", build_stream_done_event(final_state, run_id, cache_status)))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Streamed document generation failed", extra={"run_id": run_id})
+            outbox.put_nowait(("error", {"run_id": run_id, "error_message": str(e)}))
+        finally:
+            outbox.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        yield format_sse_event("start", {"run_id": run_id})
+        while True:
+            try:
+                item = await asyncio.wait_for(outbox.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # SSE comment line, keeps proxies from closing the connection while waiting for a slot
+                yield ": keep-alive\n\n"
+                continue
+
+            if item is None:
+                break
+            yield format_sse_event(*item)
+    finally:
+        # Only still running when the client went away
+        producer.cancel()
+
+
+async def generate_document(
+    request_body: StartDocumentGenerationRequest,
+    tenant_id: str = DEFAULT_TENANT
+) -> DocumentGenerationResponse:
+    """
+    Runs (or reuses) one document generation. Identical requests (after normalizing the
+    topic and URLs) share one in-flight run, and completed results are served from the
+    request cache (stale entries while they are refreshed in the background).
+    Actual graph runs wait for a slot in the shared fair scheduler, or in worker mode
+    are queued for the worker processes.
+    """
+
+    initial_input_for_master_graph = build_initial_graph_input(request_body)
+
+    async def run_master_graph():
+        run_id = uuid.uuid4().hex
+        try:
+            # Invoke the Master Orchestrator Graph asynchronously
+            final_state = await get_compiled_master_orchestrator_graph().ainvoke(
+                initial_input_for_master_graph,
+                config = run_config(run_id)
+            )
+        except Exception as e:
+            raise RuntimeError(f"{e} (run id {run_id})") from e
+        return run_id, final_state
+
+    async def schedule_master_graph():
+        if get_settings().JOB_QUEUE_ENABLED:
+            # Worker mode: the run goes through the durable queue (fair per tenant) to a worker process
+            return await get_job_manager().run(initial_input_for_master_graph, tenant_id)
+        return await get_graph_run_scheduler().run(tenant_id, run_master_graph)
+
+    if get_settings().REQUEST_CACHE_ENABLED:
+        (run_id, final_master_graph_state_dict), cache_status = await get_request_cache().get_or_run(
+            make_request_cache_key(request_body.topic, request_body.reference_urls, request_body.bypass_local_index),
+            schedule_master_graph,
+            bypass = request_body.bypass_cache
+        )
+    else:
+        (run_id, final_master_graph_state_dict), cache_status = await schedule_master_graph(), None
+
+    return build_document_generation_response(final_master_graph_state_dict, run_id, cache_status)
+
+
 @router.post(
     "/document/generate",
     response_model = DocumentGenerationResponse
@@ -41,38 +333,8 @@ async def start_document_generation_endpoint(
     Invokes the master orchestrator graph.
     """
 
-    initial_input_for_master_graph = {
-        "initial_topic": request_body.topic,
-        "reference_urls": request_body.reference_urls,
-    }
-
     try:
-        # Invoke the Master Orchestrator Graph asynchronously
-        final_master_graph_state_dict = await compiled_master_orchestrator_graph.ainvoke(
-            initial_input_for_master_graph
-        )
-
-        generated_queries = final_master_graph_state_dict.get("generated_search_queries", [])
-        raw_search_results = final_master_graph_state_dict.get("raw_search_results", [])
-        
-        search_summary = []
-        if raw_search_results:
-            for res_set in raw_search_results:
-                query = res_set.get("query", "Unknown query")
-                content = res_set.get("content_summary", res_set.get("error", "No content/error"))
-                search_summary.append({
-                    "query": query,
-                    "summary_snippet": content[:150] + "..." if content and len(content) > 150 else content
-                })
-
-        response_data = DocumentGenerationResponse(
-            message = "Document generation process initiated and initial research phase completed.",
-            initial_topic = final_master_graph_state_dict.get("initial_topic"),
-            generated_queries = generated_queries if generated_queries else None,
-            search_results_summary = search_summary if search_summary else None,
-            error_message = final_master_graph_state_dict.get("error_message")
-        )
-        return response_data
+        return await generate_document(request_body)
 
     except Exception as e:
         import traceback
@@ -81,4 +343,149 @@ async def start_document_generation_endpoint(
         raise HTTPException(
             status_code=500,
             detail=f"An error occurred during document generation: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/document/generate/stream")
+async def stream_document_generation_endpoint(
+    request_body: StartDocumentGenerationRequest,
+):
+    """
+    Streaming variant of POST /document/generate, as Server-Sent Events.
+    The synthesized document is forwarded token by token while the LLM writes it
+    (`token` events), followed by a final `done` event with the full response.
+    """
+
+    return StreamingResponse(
+        stream_document_generation(request_body),
+        media_type = "text/event-stream",
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post(
+    "/document/batch",
+    response_model = BatchDocumentGenerationResponse
+)
+async def batch_document_generation_endpoint(
+    request_body: BatchDocumentGenerationRequest,
+):
+    """
+    Generates documents for several topics in one call.
+    Items run through the same fair scheduler, request cache and shared search/LLM
+    rate limits as single requests, so a batch cannot cause a rate-limit storm.
+    One failing item does not fail the batch; each item reports its own outcome.
+    """
+
+    max_items = get_settings().BATCH_MAX_ITEMS
+    if len(request_body.items) > max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch may contain at most {max_items} items; got {len(request_body.items)}."
+        )
+
+    async def run_item(index: int, item: StartDocumentGenerationRequest) -> BatchItemResult:
+        try:
+            result = await generate_document(item, request_body.tenant_id)
+            return BatchItemResult(index = index, topic = item.topic, status = BATCH_ITEM_COMPLETED, result = result)
+        except Exception as e:
+            logger.warning("Batch item %d failed: %s", index, e, extra={"topic": item.topic[:50]})
+            return BatchItemResult(index = index, topic = item.topic, status = BATCH_ITEM_FAILED, error_message = str(e))
+
+    item_results = await asyncio.gather(*(run_item(index, item) for index, item in enumerate(request_body.items)))
+    completed = sum(1 for item_result in item_results if item_result.status == BATCH_ITEM_COMPLETED)
+
+    return BatchDocumentGenerationResponse(
+        tenant_id = request_body.tenant_id,
+        total = len(item_results),
+        completed = completed,
+        failed = len(item_results) - completed,
+        items = item_results
+    )
+
+
+@router.post(
+    "/document/jobs",
+    response_model = DocumentGenerationJobResponse,
+    status_code = 202
+)
+async def submit_document_generation_job_endpoint(
+    request_body: StartDocumentGenerationRequest,
+    tenant_id: str = Query(DEFAULT_TENANT, description = "Caller identity used for fair queuing between concurrent runs."),
+):
+    """
+    Starts document generation in the background and returns the job id immediately.
+    The run waits for a slot in the shared fair scheduler under `tenant_id`.
+    Poll GET /jobs/{job_id} or follow GET /jobs/{job_id}/events for progress.
+    """
+
+    job = await get_job_manager().submit(build_initial_graph_input(request_body), tenant_id)
+    return build_job_response(job)
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model = DocumentGenerationJobResponse
+)
+async def get_document_generation_job_endpoint(job_id: str):
+    """
+    Returns the current state of a background document generation job.
+    """
+
+    job = await get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+
+    return build_job_response(job)
+
+
+@router.post(
+    "/jobs/{job_id}/resume",
+    response_model = DocumentGenerationJobResponse,
+    status_code = 202
+)
+async def resume_document_generation_job_endpoint(job_id: str):
+    """
+    Resumes a failed or interrupted run from its last completed node, in the background.
+    Accepts job ids and the run ids returned by POST /document/generate, also after a restart.
+    """
+
+    try:
+        job = await get_job_manager().resume(job_id)
+    except JobNotResumableError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No checkpointed run '{job_id}' found.")
+
+    return build_job_response(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_document_generation_job_events_endpoint(job_id: str):
+    """
+    Streams per-node progress of a job as Server-Sent Events.
+    Past events are replayed first, so late subscribers see the whole run.
+    """
+
+    job_manager = get_job_manager()
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+
+    async def event_stream():
+        async for event in job_manager.subscribe(job):
+            if event is None:
+                # SSE comment line, keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse_event("progress", event)
+
+        finished_job = await job_manager.get(job_id) or job
+        yield format_sse_event("end", {"job_id": finished_job.job_id, "status": finished_job.status})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type = "text/event-stream",
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache # For caching the settings instance
+from typing import List
 
 class Settings(BaseSettings):
     """
@@ -10,6 +11,152 @@ class Settings(BaseSettings):
     APP_NAME: str = "Deep Chain Graph"
     DEFAULT_LLM_MODEL: str = "MODEL_NAME"
 
+    # Logging: level, "text" or "json" lines, and the fraction of DEBUG/INFO records kept
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"
+    LOG_SAMPLE_RATE: float = 1.0
+
+    # Web search execution
+    SEARCH_MAX_CONCURRENCY: int = 3
+    SEARCH_RATE_PER_SECOND: float = 0.5
+    SEARCH_RATE_BURST: int = 3
+    SEARCH_MAX_RETRIES: int = 3
+    SEARCH_BACKOFF_BASE_SECONDS: float = 1.0
+    SEARCH_BACKOFF_MAX_SECONDS: float = 16.0
+    SEARCH_MAX_RESULTS: int = 10
+
+    # Search backends in priority order: "ddgs", "duckduckgo" (LangChain API wrapper),
+    # "duckduckgo_run" (DuckDuckGoSearchRun tool, no links), "stub", "fake" (load testing)
+    SEARCH_BACKENDS: List[str] = ["ddgs", "duckduckgo"]
+    SEARCH_BACKEND_TIMEOUT_SECONDS: float = 15.0
+    # Start the next backend when one has not answered after this long (until its p95 is known); 0 disables hedging
+    SEARCH_HEDGE_DELAY_SECONDS: float = 3.0
+    # Circuit breaker per backend: opens after N consecutive rate limits or N consecutive errors
+    SEARCH_CIRCUIT_FAILURE_THRESHOLD: int = 3
+    SEARCH_CIRCUIT_RATE_LIMIT_THRESHOLD: int = 2
+    SEARCH_CIRCUIT_COOLDOWN_SECONDS: float = 30.0
+    SEARCH_CIRCUIT_MAX_COOLDOWN_SECONDS: float = 300.0
+
+    # Web search result cache
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_PATH: str = ".cache/search_cache.sqlite3"
+    SEARCH_CACHE_TTL_SECONDS: int = 86400
+    SEARCH_CACHE_MAX_ENTRIES: int = 5000
+
+    # LLM request rate, shared by every run in the process (0 disables the limiter)
+    LLM_RATE_PER_SECOND: float = 1.0
+    LLM_RATE_BURST: int = 5
+
+    # LLM response cache
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MEMORY_MAX_ENTRIES: int = 256
+    LLM_CACHE_PATH: str = ".cache/llm_cache.sqlite3"
+    LLM_CACHE_TTL_SECONDS: int = 604800
+    LLM_CACHE_MAX_ENTRIES: int = 2000
+
+    # Shared HTTP client and on-disk HTTP cache for scraping
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_ENABLE_HTTP2: bool = False
+    HTTP_TIMEOUT_SECONDS: float = 20.0
+    HTTP_CACHE_ENABLED: bool = True
+    HTTP_CACHE_DIR: str = ".cache/http"
+    HTTP_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Content-addressed blob store for raw page bodies (the state only holds their keys)
+    BLOB_STORE_DIR: str = ".cache/blobs"
+    BLOB_STORE_MEMORY_MAX_BYTES: int = 64 * 1024 * 1024
+    BLOB_STORE_DISK_MAX_BYTES: int = 1024 * 1024 * 1024
+    BLOB_STORE_COMPRESS: bool = True
+
+    # Scraper download limits. HTML is always allowed; entries ending in '/' match a media type family.
+    SCRAPER_MAX_BYTES_PER_URL: int = 5 * 1024 * 1024
+    SCRAPER_ALLOWED_EXTRA_CONTENT_TYPES: List[str] = ["text/plain"]
+    SCRAPER_MAX_PDF_PAGES: int = 50
+
+    # Incremental research loop: stop re-querying once an iteration adds fewer new tokens than this
+    RESEARCH_MIN_NEW_TOKENS_PER_ITERATION: int = 50
+
+    # Persistent cross-run retrieval index (SQLite FTS5, BM25-ranked), consulted before web search.
+    # A query is answered locally when at least LOCAL_INDEX_MIN_HITS documents contain all of its terms.
+    LOCAL_INDEX_ENABLED: bool = True
+    LOCAL_INDEX_PATH: str = ".cache/local_index.sqlite3"
+    LOCAL_INDEX_MAX_AGE_SECONDS: int = 30 * 86400
+    LOCAL_INDEX_MAX_BYTES: int = 256 * 1024 * 1024
+    LOCAL_INDEX_MIN_HITS: int = 3
+    LOCAL_INDEX_MAX_HITS: int = 8
+
+    # Scraping of top search-hit URLs (fills scraped_content_from_search)
+    SEARCH_HIT_SCRAPE_ENABLED: bool = True
+    SEARCH_HIT_SCRAPE_TOP_K: int = 3
+    SEARCH_HIT_SCRAPE_CONCURRENCY: int = 8
+    SEARCH_HIT_SCRAPE_PER_DOMAIN_CONCURRENCY: int = 2
+    # Pages scraped per domain over a whole run, counting every research iteration
+    SEARCH_HIT_SCRAPE_MAX_PAGES_PER_DOMAIN: int = 2
+
+    # HTML extraction process pool (0 runs extraction in a thread instead)
+    HTML_EXTRACTION_WORKERS: int = 2
+
+    # Near-duplicate elimination before synthesis
+    DEDUP_ENABLED: bool = True
+    DEDUP_SHINGLE_SIZE: int = 2
+    DEDUP_JACCARD_THRESHOLD: float = 0.7
+    # Sentences checked per source text; later ones are kept unchecked, bounding the cost of huge pages (0 = no cap)
+    DEDUP_MAX_UNITS_PER_TEXT: int = 400
+
+    # Synthesis context packing (token counts are local estimates)
+    SYNTHESIS_CONTEXT_TOKEN_BUDGET: int = 7500
+    SYNTHESIS_CHUNK_TOKENS: int = 300
+
+    # Map-reduce synthesis, used automatically when the sources exceed the threshold
+    SYNTHESIS_MAP_REDUCE_ENABLED: bool = True
+    SYNTHESIS_MAP_REDUCE_THRESHOLD_TOKENS: int = 15000
+    SYNTHESIS_MAP_BATCH_TOKENS: int = 6000
+    SYNTHESIS_MAP_MAX_BATCHES: int = 32
+    SYNTHESIS_MAP_CONCURRENCY: int = 4
+    SYNTHESIS_MAP_MAX_COLLAPSE_ROUNDS: int = 2
+
+    # Durable checkpointing of graph runs, keyed by run id (lets failed runs resume)
+    CHECKPOINT_ENABLED: bool = True
+    CHECKPOINT_PATH: str = ".cache/checkpoints.sqlite3"
+    CHECKPOINT_TTL_SECONDS: int = 7 * 86400
+
+    # Whole-request result cache for /document/generate (single-flight + stale-while-revalidate)
+    REQUEST_CACHE_ENABLED: bool = True
+    REQUEST_CACHE_TTL_SECONDS: int = 3600
+    REQUEST_CACHE_STALE_SECONDS: int = 86400
+    REQUEST_CACHE_MAX_ENTRIES: int = 256
+
+    # Graph runs started from /document/generate and /document/batch
+    GRAPH_RUN_MAX_CONCURRENCY: int = 4
+    BATCH_MAX_ITEMS: int = 50
+
+    # Background document generation jobs
+    JOB_RESULT_TTL_SECONDS: int = 3600
+    JOB_MAX_RETAINED: int = 1000
+
+    # Worker mode: graph runs go through a durable SQLite job queue and execute in separate
+    # `python -m app.worker` processes. A worker's lease on a job expires (and the job becomes
+    # visible to other workers) unless renewed; failed attempts are retried with backoff.
+    # Rate limits apply per process, so divide them by the number of worker processes.
+    JOB_QUEUE_ENABLED: bool = False
+    JOB_QUEUE_PATH: str = ".cache/job_queue.sqlite3"
+    JOB_QUEUE_MAX_ATTEMPTS: int = 3
+    JOB_QUEUE_RETRY_BACKOFF_SECONDS: float = 5.0
+    JOB_QUEUE_LEASE_SECONDS: float = 60.0
+    JOB_QUEUE_POLL_INTERVAL_SECONDS: float = 0.25
+    WORKER_CONCURRENCY: int = 2
+
+    # Offline stand-ins for load testing (see app/loadtest): LLM_PROVIDER = "fake", SEARCH_BACKENDS = ["fake"]
+    LLM_PROVIDER: str = "google"
+    FAKE_LLM_LATENCY_SECONDS: float = 0.5
+    FAKE_LLM_RESPONSE_TOKENS: int = 400
+    FAKE_SEARCH_LATENCY_SECONDS: float = 0.3
+    FAKE_SEARCH_RESULTS_PER_QUERY: int = 5
+    FAKE_SEARCH_BASE_URL: str = "http://127.0.0.1:8765"
+    FAKE_SEARCH_PAGE_SIZES: List[int] = [2_000, 20_000, 200_000]
+
     # Configure Pydantic to load from a .env file
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding='utf-8', extra='ignore')
 
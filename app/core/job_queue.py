@@ -0,0 +1,545 @@
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from functools import lru_cache
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from app.core.config import get_settings
+from app.core.jobs import (
+    FINISHED_JOB_STATES,
+    JOB_COMPLETED,
+    JOB_FAILED,
+    JOB_PENDING,
+    JOB_RUNNING,
+    Job,
+    JobNotResumableError,
+    find_resume_config,
+)
+from app.core.log import get_logger
+from app.core.scheduler import DEFAULT_TENANT
+
+logger = get_logger("job_queue")
+
+_JOB_COLUMNS = "job_id, tenant_id, input, status, created_at, updated_at, status_message, iteration_count, result, error"
+
+
+def _to_json(value: Any) -> str:
+    # Graph states hold pydantic models (e.g. ScrapedPage) next to plain values
+    return json.dumps(value, default=lambda obj: obj.model_dump() if hasattr(obj, "model_dump") else str(obj))
+
+
+def _row_to_job(row: Tuple) -> Job:
+    job_id, tenant_id, graph_input, status, created_at, updated_at, status_message, iteration_count, result, error = row
+    return Job(
+        job_id=job_id,
+        input=json.loads(graph_input) if graph_input is not None else None,
+        tenant_id=tenant_id,
+        status=status,
+        created_at=created_at,
+        updated_at=updated_at,
+        status_message=status_message,
+        iteration_count=iteration_count,
+        result=json.loads(result) if result is not None else None,
+        error=error,
+        resumed=graph_input is None,
+    )
+
+
+@dataclass
+class JobLease:
+    """A job claimed by a worker; only valid while the worker keeps renewing it."""
+
+    job_id: str
+    input: Optional[Dict[str, Any]]
+    attempt: int
+    max_attempts: int
+
+
+class SQLiteJobQueue:
+    """
+    Durable queue of graph runs in a local SQLite file, shared by the API process and any
+    number of worker processes (no broker needed).
+
+    - `claim` hands the next runnable job to a worker under a lease of `lease_seconds`.
+      Pending jobs are taken oldest first, preferring tenants with the fewest running jobs.
+    - Workers renew their lease with `heartbeat`. When a lease runs out (the worker died or
+      stalled) the job becomes visible to other workers again, and the attempt counts as failed.
+    - `fail` re-queues the job after an exponential backoff until `max_attempts` attempts
+      were made, then marks it failed. `release` hands a job back without using an attempt.
+    - Progress events are stored per job and read back with `events_after`.
+    Only the current lease owner can complete, fail, release or renew a job.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max(max_attempts, 1)
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # One connection shared by all threads, serialized by a lock; other processes wait on SQLite's own lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, tenant_id TEXT NOT NULL, input TEXT, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL, available_at REAL NOT NULL, "
+            "lease_owner TEXT, lease_expires_at REAL, created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+            "status_message TEXT, iteration_count INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT);"
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, available_at);"
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT NOT NULL, event TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, id);"
+        )
+
+    def _transaction(self, work: Callable[[], Any]) -> Any:
+        """Runs `work` in one write transaction. Caller holds the lock."""
+
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = work()
+            self._conn.execute("COMMIT")
+            return result
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _add_event(self, job_id: str, event: Dict[str, Any]) -> None:
+        self._conn.execute("INSERT INTO job_events (job_id, event) VALUES (?, ?)", (job_id, _to_json(event)))
+
+    def _get(self, job_id: str) -> Optional[Job]:
+        row = self._conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row is not None else None
+
+    def enqueue(self, graph_input: Optional[Dict[str, Any]], tenant_id: str = DEFAULT_TENANT, job_id: Optional[str] = None) -> Job:
+        """
+        Adds a run to the queue and returns its job. The job id doubles as the run id.
+        A None input continues the checkpointed run `job_id` instead of starting a new one.
+        """
+
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+
+        def work() -> Job:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, tenant_id, input, status, max_attempts, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, tenant_id or DEFAULT_TENANT, _to_json(graph_input) if graph_input is not None else None,
+                 JOB_PENDING, self.max_attempts, now, now, now)
+            )
+            self._add_event(job_id, {"node": None, "status": JOB_PENDING, "timestamp": now})
+            return self._get(job_id)
+
+        with self._lock:
+            return self._transaction(work)
+
+    def requeue(self, job_id: str) -> Optional[Job]:
+        """
+        Queues a finished job again with a fresh set of attempts, e.g. to resume a failed run
+        from its checkpoint. Returns None if the job is unknown.
+        """
+
+        now = time.time()
+
+        def work() -> Optional[Job]:
+            job = self._get(job_id)
+            if job is None:
+                return None
+            if not job.is_finished:
+                raise JobNotResumableError(f"Job '{job_id}' is still {job.status}.")
+
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, lease_owner = NULL, lease_expires_at = NULL, "
+                "result = NULL, error = NULL, updated_at = ? WHERE job_id = ?",
+                (JOB_PENDING, now, now, job_id)
+            )
+            self._add_event(job_id, {"node": None, "status": JOB_PENDING, "requeued": True, "timestamp": now})
+            return self._get(job_id)
+
+        with self._lock:
+            return self._transaction(work)
+
+    def _expire_leases(self, now: float) -> None:
+        """Makes jobs whose lease ran out visible again, or fails them when out of attempts. Caller is in a transaction."""
+
+        expired = self._conn.execute(
+            "SELECT job_id, lease_owner, attempts, max_attempts FROM jobs WHERE status = ? AND lease_expires_at < ?",
+            (JOB_RUNNING, now)
+        ).fetchall()
+
+        for job_id, lease_owner, attempts, max_attempts in expired:
+            error = f"Worker {lease_owner} lost its lease (attempt {attempts} of {max_attempts})."
+            status = JOB_FAILED if attempts >= max_attempts else JOB_PENDING
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_owner = NULL, lease_expires_at = NULL, "
+                "error = ?, updated_at = ? WHERE job_id = ?",
+                (status, now, error, now, job_id)
+            )
+            self._add_event(job_id, {"node": None, "status": status, "error_message": error, "timestamp": now})
+            logger.warning("Job lease expired", extra={"job_id": job_id, "worker": lease_owner, "status": status})
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[JobLease]:
+        """Leases the next runnable job to `worker_id`, or returns None when there is none."""
+
+        now = time.time()
+        with self._lock:
+            # Cheap read first, so idle workers polling the queue do not take the write lock
+            runnable = self._conn.execute(
+                "SELECT 1 FROM jobs WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at < ?) LIMIT 1",
+                (JOB_PENDING, now, JOB_RUNNING, now)
+            ).fetchone()
+            if runnable is None:
+                return None
+
+            def work() -> Optional[JobLease]:
+                self._expire_leases(now)
+                row = self._conn.execute(
+                    "SELECT job_id, input, attempts, max_attempts FROM jobs AS q WHERE status = ? AND available_at <= ? "
+                    "ORDER BY (SELECT COUNT(*) FROM jobs AS r WHERE r.status = ? AND r.tenant_id = q.tenant_id), created_at "
+                    "LIMIT 1",
+                    (JOB_PENDING, now, JOB_RUNNING)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                job_id, graph_input, attempts, max_attempts = row
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = ?, lease_owner = ?, lease_expires_at = ?, error = NULL, "
+                    "updated_at = ? WHERE job_id = ?",
+                    (JOB_RUNNING, attempts + 1, worker_id, now + lease_seconds, now, job_id)
+                )
+                self._add_event(job_id, {
+                    "node": None, "status": JOB_RUNNING, "worker": worker_id, "attempt": attempts + 1, "timestamp": now
+                })
+                return JobLease(
+                    job_id=job_id,
+                    input=json.loads(graph_input) if graph_input is not None else None,
+                    attempt=attempts + 1,
+                    max_attempts=max_attempts
+                )
+
+            return self._transaction(work)
+
+    def _update_leased(self, job_id: str, worker_id: str, assignments: str, params: Tuple) -> bool:
+        """Updates a job only while `worker_id` holds its lease. Caller is in a transaction."""
+
+        cursor = self._conn.execute(
+            f"UPDATE jobs SET {assignments} WHERE job_id = ? AND status = ? AND lease_owner = ?",
+            params + (job_id, JOB_RUNNING, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Extends the lease. Returns False if the worker no longer holds it."""
+
+        now = time.time()
+        with self._lock:
+            return self._transaction(lambda: self._update_leased(
+                job_id, worker_id, "lease_expires_at = ?, updated_at = ?", (now + lease_seconds, now)
+            ))
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        now = time.time()
+
+        def work() -> bool:
+            if not self._update_leased(
+                job_id, worker_id,
+                "status = ?, result = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ?",
+                (JOB_COMPLETED, _to_json(result), now)
+            ):
+                return False
+            self._add_event(job_id, {"node": None, "status": JOB_COMPLETED, "error_message": None, "timestamp": now})
+            return True
+
+        with self._lock:
+            return self._transaction(work)
+
+    def fail(
+        self,
+        job_id: str,
+        worker_id: str,
+        error: str,
+        retry_backoff_seconds: float = 5.0,
+        result: Optional[Dict[str, Any]] = None,
+        retry: bool = True
+    ) -> Optional[str]:
+        """
+        Records a failed attempt: the job is queued again after `retry_backoff_seconds`
+        (doubling per attempt) or, out of attempts or with `retry` False (a permanent failure),
+        marked failed. `result` keeps the final state of a run that finished with an error.
+        Returns the new status, or None if the worker no longer holds the lease.
+        """
+
+        now = time.time()
+
+        def work() -> Optional[str]:
+            row = self._conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE job_id = ? AND status = ? AND lease_owner = ?",
+                (job_id, JOB_RUNNING, worker_id)
+            ).fetchone()
+            if row is None:
+                return None
+
+            attempts, max_attempts = row
+            status = JOB_FAILED if not retry or attempts >= max_attempts else JOB_PENDING
+            available_at = now + retry_backoff_seconds * (2 ** (attempts - 1))
+            self._update_leased(
+                job_id, worker_id,
+                "status = ?, available_at = ?, error = ?, result = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ?",
+                (status, available_at, error, _to_json(result) if result is not None else None, now)
+            )
+            event = {"node": None, "status": status, "error_message": error, "attempt": attempts, "timestamp": now}
+            if status == JOB_PENDING:
+                event["retry_at"] = available_at
+            self._add_event(job_id, event)
+            return status
+
+        with self._lock:
+            return self._transaction(work)
+
+    def release(self, job_id: str, worker_id: str) -> bool:
+        """Hands a job back to the queue without using up an attempt (e.g. on worker shutdown)."""
+
+        now = time.time()
+
+        def work() -> bool:
+            if not self._update_leased(
+                job_id, worker_id,
+                "status = ?, attempts = MAX(attempts - 1, 0), available_at = ?, lease_owner = NULL, "
+                "lease_expires_at = NULL, updated_at = ?",
+                (JOB_PENDING, now, now)
+            ):
+                return False
+            self._add_event(job_id, {"node": None, "status": JOB_PENDING, "released_by": worker_id, "timestamp": now})
+            return True
+
+        with self._lock:
+            return self._transaction(work)
+
+    def add_event(self, job_id: str, event: Dict[str, Any]) -> None:
+        """Stores a progress event and keeps the job's status message and iteration count current."""
+
+        def work() -> None:
+            self._add_event(job_id, event)
+            if event.get("status_message") is not None or event.get("iteration_count") is not None:
+                self._conn.execute(
+                    "UPDATE jobs SET status_message = COALESCE(?, status_message), "
+                    "iteration_count = COALESCE(?, iteration_count), updated_at = ? WHERE job_id = ?",
+                    (event.get("status_message"), event.get("iteration_count"), time.time(), job_id)
+                )
+
+        with self._lock:
+            self._transaction(work)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._get(job_id)
+
+    def get_finished(self, job_ids: List[str]) -> List[Job]:
+        """The jobs among `job_ids` that are completed or failed."""
+
+        finished = []
+        with self._lock:
+            for start in range(0, len(job_ids), 500):
+                batch = job_ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT {_JOB_COLUMNS} FROM jobs WHERE job_id IN ({','.join('?' * len(batch))}) AND status IN (?, ?)",
+                    tuple(batch) + FINISHED_JOB_STATES
+                ).fetchall()
+                finished.extend(_row_to_job(row) for row in rows)
+        return finished
+
+    def events_after(self, job_id: str, after_id: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        """(event id, event) pairs of a job, oldest first, starting after `after_id`."""
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, event FROM job_events WHERE job_id = ? AND id > ? ORDER BY id", (job_id, after_id)
+            ).fetchall()
+        return [(event_id, json.loads(event)) for event_id, event in rows]
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Deletes finished jobs (and their events) not updated for `max_age_seconds`. Returns how many."""
+
+        cutoff = time.time() - max_age_seconds
+
+        def work() -> int:
+            job_ids = [row[0] for row in self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status IN (?, ?) AND updated_at < ?", FINISHED_JOB_STATES + (cutoff,)
+            )]
+            for start in range(0, len(job_ids), 500):
+                batch = job_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                self._conn.execute(f"DELETE FROM job_events WHERE job_id IN ({placeholders})", batch)
+                self._conn.execute(f"DELETE FROM jobs WHERE job_id IN ({placeholders})", batch)
+            return len(job_ids)
+
+        with self._lock:
+            return self._transaction(work)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {JOB_PENDING: 0, JOB_RUNNING: 0, JOB_COMPLETED: 0, JOB_FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+
+class QueuedJobManager:
+    """
+    Job manager for worker mode, with the same interface as `JobManager`: runs are written to
+    the durable queue and executed by worker processes (see `app.worker`), and this process
+    only reads their state and progress back. Waiting callers share one polling loop, so the
+    queue is read once per poll interval however many requests are waiting.
+    """
+
+    def __init__(
+        self,
+        queue: SQLiteJobQueue,
+        get_graph: Callable[[], Any],
+        poll_interval_seconds: float = 0.25,
+        checkpointing: bool = False,
+    ):
+        self.queue = queue
+        self.get_graph = get_graph
+        self.poll_interval_seconds = poll_interval_seconds
+        self.checkpointing = checkpointing
+
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._poller: Optional[asyncio.Task] = None
+
+    async def submit(self, graph_input: Dict[str, Any], tenant_id: str = DEFAULT_TENANT) -> Job:
+        """
+        Queues a new run and returns as soon as it is stored (a single small SQLite write).
+        Queue calls run in a thread: they can wait for a worker's write lock.
+        """
+
+        return await asyncio.to_thread(self.queue.enqueue, graph_input, tenant_id)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await asyncio.to_thread(self.queue.get, job_id)
+
+    async def run(self, graph_input: Dict[str, Any], tenant_id: str = DEFAULT_TENANT) -> Tuple[str, Dict[str, Any]]:
+        """
+        Queues a run and waits until a worker finishes it. Returns (run id, final state).
+        Like an in-process run, a failed run returns an error state: its final state when it
+        ended with one, else the input with the error of its last attempt (workers run graphs
+        with failing nodes raising, so they can retry them).
+        """
+
+        job = await asyncio.to_thread(self.queue.enqueue, graph_input, tenant_id)
+        finished = await self.wait(job.job_id)
+        if finished.status == JOB_FAILED and finished.result is None:
+            return job.job_id, {**graph_input, "error_message": finished.error}
+        return job.job_id, finished.result or {}
+
+    async def wait(self, job_id: str) -> Job:
+        """Waits until the job is completed or failed and returns it."""
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(job_id, []).append(future)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+
+        try:
+            return await future
+        finally:
+            waiters = self._waiters.get(job_id, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(job_id, None)
+
+    async def _poll(self) -> None:
+        while self._waiters:
+            await asyncio.sleep(self.poll_interval_seconds)
+            try:
+                finished = await asyncio.to_thread(self.queue.get_finished, list(self._waiters))
+            except Exception as e:
+                logger.warning("Could not poll the job queue: %s", e)
+                continue
+
+            for job in finished:
+                for future in self._waiters.get(job.job_id, []):
+                    if not future.done():
+                        future.set_result(job)
+
+    async def resume(self, job_id: str) -> Optional[Job]:
+        """
+        Queues a failed run again; a worker continues it from its last completed node.
+        Runs not in the queue (e.g. from before worker mode) are queued too if a checkpoint exists.
+        Returns None if no checkpoint exists for `job_id`.
+        """
+
+        if not self.checkpointing:
+            raise JobNotResumableError("Checkpointing is disabled; runs cannot be resumed.")
+
+        job = await asyncio.to_thread(self.queue.get, job_id)
+        if job is not None and not job.is_finished:
+            raise JobNotResumableError(f"Job '{job_id}' is still {job.status}.")
+
+        # The worker picks the checkpoint to continue from when it takes the job
+        if await find_resume_config(self.get_graph(), job_id) is None:
+            return None
+
+        if job is None:
+            try:
+                return await asyncio.to_thread(self.queue.enqueue, None, DEFAULT_TENANT, job_id)
+            except sqlite3.IntegrityError:
+                # Queued by a concurrent resume in the meantime
+                raise JobNotResumableError(f"Job '{job_id}' is already queued.")
+        return await asyncio.to_thread(self.queue.requeue, job_id)
+
+    async def subscribe(self, job: Job, keepalive_seconds: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yields the job's stored events, then new ones (polled from the queue) until it finishes.
+        Yields None as a keep-alive when nothing happened for `keepalive_seconds`.
+        """
+
+        last_id = 0
+        idle_since = time.monotonic()
+        while True:
+            events = await asyncio.to_thread(self.queue.events_after, job.job_id, last_id)
+            for last_id, event in events:
+                yield event
+
+            if events:
+                idle_since = time.monotonic()
+            else:
+                current = await asyncio.to_thread(self.queue.get, job.job_id)
+                if current is None or current.is_finished:
+                    # Events stored between the two reads, including the final status change
+                    for last_id, event in await asyncio.to_thread(self.queue.events_after, job.job_id, last_id):
+                        yield event
+                    return
+                if time.monotonic() - idle_since >= keepalive_seconds:
+                    idle_since = time.monotonic()
+                    yield None
+
+            await asyncio.sleep(self.poll_interval_seconds)
+
+    async def shutdown(self) -> None:
+        """Stops polling; queued and running jobs are left to the workers."""
+
+        if self._poller is not None and not self._poller.done():
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+        for futures in self._waiters.values():
+            for future in futures:
+                if not future.done():
+                    future.cancel()
+
+
+@lru_cache()
+def get_job_queue() -> SQLiteJobQueue:
+    """Returns this process's handle on the durable job queue."""
+
+    settings = get_settings()
+    return SQLiteJobQueue(settings.JOB_QUEUE_PATH, max_attempts=settings.JOB_QUEUE_MAX_ATTEMPTS)
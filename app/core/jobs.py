@@ -0,0 +1,370 @@
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
+from functools import lru_cache
+import asyncio
+import time
+import uuid
+
+from app.core.config import get_settings
+from app.core.log import get_logger
+from app.core.scheduler import DEFAULT_TENANT, FairScheduler, get_graph_run_scheduler
+
+if TYPE_CHECKING:
+    from app.core.job_queue import QueuedJobManager
+
+logger = get_logger("jobs")
+
+# Job lifecycle states
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+FINISHED_JOB_STATES = (JOB_COMPLETED, JOB_FAILED)
+
+
+class JobNotResumableError(Exception):
+    """Raised when a run cannot be resumed (still running, already complete, or no checkpointing)."""
+
+
+# Run config key (under "configurable") set by the job runners: nodes that would report a failure
+# as an `error_message` state raise instead, so the run stops before them and a retry or resume
+# runs them again. Direct API runs leave it unset and get the error state in their response.
+RAISE_NODE_ERRORS_CONFIG_KEY = "raise_node_errors"
+
+
+def run_config(run_id: str) -> Dict[str, Any]:
+    """Graph config for a run; the run id is the checkpointer's thread id."""
+
+    return {"configurable": {"thread_id": run_id}}
+
+
+def raises_node_errors(config: Optional[Dict[str, Any]]) -> bool:
+    """Whether the run's config asks failing nodes to raise (see RAISE_NODE_ERRORS_CONFIG_KEY)."""
+
+    return bool((config or {}).get("configurable", {}).get(RAISE_NODE_ERRORS_CONFIG_KEY))
+
+
+async def find_resume_config(graph: Any, run_id: str) -> Optional[Dict[str, Any]]:
+    """
+    The config to continue a checkpointed run from, or None when it has no checkpoint:
+    its latest checkpoint when it stopped before finishing (a node raised, or the process died),
+    or, when it finished with an `error_message`, the checkpoint before the step that reported
+    the first error, so that step and everything after it run again. Error messages accumulate
+    and are never cleared, so the state resumed from has no errors to lose.
+    Raises JobNotResumableError for a run that finished cleanly.
+    """
+
+    config = run_config(run_id)
+    snapshot = await graph.aget_state(config)
+    if not snapshot.values:
+        return None
+    if snapshot.next:
+        return config
+
+    resume_config = None
+    if snapshot.values.get("error_message"):
+        # Newest first: walk back through the checkpoints that carry an error
+        async for earlier in graph.aget_state_history(config):
+            if not earlier.values.get("error_message"):
+                break
+            resume_config = earlier.parent_config
+    if resume_config:
+        return resume_config
+    raise JobNotResumableError(f"Run '{run_id}' already completed; nothing to resume.")
+
+
+@dataclass
+class Job:
+    """A single background graph run and everything observed about it so far."""
+
+    job_id: str
+    input: Optional[Dict[str, Any]]
+    tenant_id: str = DEFAULT_TENANT
+    status: str = JOB_PENDING
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    status_message: Optional[str] = None
+    iteration_count: int = 0
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    # Set when the job continues a checkpointed run instead of starting from `input`
+    resumed: bool = False
+    # Checkpoint a resumed run continues from (see `find_resume_config`)
+    resume_config: Optional[Dict[str, Any]] = None
+    task: Optional[asyncio.Task] = None
+    subscribers: List[asyncio.Queue] = field(default_factory=list)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in FINISHED_JOB_STATES
+
+
+def _chunk_to_progress_event(node_name: str, namespace: tuple, update: Any) -> Dict[str, Any]:
+    """Turns one streamed node update into a small, JSON-friendly progress event."""
+
+    event = {
+        "node": node_name,
+        "namespace": [part.split(":")[0] for part in namespace],
+        "timestamp": time.time(),
+    }
+    if isinstance(update, dict):
+        if update.get("status_message") is not None:
+            event["status_message"] = update["status_message"]
+        if update.get("iteration_count") is not None:
+            event["iteration_count"] = update["iteration_count"]
+        if update.get("error_message"):
+            event["error_message"] = update["error_message"]
+    return event
+
+
+async def stream_graph_progress(
+    graph: Any,
+    graph_input: Optional[Dict[str, Any]],
+    run_id: str,
+    config: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Runs the graph for a job runner and yields ("progress", event) for every node update
+    (including subgraphs) and ("values", state) with the root graph's full state after each
+    step; the last "values" item is the final state. A None input continues the run from its
+    latest checkpoint, or from the checkpoint in `config`. Failing nodes raise (see
+    RAISE_NODE_ERRORS_CONFIG_KEY), so retries and resumes run them again.
+    """
+
+    config = config or run_config(run_id)
+    config = {**config, "configurable": {**config.get("configurable", {}), RAISE_NODE_ERRORS_CONFIG_KEY: True}}
+    stream = graph.astream(
+        graph_input,
+        config=config,
+        stream_mode=["updates", "values"],
+        subgraphs=True
+    )
+    async for namespace, mode, chunk in stream:
+        if mode == "values":
+            if not namespace:
+                yield "values", chunk
+            continue
+
+        for node_name, update in chunk.items():
+            yield "progress", _chunk_to_progress_event(node_name, namespace, update)
+
+
+class JobManager:
+    """
+    Runs master-graph executions as background asyncio tasks. Each run waits for a slot in
+    the fair scheduler under its job's tenant, like runs started by the other endpoints,
+    and stays pending until it gets one.
+    Keeps per-job progress events (from the graph's update stream, including subgraphs)
+    and fans them out to any number of live subscribers, e.g. SSE connections.
+    Finished jobs are kept for `result_ttl_seconds` and then forgotten.
+    The job id doubles as the run id, so with a checkpointing graph a failed job (or one
+    lost to a restart) can be resumed from its last completed node. A run that finishes
+    with an `error_message` counts as failed.
+    """
+
+    def __init__(
+        self,
+        get_graph: Callable[[], Any],
+        result_ttl_seconds: float = 3600,
+        max_jobs: int = 1000,
+        checkpointing: bool = False,
+        scheduler: Optional[FairScheduler] = None,
+    ):
+        self.get_graph = get_graph
+        self.scheduler = scheduler
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_jobs = max(max_jobs, 1)
+        self.checkpointing = checkpointing
+        self.jobs: Dict[str, Job] = {}
+
+    async def submit(self, graph_input: Dict[str, Any], tenant_id: str = DEFAULT_TENANT) -> Job:
+        """Registers a new job and starts it in the background. Returns immediately."""
+
+        self._prune()
+
+        job = Job(job_id=uuid.uuid4().hex, input=graph_input, tenant_id=tenant_id or DEFAULT_TENANT)
+        self.jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def resume(self, job_id: str) -> Optional[Job]:
+        """
+        Continues a checkpointed run from its last completed node, in the background.
+        Works for runs of this process and for runs left behind by an earlier one.
+        Returns None if no checkpoint exists for `job_id`.
+        """
+
+        if not self.checkpointing:
+            raise JobNotResumableError("Checkpointing is disabled; runs cannot be resumed.")
+
+        job = self.jobs.get(job_id)
+        if job is not None and not job.is_finished:
+            raise JobNotResumableError(f"Job '{job_id}' is still {job.status}.")
+
+        resume_config = await find_resume_config(self.get_graph(), job_id)
+        if resume_config is None:
+            return None
+
+        # Another resume may have started while the checkpoint was being read
+        job = self.jobs.get(job_id)
+        if job is not None and not job.is_finished:
+            raise JobNotResumableError(f"Job '{job_id}' is still {job.status}.")
+        if job is None:
+            self._prune()
+            job = Job(job_id=job_id, input=None)
+            self.jobs[job_id] = job
+
+        job.status = JOB_PENDING
+        job.resumed = True
+        job.resume_config = resume_config
+        job.result = None
+        job.error = None
+        self._publish(job, {
+            "node": None,
+            "status": JOB_PENDING,
+            "resumed_from": resume_config["configurable"].get("checkpoint_id", "latest"),
+            "timestamp": time.time()
+        })
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    def _publish(self, job: Job, event: Dict[str, Any]) -> None:
+        job.events.append(event)
+        job.updated_at = time.time()
+        for queue in job.subscribers:
+            queue.put_nowait(event)
+
+    async def _execute(self, job: Job) -> Dict[str, Any]:
+        """Streams the graph run, publishing its progress. Returns the final state."""
+
+        job.status = JOB_RUNNING
+        self._publish(job, {"node": None, "status": JOB_RUNNING, "timestamp": time.time()})
+
+        final_state: Optional[Dict[str, Any]] = None
+        # A resumed run passes no input, so the graph continues from its checkpoint
+        stream = stream_graph_progress(
+            self.get_graph(), None if job.resumed else job.input, job.job_id, job.resume_config
+        )
+        async for kind, payload in stream:
+            if kind == "values":
+                final_state = payload
+                continue
+
+            if "status_message" in payload:
+                job.status_message = payload["status_message"]
+            if "iteration_count" in payload:
+                job.iteration_count = payload["iteration_count"]
+            self._publish(job, payload)
+
+        return final_state or {}
+
+    async def _run(self, job: Job) -> None:
+        try:
+            if self.scheduler is not None:
+                job.result = await self.scheduler.run(job.tenant_id, lambda: self._execute(job))
+            else:
+                job.result = await self._execute(job)
+            # A node that reported an error instead of raising still fails the job (and keeps it resumable)
+            job.error = job.result.get("error_message")
+            job.status = JOB_FAILED if job.error else JOB_COMPLETED
+
+        except asyncio.CancelledError:
+            job.status = JOB_FAILED
+            job.error = "Job was cancelled."
+            raise
+
+        except Exception as e:
+            logger.exception("Job failed", extra={"job_id": job.job_id})
+            job.status = JOB_FAILED
+            job.error = str(e)
+
+        finally:
+            self._publish(job, {"node": None, "status": job.status, "error_message": job.error, "timestamp": time.time()})
+            for queue in job.subscribers:
+                queue.put_nowait(None)
+
+    async def subscribe(self, job: Job, keepalive_seconds: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yields the job's past events, then live events until the job finishes.
+        Yields None as a keep-alive when nothing happened for `keepalive_seconds`.
+        """
+
+        # Registering and snapshotting happen without an await in between,
+        # so every event is either in the snapshot or delivered through the queue
+        queue: asyncio.Queue = asyncio.Queue()
+        job.subscribers.append(queue)
+        history = list(job.events)
+        try:
+            for event in history:
+                yield event
+            if job.is_finished:
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+
+                if event is None:
+                    return
+                yield event
+        finally:
+            job.subscribers.remove(queue)
+
+    def _prune(self) -> None:
+        """Drops expired finished jobs, then the oldest finished jobs above `max_jobs`."""
+
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if job.is_finished and now - job.updated_at > self.result_ttl_seconds:
+                del self.jobs[job_id]
+
+        finished = sorted((job for job in self.jobs.values() if job.is_finished), key=lambda job: job.updated_at)
+        overflow = len(self.jobs) - self.max_jobs + 1
+        for job in finished[:max(overflow, 0)]:
+            del self.jobs[job.job_id]
+
+    async def shutdown(self) -> None:
+        """Cancels running jobs; called from the application lifespan on shutdown."""
+
+        tasks = [job.task for job in self.jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@lru_cache()
+def get_job_manager() -> Union[JobManager, "QueuedJobManager"]:
+    """
+    Returns the process-wide job manager: runs execute in this process, or in worker
+    processes behind the durable job queue when JOB_QUEUE_ENABLED is set.
+    """
+
+    # Imported here to keep this module free of graph imports
+    from app.graph.master_orchestrator_graph import get_compiled_master_orchestrator_graph
+
+    settings = get_settings()
+    if settings.JOB_QUEUE_ENABLED:
+        from app.core.job_queue import QueuedJobManager, get_job_queue
+
+        return QueuedJobManager(
+            get_job_queue(),
+            get_compiled_master_orchestrator_graph,
+            poll_interval_seconds=settings.JOB_QUEUE_POLL_INTERVAL_SECONDS,
+            checkpointing=settings.CHECKPOINT_ENABLED
+        )
+
+    return JobManager(
+        get_compiled_master_orchestrator_graph,
+        result_ttl_seconds=settings.JOB_RESULT_TTL_SECONDS,
+        max_jobs=settings.JOB_MAX_RETAINED,
+        checkpointing=settings.CHECKPOINT_ENABLED,
+        scheduler=get_graph_run_scheduler()
+    )
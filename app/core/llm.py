@@ -0,0 +1,102 @@
+from typing import Any, Dict, Optional
+from functools import lru_cache
+from uuid import UUID
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import LLMResult
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from app.core.config import Settings, get_settings
+from app.core.log import get_logger
+from app.core.metrics import LLM_REQUEST_DURATION, LLM_REQUESTS, LLM_TOKENS
+from app.utils.llm_cache import get_llm_cache
+
+logger = get_logger("llm")
+
+
+class LLMMetricsCallbackHandler(BaseCallbackHandler):
+    """Records the duration, outcome and token usage of every call to the chat model."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self._started_at: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started_at[run_id] = time.perf_counter()
+
+    def _finish(self, run_id: UUID, status: str) -> None:
+        started_at = self._started_at.pop(run_id, None)
+        if started_at is not None:
+            LLM_REQUEST_DURATION.observe(time.perf_counter() - started_at, model=self.model)
+        LLM_REQUESTS.inc(model=self.model, status=status)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "ok")
+
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                if usage.get("input_tokens"):
+                    LLM_TOKENS.inc(usage["input_tokens"], model=self.model, direction="input")
+                if usage.get("output_tokens"):
+                    LLM_TOKENS.inc(usage["output_tokens"], model=self.model, direction="output")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "error")
+
+
+def _create_rate_limiter(settings: Settings) -> Optional[InMemoryRateLimiter]:
+    if settings.LLM_RATE_PER_SECOND <= 0:
+        return None
+    return InMemoryRateLimiter(
+        requests_per_second=settings.LLM_RATE_PER_SECOND,
+        check_every_n_seconds=0.1,
+        max_bucket_size=settings.LLM_RATE_BURST
+    )
+
+
+@lru_cache()
+def get_llm() -> Optional[BaseChatModel]:
+    """
+    Returns the shared Gemini chat model (or the offline fake when LLM_PROVIDER="fake"),
+    or None if it cannot be created.
+    The client is built on first use (normally during application startup)
+    instead of at import time, and is shared by every agent node.
+    Its rate limiter is therefore one budget for all concurrent runs; cache hits do not use it.
+    """
+
+    settings = get_settings()
+
+    if settings.LLM_PROVIDER == "fake":
+        # Imported here so the load-test stand-ins are only loaded when selected
+        from app.loadtest.fakes import FakeChatModel
+
+        return FakeChatModel(
+            latency_seconds=settings.FAKE_LLM_LATENCY_SECONDS,
+            response_tokens=settings.FAKE_LLM_RESPONSE_TOKENS,
+            cache=get_llm_cache(),
+            rate_limiter=_create_rate_limiter(settings),
+            callbacks=[LLMMetricsCallbackHandler("fake")]
+        )
+
+    if not settings.GOOGLE_API_KEY or settings.GOOGLE_API_KEY == "API_KEY_PLACEHOLDER":
+        logger.error("GOOGLE_API_KEY not found.")
+        return None
+
+    try:
+        return ChatGoogleGenerativeAI(
+            model=settings.DEFAULT_LLM_MODEL,
+            google_api_key=settings.GOOGLE_API_KEY,
+            temperature=0.3,
+            convert_system_message_to_human=True,
+            cache=get_llm_cache(),
+            rate_limiter=_create_rate_limiter(settings),
+            callbacks=[LLMMetricsCallbackHandler(settings.DEFAULT_LLM_MODEL)]
+        )
+
+    except Exception as e:
+        logger.exception("Error initializing Google Generative AI LLM: %s", e)
+        return None
@@ -0,0 +1,91 @@
+"""
+Leveled, structured logging for the application.
+
+Loggers are plain `logging` loggers under the "deepchain" namespace. Keyword fields passed
+through `extra` are emitted as JSON keys (or key=value pairs in text mode). DEBUG and INFO
+records are sampled by LOG_SAMPLE_RATE (a record can override it with `extra={"sample_rate": ...}`);
+warnings and errors are always kept.
+"""
+
+from typing import Any, Dict
+import json
+import logging
+import random
+import sys
+
+from app.core.config import get_settings
+
+ROOT_LOGGER_NAME = "deepchain"
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_STANDARD_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "sample_rate", "taskName"}
+
+
+def _record_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in record.__dict__.items() if key not in _STANDARD_RECORD_ATTRIBUTES}
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_record_fields(record),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development, with extra fields as key=value pairs."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{key}={value}" for key, value in _record_fields(record).items())
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        if fields:
+            line += f" [{fields}]"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a random fraction of records below WARNING."""
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        sample_rate = getattr(record, "sample_rate", self.sample_rate)
+        return sample_rate >= 1.0 or random.random() < sample_rate
+
+
+def configure_logging() -> None:
+    """Sets up the "deepchain" logger from the settings. Safe to call more than once."""
+
+    settings = get_settings()
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(StructuredFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+    handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATE))
+
+    root_logger = logging.getLogger(ROOT_LOGGER_NAME)
+    root_logger.handlers = [handler]
+    root_logger.setLevel(settings.LOG_LEVEL.upper())
+    root_logger.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Returns a logger under the application namespace, e.g. get_logger("search")."""
+
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
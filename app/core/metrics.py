@@ -0,0 +1,285 @@
+"""
+Process-wide metrics in the Prometheus text exposition format, served at /metrics.
+
+A small built-in registry (counters, gauges and histograms with labels) keeps this free
+of extra dependencies. All metrics are module-level, so instrumented code just imports
+the metric it updates.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from contextlib import contextmanager
+import bisect
+import functools
+import math
+import threading
+import time
+
+# Latency buckets (seconds) covering cache hits through slow LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A monotonically increasing value per label set."""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """A value per label set that can go up and down."""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, plus their sum and count, per label set."""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        bucket_index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bucket_index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels: Any):
+        """Observes the duration of the `with` block (also when it raises)."""
+
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+
+        lines = self._header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(upper_bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+# Graph execution
+GRAPH_NODE_DURATION = histogram(
+    "deepchain_graph_node_duration_seconds", "Duration of graph node executions.", ("graph", "node")
+)
+GRAPH_NODE_RUNS = counter(
+    "deepchain_graph_node_runs_total", "Graph node executions by outcome.", ("graph", "node", "status")
+)
+GRAPH_RUNS_IN_PROGRESS = gauge(
+    "deepchain_graph_runs_in_progress", "Master graph runs currently executing."
+)
+GRAPH_RUNS_WAITING = gauge(
+    "deepchain_graph_runs_waiting", "Master graph runs waiting for a scheduler slot."
+)
+RESEARCH_ITERATIONS = histogram(
+    "deepchain_research_iterations", "Research loop iterations per run.", buckets=(1, 2, 3, 4, 5, 6, 8, 10)
+)
+RESEARCH_NEW_TOKENS = counter(
+    "deepchain_research_new_tokens_total", "Non-duplicate tokens added by research iterations."
+)
+
+# LLM
+LLM_REQUEST_DURATION = histogram(
+    "deepchain_llm_request_duration_seconds", "Duration of LLM calls (including cached answers).", ("model",)
+)
+LLM_REQUESTS = counter(
+    "deepchain_llm_requests_total", "LLM calls by outcome.", ("model", "status")
+)
+LLM_TOKENS = counter(
+    "deepchain_llm_tokens_total", "Tokens reported by the LLM provider.", ("model", "direction")
+)
+
+# Web search
+SEARCH_REQUEST_DURATION = histogram(
+    "deepchain_search_request_duration_seconds", "Duration of search backend calls.", ("backend", "status")
+)
+SEARCH_RETRIES = counter(
+    "deepchain_search_retries_total", "Search calls retried after every backend was rate-limited."
+)
+SEARCH_HEDGED_REQUESTS = counter(
+    "deepchain_search_hedged_requests_total", "Searches that also started a second backend because the first was slow."
+)
+SEARCH_BACKEND_CIRCUIT_OPEN = gauge(
+    "deepchain_search_backend_circuit_open", "1 while a search backend's circuit breaker is open.", ("backend",)
+)
+
+# Page fetches
+HTTP_FETCH_DURATION = histogram(
+    "deepchain_http_fetch_duration_seconds", "Duration of page fetches by HTTP cache status.", ("cache_status",)
+)
+HTTP_FETCH_BYTES = counter(
+    "deepchain_http_fetch_bytes_total", "Body bytes of fetched pages by HTTP cache status.", ("cache_status",)
+)
+HTTP_FETCH_ERRORS = counter(
+    "deepchain_http_fetch_errors_total", "Page fetches that failed, by error kind.", ("kind",)
+)
+
+# Caches (cache: llm, search, http, request; result: hit, miss, stale, ...)
+CACHE_REQUESTS = counter(
+    "deepchain_cache_requests_total", "Cache lookups by cache and result.", ("cache", "result")
+)
+
+
+def instrument_node(graph: str, node: str, node_function: Callable[..., Awaitable[Dict[str, Any]]]):
+    """
+    Wraps an async graph node so its duration and outcome are recorded.
+    A node that returns an `error_message` counts as status="error", one that raises as "exception".
+    """
+
+    @functools.wraps(node_function)
+    async def instrumented_node(state, *args, **kwargs):
+        started_at = time.perf_counter()
+        status = "exception"
+        try:
+            result = await node_function(state, *args, **kwargs)
+            status = "error" if isinstance(result, dict) and result.get("error_message") else "ok"
+            return result
+        finally:
+            GRAPH_NODE_DURATION.observe(time.perf_counter() - started_at, graph=graph, node=node)
+            GRAPH_NODE_RUNS.inc(graph=graph, node=node, status=status)
+
+    return instrumented_node
@@ -0,0 +1,218 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+import asyncio
+import hashlib
+import json
+import time
+
+from app.core.config import get_settings
+from app.core.log import get_logger
+from app.core.metrics import CACHE_REQUESTS
+
+logger = get_logger("request_cache")
+
+# How a request was answered
+CACHE_HIT = "hit"
+CACHE_STALE = "stale"
+CACHE_MISS = "miss"
+CACHE_COALESCED = "coalesced"
+CACHE_BYPASS = "bypass"
+
+
+def make_request_cache_key(topic: str, reference_urls: Iterable[str], bypass_local_index: bool = False) -> str:
+    """
+    Cache key of a document generation request. The topic is normalized like search
+    queries (case, unicode form, whitespace, edge punctuation) and the reference URLs are
+    normalized, de-duplicated and sorted, so trivially different requests share an entry.
+    Results researched without the local index are kept apart from the others.
+    """
+
+    # Imported here so this module stays free of the scraping/search stack
+    from app.agents.scrapping_agent_nodes import normalize_url
+    from app.tools.search_cache import normalize_query
+
+    payload = {
+        "topic": normalize_query(topic),
+        "reference_urls": sorted({normalize_url(url) for url in reference_urls if url.strip()}),
+    }
+    if bypass_local_index:
+        payload["bypass_local_index"] = True
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _CachedResult:
+    value: Any
+    created_at: float
+
+
+class RequestResultCache:
+    """
+    Request-level cache in front of whole graph executions.
+
+    - Single-flight: concurrent requests with the same key share one execution. Bypassing
+      requests only share with each other, never with a run that may use cached LLM responses.
+    - Results are fresh for `ttl_seconds`; for `stale_seconds` after that they are still
+      served immediately while one background execution refreshes the entry.
+    - At most `max_entries` results are kept (least recently used are dropped).
+    Results the `is_cacheable` predicate rejects (e.g. runs that reported an error) are
+    returned to the waiting callers but not stored.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 3600,
+        stale_seconds: float = 86400,
+        max_entries: int = 256,
+        is_cacheable: Optional[Callable[[Any], bool]] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max(max_entries, 1)
+        self.is_cacheable = is_cacheable or (lambda value: True)
+
+        self._entries: "OrderedDict[str, _CachedResult]" = OrderedDict()
+        # (key, bypass) -> the running execution
+        self._in_flight: Dict[Tuple[str, bool], asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+
+        self.counts: Dict[str, int] = {
+            CACHE_HIT: 0, CACHE_STALE: 0, CACHE_MISS: 0, CACHE_COALESCED: 0, CACHE_BYPASS: 0
+        }
+
+    def _lookup(self, key: str, now: float) -> Tuple[Optional[_CachedResult], bool]:
+        """Returns the usable entry (if any) and whether it is still fresh."""
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+
+        age = now - entry.created_at
+        if age > self.ttl_seconds + self.stale_seconds:
+            del self._entries[key]
+            return None, False
+
+        self._entries.move_to_end(key)
+        return entry, age <= self.ttl_seconds
+
+    def _store(self, key: str, value: Any) -> bool:
+        if not self.is_cacheable(value):
+            return False
+        self._entries[key] = _CachedResult(value=value, created_at=time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def _start(self, key: str, runner: Callable[[], Awaitable[Any]], bypass: bool = False) -> asyncio.Task:
+        """Starts (or joins) the single execution for `key` and `bypass`."""
+
+        flight_key = (key, bypass)
+        task = self._in_flight.get(flight_key)
+        if task is not None:
+            return task
+
+        async def _execute() -> Any:
+            try:
+                value = await runner()
+                self._store(key, value)
+                return value
+            finally:
+                self._in_flight.pop(flight_key, None)
+
+        task = asyncio.create_task(_execute())
+        self._in_flight[flight_key] = task
+        return task
+
+    def _revalidate(self, key: str, runner: Callable[[], Awaitable[Any]]) -> None:
+        if (key, False) in self._in_flight:
+            return
+
+        task = self._start(key, runner)
+        self._background.add(task)
+
+        def _done(finished: asyncio.Task) -> None:
+            self._background.discard(finished)
+            if not finished.cancelled() and finished.exception() is not None:
+                logger.warning("Background refresh failed: %s", finished.exception())
+
+        task.add_done_callback(_done)
+
+    async def get_or_run(self, key: str, runner: Callable[[], Awaitable[Any]], bypass: bool = False) -> Tuple[Any, str]:
+        """
+        Returns `(value, cache_status)` for `key`, running `runner` only when needed.
+        With `bypass`, cached results are ignored (the fresh result still replaces them), and
+        only an in-flight execution started by another bypassing request is shared.
+        """
+
+        if not bypass:
+            entry, fresh = self._lookup(key, time.time())
+            if entry is not None:
+                if fresh:
+                    self.counts[CACHE_HIT] += 1
+                    CACHE_REQUESTS.inc(cache="request", result=CACHE_HIT)
+                    return entry.value, CACHE_HIT
+                self.counts[CACHE_STALE] += 1
+                CACHE_REQUESTS.inc(cache="request", result=CACHE_STALE)
+                self._revalidate(key, runner)
+                return entry.value, CACHE_STALE
+
+        status = CACHE_COALESCED if (key, bypass) in self._in_flight else (CACHE_BYPASS if bypass else CACHE_MISS)
+        self.counts[status] += 1
+        CACHE_REQUESTS.inc(cache="request", result=status)
+
+        # Shielded, so one caller disconnecting does not cancel the run the others wait for
+        value = await asyncio.shield(self._start(key, runner, bypass))
+        return value, status
+
+    def get_fresh(self, key: str) -> Optional[Any]:
+        """
+        Returns the fresh cached value for `key`, or None. Never runs or joins an execution;
+        for callers that run the work themselves (e.g. streaming responses) and `put` the result.
+        """
+
+        entry, fresh = self._lookup(key, time.time())
+        if entry is None or not fresh:
+            return None
+
+        self.counts[CACHE_HIT] += 1
+        CACHE_REQUESTS.inc(cache="request", result=CACHE_HIT)
+        return entry.value
+
+    def put(self, key: str, value: Any) -> bool:
+        """Stores a result produced outside `get_or_run` if `is_cacheable` accepts it. Returns whether it was stored."""
+
+        return self._store(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            **self.counts,
+        }
+
+    async def shutdown(self) -> None:
+        """Cancels running executions; called from the application lifespan on shutdown."""
+
+        tasks = list(self._in_flight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@lru_cache()
+def get_request_cache() -> RequestResultCache:
+    """
+    Returns the process-wide request result cache for /document/generate.
+    Values are (run_id, final_state) pairs; empty states and runs that reported an error are not cached.
+    """
+
+    settings = get_settings()
+    return RequestResultCache(
+        ttl_seconds=settings.REQUEST_CACHE_TTL_SECONDS,
+        stale_seconds=settings.REQUEST_CACHE_STALE_SECONDS,
+        max_entries=settings.REQUEST_CACHE_MAX_ENTRIES,
+        is_cacheable=lambda value: bool(value[1]) and not value[1].get("error_message"),
+    )
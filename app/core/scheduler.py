@@ -0,0 +1,104 @@
+from typing import Any, Awaitable, Callable, Deque, Dict
+from collections import OrderedDict, deque
+from functools import lru_cache
+import asyncio
+
+from app.core.config import get_settings
+from app.core.metrics import GRAPH_RUNS_IN_PROGRESS, GRAPH_RUNS_WAITING
+
+DEFAULT_TENANT = "default"
+
+
+class FairScheduler:
+    """
+    Limits how many graph runs execute at once, across every endpoint that uses it.
+    Waiting runs are queued per tenant and slots are handed out round-robin over the
+    tenants, so one tenant submitting a large batch cannot starve the others.
+    Within a tenant, runs start in submission order.
+    """
+
+    def __init__(self, max_concurrency: int = 4):
+        self.max_concurrency = max(max_concurrency, 1)
+        self._running = 0
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    def _waiting_count(self) -> int:
+        return sum(len(queue) for queue in self._waiting.values())
+
+    def _update_gauges(self) -> None:
+        GRAPH_RUNS_IN_PROGRESS.set(self._running)
+        GRAPH_RUNS_WAITING.set(self._waiting_count())
+
+    def _dispatch(self) -> None:
+        """Grants free slots to waiting runs, one tenant at a time in rotation."""
+
+        while self._running < self.max_concurrency and self._waiting:
+            tenant, queue = next(iter(self._waiting.items()))
+            waiter = queue.popleft()
+            if queue:
+                self._waiting.move_to_end(tenant)
+            else:
+                del self._waiting[tenant]
+
+            if waiter.done():  # cancelled while waiting
+                continue
+            self._running += 1
+            waiter.set_result(None)
+        self._update_gauges()
+
+    def _drop_waiter(self, tenant: str, waiter: asyncio.Future) -> None:
+        queue = self._waiting.get(tenant)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self._waiting[tenant]
+        self._update_gauges()
+
+    async def _acquire(self, tenant: str) -> None:
+        if self._running < self.max_concurrency and not self._waiting:
+            self._running += 1
+            self._update_gauges()
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(tenant, deque()).append(waiter)
+        self._update_gauges()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # If the slot was granted just before the cancellation, hand it on;
+            # otherwise stop queueing (and counting) the run
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                self._drop_waiter(tenant, waiter)
+            raise
+
+    def _release(self) -> None:
+        self._running -= 1
+        self._dispatch()
+
+    async def run(self, tenant: str, run: Callable[[], Awaitable[Any]]) -> Any:
+        """Waits for a slot (fairly, per tenant), then awaits `run()`."""
+
+        await self._acquire(tenant or DEFAULT_TENANT)
+        try:
+            return await run()
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "waiting": self._waiting_count(),
+            "waiting_by_tenant": {tenant: len(queue) for tenant, queue in self._waiting.items()},
+        }
+
+
+@lru_cache()
+def get_graph_run_scheduler() -> FairScheduler:
+    """Returns the process-wide scheduler for graph runs started through the API."""
+
+    return FairScheduler(get_settings().GRAPH_RUN_MAX_CONCURRENCY)
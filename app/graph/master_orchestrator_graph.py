@@ -1,102 +1,161 @@
-from langgraph.graph import StateGraph, END
+from typing import Optional
+from functools import lru_cache
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import StateGraph, START, END
+from app.core.jobs import raises_node_errors
+from app.core.log import get_logger
+from app.core.metrics import instrument_node
 from app.schemas.document_schemas import ResearchState
 
 # Import subgraphs
-from app.graph.subgraphs.research_graph import compiled_research_subgraph
-from app.graph.subgraphs.scraping_graph import compiled_scraping_subgraph
+from app.graph.subgraphs.research_graph import get_compiled_research_subgraph
+from app.graph.subgraphs.scraping_graph import get_compiled_scraping_subgraph
 
 # Import nodes
 from app.agents.synthesis_nodes import synthesize_information_node
+from app.utils.checkpointer import get_checkpointer
+
+logger = get_logger("master")
+
+# Keys each phase owns. The phases run in parallel, so each one only returns its own keys
+# (plus the reducer-backed status/error messages) to avoid conflicting writes at the join.
+RESEARCH_PHASE_OUTPUT_KEYS = (
+    "generated_search_queries",
+    "search_queries_history",
+    "raw_search_results",
+    "search_iteration_stats",
+    "scraped_content_from_search",
+    "iteration_count",
+    "critique_feedback",
+    "is_information_sufficient",
+)
+SCRAPING_PHASE_OUTPUT_KEYS = (
+    "scraped_content_from_references",
+    "extracted_text_from_references",
+)
+
+# List fields with the `append_items` reducer: only the items a phase added are forwarded
+APPENDED_STATE_KEYS = (
+    "search_queries_history",
+    "raw_search_results",
+    "search_iteration_stats",
+    "scraped_content_from_references",
+    "scraped_content_from_search",
+)
+
 
-async def invoke_research_subgraph_node(state: ResearchState) -> dict:
+def select_phase_output(subgraph_final_state: dict, owned_keys: tuple, subgraph_input: ResearchState) -> dict:
+    """
+    Reduces a sub-graph's final state to the keys its phase owns, as a delta against its input.
+    The error message is only forwarded when set, so a clean branch never clears the other's error.
+    """
+
+    phase_output = {}
+    for key in owned_keys:
+        if key not in subgraph_final_state:
+            continue
+        value = subgraph_final_state[key]
+        if key in APPENDED_STATE_KEYS:
+            value = value[len(getattr(subgraph_input, key)):]
+        phase_output[key] = value
+    if subgraph_final_state.get("status_message"):
+        phase_output["status_message"] = subgraph_final_state["status_message"]
+    if subgraph_final_state.get("error_message"):
+        phase_output["error_message"] = subgraph_final_state["error_message"]
+    return phase_output
+
+
+async def invoke_research_subgraph_node(state: ResearchState, config: Optional[RunnableConfig] = None) -> dict:
     """
     This node in the master graph is responsible for invoking the compiled research sub-graph.
+    A failure is reported as an error state, or raised for job runs (see RAISE_NODE_ERRORS_CONFIG_KEY).
     """
 
-    subgraph_input = state.model_dump()
+    # Passed as-is: a model_dump() would deep-copy every list in the state
+    subgraph_input = state
 
     try: 
-        print(f"\n Invoking research sub-graph with input: {subgraph_input} \n")
-        research_subgraph_final_state_dict = await compiled_research_subgraph.ainvoke(subgraph_input)
-        
+        logger.info("Invoking research sub-graph", extra={"topic": state.initial_topic[:50]})
+        research_subgraph_final_state_dict = await get_compiled_research_subgraph().ainvoke(subgraph_input)
 
-        return research_subgraph_final_state_dict
+        return select_phase_output(research_subgraph_final_state_dict, RESEARCH_PHASE_OUTPUT_KEYS, subgraph_input)
 
     except Exception as e:
-        print(f"Master Graph: Error invoking research sub-graph: {e} ")
-        import traceback
-        traceback.print_exc()
+        if raises_node_errors(config):
+            logger.warning("Error invoking research sub-graph: %s", e)
+            # The run stops before this node, so a retry or resume runs the phase again
+            raise RuntimeError(f"Research Sub-Graph Error: {e}") from e
+        logger.exception("Error invoking research sub-graph")
         return {
             "status_message": f"Error during research sub-graph execution: {str(e)}",
             "error_message": f"Research Sub-Graph Error: {str(e)}"
         }
 
-async def invoke_scraping_subgraph_node(state: ResearchState) -> dict:
+async def invoke_scraping_subgraph_node(state: ResearchState, config: Optional[RunnableConfig] = None) -> dict:
     """
     This node in the master graph is responsible for invoking the compiled scraping sub-graph.
+    It runs in parallel with the research phase and returns nothing when there are no reference URLs.
+    A failure is reported as an error state, or raised for job runs (see RAISE_NODE_ERRORS_CONFIG_KEY).
     """
 
+    if not state.reference_urls:
+        return {}
+
     subgraph_input = state
 
     try:
-        print(f"\n Invoking scraping sub-graph with input: {subgraph_input} \n")
-        scraping_subgraph_final_state: ResearchState = await compiled_scraping_subgraph.ainvoke(subgraph_input)
-        return scraping_subgraph_final_state
+        logger.info("Invoking scraping sub-graph", extra={"url_count": len(state.reference_urls)})
+        scraping_subgraph_final_state = await get_compiled_scraping_subgraph().ainvoke(subgraph_input)
+        return select_phase_output(scraping_subgraph_final_state, SCRAPING_PHASE_OUTPUT_KEYS, subgraph_input)
     
     except Exception as e:
-        print(f"Master Graph: Error invoking scraping sub-graph: {e} ")
-        import traceback
-        traceback.print_exc()
+        if raises_node_errors(config):
+            logger.warning("Error invoking scraping sub-graph: %s", e)
+            # The run stops before this node, so a retry or resume runs the phase again
+            raise RuntimeError(f"Scraping Sub-Graph Error: {e}") from e
+        logger.exception("Error invoking scraping sub-graph")
         return {
             "status_message": f"Error during scraping sub-graph execution: {str(e)}",
             "error_message": f"Scraping Sub-Graph Error: {str(e)}"
         }
 
 
-# Create the master orchestrator graph that combines all subgraphs.
-master_workflow = StateGraph(ResearchState)
+def build_master_orchestrator_graph() -> StateGraph:
+    """
+    Builds the (uncompiled) master orchestrator graph that combines all subgraphs.
+    The research and scraping phases are independent (scraping only needs the user's
+    reference URLs), so they fan out in parallel and join before synthesis.
+    """
 
-# Add nodes to the master workflow graph.
-master_workflow.add_node("research_phase", invoke_research_subgraph_node)
-master_workflow.add_node("scraping_phase", invoke_scraping_subgraph_node)
-master_workflow.add_node("synthesize_information_node", synthesize_information_node)
+    # Create the master orchestrator graph that combines all subgraphs.
+    master_workflow = StateGraph(ResearchState)
 
-# Set entry point of the main graph
-master_workflow.set_entry_point("research_phase")
+    # Add nodes to the master workflow graph.
+    master_workflow.add_node("research_phase", instrument_node("master", "research_phase", invoke_research_subgraph_node))
+    master_workflow.add_node("scraping_phase", instrument_node("master", "scraping_phase", invoke_scraping_subgraph_node))
+    master_workflow.add_node(
+        "synthesize_information_node",
+        instrument_node("master", "synthesize_information_node", synthesize_information_node)
+    )
 
-# Define the conditional logic after research_phase
-def should_scrape_references(state: ResearchState) -> str:
-    """
-    Decides if we need to run the scraping subgraph.
-    """
+    # Fan out: both phases start together
+    master_workflow.add_edge(START, "research_phase")
+    master_workflow.add_edge(START, "scraping_phase")
 
-    # Check for errors from the research phase first
-    if state.error_message and "Research Sub-Graph Error" in state.error_message:
-        return "synthesize_information_node"
-
-    if state.reference_urls and len(state.reference_urls) > 0:
-        return "scraping_phase"
-    else:
-        return "synthesize_information_node"
-
-master_workflow.add_conditional_edges(
-    "research_phase",
-    should_scrape_references,
-    {
-        "scraping_phase": "scraping_phase",
-        "synthesize_information_node": "synthesize_information_node"
-    }
-)
+    # Join: synthesis waits for both phases to finish
+    master_workflow.add_edge(["research_phase", "scraping_phase"], "synthesize_information_node")
+    master_workflow.add_edge("synthesize_information_node", END)
+
+    return master_workflow
 
-master_workflow.add_edge("scraping_phase", "synthesize_information_node")
-master_workflow.add_edge("synthesize_information_node", END)
 
-# Compile the master workflow into a runnable application.
-compiled_master_orchestrator_graph = master_workflow.compile()
+@lru_cache()
+def get_compiled_master_orchestrator_graph():
+    """
+    Returns the compiled master orchestrator graph, compiling it on first use.
+    Called from the application lifespan hook so the cost is paid once at startup.
+    With checkpointing enabled every run needs a `thread_id` (the run id) in its config;
+    the sub-graphs inherit the checkpointer when invoked from the phase nodes.
+    """
 
-try:
-    img_bytes = compiled_master_orchestrator_graph.get_graph(xray=True).draw_mermaid_png()
-    with open("master_graph.png", "wb") as f:
-        f.write(img_bytes)
-except Exception as e:
-    print(f"Could not generate graph visualization for iterative_research_subgraph")
+    return build_master_orchestrator_graph().compile(checkpointer=get_checkpointer())
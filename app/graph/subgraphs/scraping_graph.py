@@ -1,29 +1,44 @@
+from functools import lru_cache
 from langgraph.graph import StateGraph, END
 
+from app.core.metrics import instrument_node
 from app.schemas.document_schemas import ResearchState
 from app.agents.scrapping_agent_nodes import (
     scrape_reference_urls_node,
     extract_text_from_scraped_content_node
 )
 
-scrapping_workflow = StateGraph(ResearchState)
 
-# Add nodes to the scrapping workflow
-scrapping_workflow.add_node("scrape_reference_urls", scrape_reference_urls_node)
-scrapping_workflow.add_node("extract_text_from_scraped_content", extract_text_from_scraped_content_node)
+def build_scraping_subgraph() -> StateGraph:
+    """
+    Builds the (uncompiled) reference scraping sub-graph.
+    """
 
-scrapping_workflow.set_entry_point("scrape_reference_urls")
+    scrapping_workflow = StateGraph(ResearchState)
 
-# Define edges
-scrapping_workflow.add_edge("scrape_reference_urls", "extract_text_from_scraped_content")
-scrapping_workflow.add_edge("extract_text_from_scraped_content", END)
+    # Add nodes to the scrapping workflow
+    scrapping_workflow.add_node(
+        "scrape_reference_urls",
+        instrument_node("scraping", "scrape_reference_urls", scrape_reference_urls_node)
+    )
+    scrapping_workflow.add_node(
+        "extract_text_from_scraped_content",
+        instrument_node("scraping", "extract_text_from_scraped_content", extract_text_from_scraped_content_node)
+    )
 
-compiled_scraping_subgraph = scrapping_workflow.compile()
+    scrapping_workflow.set_entry_point("scrape_reference_urls")
 
-# Visualize the compiled scraping sub-graph
-try:
-    img_bytes = compiled_scraping_subgraph.get_graph(xray=True).draw_mermaid_png()
-    with open("scraping_subgraph.png", "wb") as f:
-        f.write(img_bytes)
-except Exception as e:
-    print(f"Could not generate graph visualization for scraping subgraph: {e}")
\ No newline at end of file
+    # Define edges
+    scrapping_workflow.add_edge("scrape_reference_urls", "extract_text_from_scraped_content")
+    scrapping_workflow.add_edge("extract_text_from_scraped_content", END)
+
+    return scrapping_workflow
+
+
+@lru_cache()
+def get_compiled_scraping_subgraph():
+    """
+    Returns the compiled scraping sub-graph, compiling it on first use.
+    """
+
+    return build_scraping_subgraph().compile()
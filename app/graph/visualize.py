@@ -0,0 +1,67 @@
+"""
+Offline command for rendering the graph diagrams.
+
+Usage:
+    python -m app.graph.visualize [--output-dir DIR] [--png]
+
+Writes Mermaid sources (no network needed). With --png it also renders PNG files,
+which uses the remote Mermaid renderer and therefore needs network access.
+"""
+
+from typing import List
+import argparse
+import os
+import sys
+
+from app.graph.master_orchestrator_graph import get_compiled_master_orchestrator_graph
+from app.graph.subgraphs.research_graph import get_compiled_research_subgraph
+from app.graph.subgraphs.scraping_graph import get_compiled_scraping_subgraph
+
+GRAPHS = {
+    "master_graph": get_compiled_master_orchestrator_graph,
+    "iterative_research_subgraph": get_compiled_research_subgraph,
+    "scraping_subgraph": get_compiled_scraping_subgraph,
+}
+
+
+def render_graphs(output_dir: str, png: bool = False) -> List[str]:
+    """
+    Renders every graph into `output_dir` and returns the written file paths.
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    written_files = []
+
+    for name, get_compiled_graph in GRAPHS.items():
+        graph = get_compiled_graph().get_graph(xray=True)
+
+        mermaid_path = os.path.join(output_dir, f"{name}.mmd")
+        with open(mermaid_path, "w", encoding="utf-8") as f:
+            f.write(graph.draw_mermaid())
+        written_files.append(mermaid_path)
+
+        if png:
+            try:
+                png_path = os.path.join(output_dir, f"{name}.png")
+                with open(png_path, "wb") as f:
+                    f.write(graph.draw_mermaid_png())
+                written_files.append(png_path)
+            except Exception as e:
+                print(f"Could not generate PNG visualization for {name}: {e}")
+
+    return written_files
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Render the DeepChain graph diagrams.")
+    parser.add_argument("--output-dir", default=".", help="Directory to write the diagrams to.")
+    parser.add_argument("--png", action="store_true", help="Also render PNG files (requires network access).")
+    args = parser.parse_args(argv)
+
+    for path in render_graphs(args.output_dir, png=args.png):
+        print(f"Wrote {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Deterministic offline stand-ins for the external services, used by the load-test harness
+(LLM_PROVIDER=fake, SEARCH_BACKENDS=["fake"]). Answers depend only on the input, so repeated
+runs do the same work.
+"""
+
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+import asyncio
+import re
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.loadtest.fixture_server import fake_sentences, text_digest
+from app.tools.web_search import make_search_result
+from app.utils.tokens import estimate_tokens
+
+QUERY_ANGLES = ("overview", "recent developments", "criticism", "statistics", "history", "case studies")
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers after `latency_seconds` without any network access.
+    Query-generation prompts get search queries for the topic; every other prompt gets a
+    short deterministic "synthesis" of roughly `response_tokens` tokens.
+    Streaming yields the first chunk after `latency_seconds` and the rest in chunks of
+    `stream_chunk_words` words, `stream_interval_seconds` apart.
+    """
+
+    latency_seconds: float = 0.5
+    response_tokens: int = 400
+    stream_chunk_words: int = 8
+    stream_interval_seconds: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"latency_seconds": self.latency_seconds, "response_tokens": self.response_tokens}
+
+    def _respond(self, messages: Sequence[BaseMessage]) -> str:
+        prompt = "\n".join(str(message.content) for message in messages)
+
+        if "search engine queries" in prompt:
+            topic_match = re.search(r"Topic: (.*)", prompt)
+            topic = topic_match.group(1).strip() if topic_match else "topic"
+            # Later iterations list the queries already run; ask about new angles instead
+            queries = [f"{topic} {angle}" for angle in QUERY_ANGLES if f"{topic} {angle}\n" not in prompt]
+            return "\n".join(queries[:3] or [f"{topic} {angle} details" for angle in QUERY_ANGLES[:3]])
+
+        sentence_count = max(self.response_tokens // 12, 1)
+        return " ".join(fake_sentences(prompt, sentence_count))
+
+    def _usage(self, messages: Sequence[BaseMessage], text: str) -> Dict[str, int]:
+        input_tokens = sum(estimate_tokens(str(message.content)) for message in messages)
+        output_tokens = estimate_tokens(text)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _result(self, messages: Sequence[BaseMessage]) -> ChatResult:
+        text = self._respond(messages)
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency_seconds)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency_seconds)
+        return self._result(messages)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_seconds)
+
+        text = self._respond(messages)
+        words = text.split(" ")
+        step = max(self.stream_chunk_words, 1)
+        for start in range(0, len(words), step):
+            if start:
+                await asyncio.sleep(self.stream_interval_seconds)
+            piece = " ".join(words[start:start + step]) + (" " if start + step < len(words) else "")
+            # Usage is reported once, on the last chunk, like the real providers
+            usage = self._usage(messages, text) if start + step >= len(words) else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+
+class FakeSearchBackend:
+    """
+    Search backend returning `results_per_query` snippets whose links point at the local
+    fixture server (`base_url`), so the search-hit scraper fetches real pages over HTTP.
+    Page sizes cycle through `page_sizes`. Synchronous, like the real backend.
+    """
+
+    def __init__(self, base_url: str, latency_seconds: float = 0.3, results_per_query: int = 5, page_sizes: Sequence[int] = (20_000,)):
+        self.base_url = base_url.rstrip("/")
+        self.latency_seconds = latency_seconds
+        self.results_per_query = results_per_query
+        self.page_sizes = tuple(page_sizes) or (20_000,)
+
+    def search(self, query: str) -> Dict[str, Any]:
+        time.sleep(self.latency_seconds)
+
+        seed = text_digest(query)
+        snippets = fake_sentences(query, self.results_per_query * 2)
+        links = []
+        for index in range(self.results_per_query):
+            size = self.page_sizes[(seed + index) % len(self.page_sizes)]
+            links.append({
+                "title": f"{query} ({index + 1})",
+                "url": f"{self.base_url}/pages/{seed % 100_000:05d}-{index}-{size}.html",
+            })
+        return make_search_result(" ".join(snippets), links)
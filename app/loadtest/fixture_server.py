@@ -0,0 +1,156 @@
+"""
+Local HTTP server serving generated fixture pages for the load-test harness.
+
+Usage:
+    python -m app.loadtest.fixture_server [--host HOST] [--port PORT]
+
+`GET /pages/<name>-<size>.html` returns an HTML article of about `<size>` bytes whose
+text is derived from `<name>`, so the same URL always returns the same page.
+"""
+
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+import argparse
+import hashlib
+import re
+import sys
+import threading
+
+_PAGE_PATH = re.compile(r"^/pages/(?P<name>[\w-]+)-(?P<size>\d+)\.html$")
+
+_WORDS = (
+    "analysis", "market", "energy", "policy", "network", "model", "research", "growth", "impact", "system",
+    "climate", "data", "urban", "health", "design", "supply", "trade", "learning", "capacity", "risk",
+    "evidence", "survey", "regional", "signal", "storage", "outcome", "pricing", "adoption", "sector", "trend",
+)
+
+
+def text_digest(text: str) -> int:
+    """Stable 64-bit integer derived from `text`."""
+
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+def fake_sentences(seed: str, count: int) -> List[str]:
+    """Pseudo-random but reproducible sentences for `seed`."""
+
+    sentences = []
+    state = text_digest(seed)
+    for index in range(count):
+        words = []
+        for _ in range(8 + (state + index) % 9):
+            state = (state * 6364136223846793005 + 1442695040888963407) & 0xFFFFFFFFFFFFFFFF
+            words.append(_WORDS[(state >> 33) % len(_WORDS)])
+        sentences.append(" ".join(words).capitalize() + ".")
+    return sentences
+
+
+# Upper bound on a single fixture page, so a bad URL cannot make the server allocate gigabytes
+MAX_PAGE_BYTES = 10 * 1024 * 1024
+
+
+@lru_cache(maxsize=256)
+def render_fixture_page(name: str, size: int) -> bytes:
+    """Builds a deterministic HTML page of roughly `size` bytes (never less)."""
+
+    head = f"<!DOCTYPE html><html><head><title>Fixture {name}</title></head><body><article><h1>Fixture {name}</h1>"
+    tail = "</article><footer>Fixture footer</footer></body></html>"
+
+    paragraphs = []
+    length = len(head) + len(tail)
+    batch = 0
+    while length < size:
+        for sentence_group in _chunks(fake_sentences(f"{name}:{batch}", 24), 4):
+            paragraph = "<p>" + " ".join(sentence_group) + "</p>"
+            paragraphs.append(paragraph)
+            length += len(paragraph)
+            if length >= size:
+                break
+        batch += 1
+
+    return (head + "".join(paragraphs) + tail).encode("utf-8")
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class _FixtureRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        match = _PAGE_PATH.match(self.path.split("?", 1)[0])
+        if match is None or int(match["size"]) > MAX_PAGE_BYTES:
+            self.send_error(404)
+            return
+
+        body = render_fixture_page(match["name"], int(match["size"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Keep the load-test output readable
+        pass
+
+
+class FixtureServer:
+    """Runs the fixture HTTP server on a background thread; usable as a context manager."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = ThreadingHTTPServer((host, port), _FixtureRequestHandler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self) -> None:
+        """Serves on the calling thread until interrupted."""
+
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fixture-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve generated fixture pages for the load test.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    server = FixtureServer(args.host, args.port)
+    print(f"Serving fixture pages at {server.base_url}/pages/<name>-<size>.html", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
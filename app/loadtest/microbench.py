@@ -0,0 +1,282 @@
+"""
+Micro-benchmarks for the CPU-bound pipeline stages.
+
+Usage:
+    python -m app.loadtest.microbench [--stage NAME ...] [--repeat 5]
+                                      [--output results.json] [--baseline previous.json] [--tolerance 0.2]
+
+Every stage runs against generated fixture corpora (small and large HTML pages, hundreds of
+search result sets, small and large graph states); the corpora are the same on every run.
+For each stage it reports operations per second (best of --repeat timing rounds) and the
+peak and retained memory allocated by one operation (via tracemalloc).
+Exits with status 1 when a stage is slower, or allocates more, than the baseline by more
+than the tolerance. The baseline defaults to the committed `microbench_baseline.json`
+(written with --output); refresh it on the machine you compare on, as timings are only
+comparable on the same machine. Pass an empty --baseline to skip the comparison.
+The blob store and local index the stages write to live in a temporary directory.
+"""
+
+from typing import Any, Callable, Dict, List
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+from app.loadtest.fixture_server import fake_sentences, render_fixture_page
+
+SEARCH_RESULT_SETS = 300
+PAGES = 20
+# Result sets per research iteration in the `research_new_tokens` stage
+RESULT_SETS_PER_ITERATION = 15
+TOPIC = "grid scale energy storage adoption"
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "microbench_baseline.json")
+
+
+def build_corpus() -> Dict[str, Any]:
+    """Deterministic inputs shared by the stages."""
+
+    search_results = []
+    for index in range(SEARCH_RESULT_SETS):
+        query = f"{TOPIC} angle {index}"
+        # Neighbouring result sets overlap, like real results for related queries
+        sentences = fake_sentences(f"results:{index // 3}", 6) + fake_sentences(f"results:{index}", 6)
+        search_results.append({
+            "query": query,
+            "content_summary": " ".join(sentences),
+            "links": [{"title": f"{query} {rank}", "url": f"https://site{rank}.example/{index}"} for rank in range(5)],
+        })
+
+    reference_texts = [
+        {"url": f"https://ref.example/{index}", "title": f"Reference {index}", "extracted_text": " ".join(fake_sentences(f"ref:{index}", 120))}
+        for index in range(PAGES)
+    ]
+    # Raw bodies of the reference pages, which the extraction node reads back from the blob store
+    reference_html = [render_fixture_page(f"ref:{index}", 20_000) for index in range(PAGES)]
+    search_page_texts = [
+        {"url": f"https://page.example/{index}", "title": f"Page {index}", "extracted_text": " ".join(fake_sentences(f"page:{index}", 120))}
+        for index in range(PAGES)
+    ]
+
+    def state(result_sets: int, pages: int) -> Dict[str, Any]:
+        return {
+            "initial_topic": TOPIC,
+            "reference_urls": [ref["url"] for ref in reference_texts[:pages]],
+            "raw_search_results": search_results[:result_sets],
+            "search_queries_history": [
+                {"query": res["query"], "results_summary": res["content_summary"]} for res in search_results[:result_sets]
+            ],
+            "scraped_content_from_references": [
+                {"url": ref["url"], "content_ref": hashlib.sha256(html).hexdigest(), "content_type": "text/html; charset=utf-8"}
+                for ref, html in zip(reference_texts[:pages], reference_html[:pages])
+            ],
+            "scraped_content_from_search": [
+                {"url": page["url"], "title": page["title"], "extracted_text": page["extracted_text"]}
+                for page in search_page_texts[:pages]
+            ],
+            "extracted_text_from_references": reference_texts[:pages],
+        }
+
+    return {
+        "small_html": render_fixture_page("bench-small", 5_000),
+        "large_html": render_fixture_page("bench-large", 500_000),
+        "search_results": search_results,
+        "reference_texts": reference_texts,
+        "reference_html": reference_html,
+        "search_page_texts": search_page_texts,
+        "small_state": state(5, 2),
+        "large_state": state(SEARCH_RESULT_SETS, PAGES),
+    }
+
+
+def configure_environment(work_dir: str) -> None:
+    """
+    Points the on-disk stores at the temporary directory, so fixture pages never reach
+    the real blob store and local index. Must run before any `app` module reads the settings.
+    """
+
+    for name, filename in (
+        ("SEARCH_CACHE_PATH", "search_cache.sqlite3"),
+        ("LLM_CACHE_PATH", "llm_cache.sqlite3"),
+        ("HTTP_CACHE_DIR", "http"),
+        ("BLOB_STORE_DIR", "blobs"),
+        ("LOCAL_INDEX_PATH", "local_index.sqlite3"),
+    ):
+        os.environ[name] = os.path.join(work_dir, filename)
+
+
+def _run_async(loop: asyncio.AbstractEventLoop, node: Callable, state: Any) -> Callable[[], Any]:
+    return lambda: loop.run_until_complete(node(state))
+
+
+def build_stages(corpus: Dict[str, Any], loop: asyncio.AbstractEventLoop) -> Dict[str, Callable[[], Any]]:
+    """Stage name -> zero-argument callable running one operation."""
+
+    # Imported here so --help works without the application's dependencies
+    from app.agents.research_agent_nodes import evaluate_search_results_node, measure_new_tokens
+    from app.agents.scrapping_agent_nodes import extract_text_from_scraped_content_node
+    from app.agents.synthesis_nodes import deduplicate_sources
+    from app.core.config import get_settings
+    from app.schemas.document_schemas import ResearchState
+    from app.tools.html_extractor import extract_title_and_text
+    from app.utils.blob_store import get_blob_store
+    from app.utils.context_packing import build_packed_context
+
+    settings = get_settings()
+    for html in corpus["reference_html"]:
+        get_blob_store().put(html)
+    small_state = ResearchState.model_validate(corpus["small_state"])
+    large_state = ResearchState.model_validate(corpus["large_state"])
+
+    def research_new_tokens() -> None:
+        # A whole research run's novelty measurement: every iteration only adds its own result sets
+        results = corpus["search_results"]
+        run_id = "microbench"
+        for start in range(0, len(results), RESULT_SETS_PER_ITERATION):
+            measure_new_tokens(run_id, results[:start], [], results[start:start + RESULT_SETS_PER_ITERATION], [])
+
+    return {
+        "html_extract_small": lambda: extract_title_and_text(corpus["small_html"], "text/html; charset=utf-8"),
+        "html_extract_large": lambda: extract_title_and_text(corpus["large_html"], "text/html; charset=utf-8"),
+        "extract_text_node": _run_async(loop, extract_text_from_scraped_content_node, large_state),
+        "evaluate_search_results_node": _run_async(loop, evaluate_search_results_node, large_state),
+        "research_new_tokens": research_new_tokens,
+        "synthesis_dedup": lambda: deduplicate_sources(
+            corpus["search_results"],
+            corpus["reference_texts"],
+            corpus["search_page_texts"],
+            settings.DEDUP_SHINGLE_SIZE,
+            settings.DEDUP_JACCARD_THRESHOLD,
+            settings.DEDUP_MAX_UNITS_PER_TEXT or None
+        ),
+        "synthesis_pack_context": lambda: build_packed_context(
+            corpus["search_results"],
+            corpus["reference_texts"],
+            TOPIC,
+            settings.SYNTHESIS_CONTEXT_TOKEN_BUDGET,
+            settings.SYNTHESIS_CHUNK_TOKENS,
+            corpus["search_page_texts"]
+        ),
+        "state_validate_small": lambda: ResearchState.model_validate(corpus["small_state"]),
+        "state_validate_large": lambda: ResearchState.model_validate(corpus["large_state"]),
+        "state_dump_small": small_state.model_dump,
+        "state_dump_large": large_state.model_dump,
+    }
+
+
+def measure_stage(operation: Callable[[], Any], repeat: int = 5) -> Dict[str, Any]:
+    """Times `operation` (best of `repeat` rounds of at least 0.2 s each) and measures its allocations."""
+
+    operation()  # warm-up: imports, caches, lazily compiled regexes
+
+    timer = timeit.Timer(operation)
+    number, _ = timer.autorange()
+    best_seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = operation()
+        _, peak = tracemalloc.get_traced_memory()
+        # Retained: what stays allocated once the result itself is released (caches, leaks)
+        del result
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(1 / best_seconds, 2),
+        "seconds_per_op": best_seconds,
+        "alloc_peak_bytes": peak - before,
+        "alloc_retained_bytes": after - before,
+    }
+
+
+def format_report(results: Dict[str, Dict[str, Any]]) -> str:
+    width = max(len(name) for name in results) if results else 5
+    lines = [f"{'stage':<{width}} {'ops/s':>12} {'ms/op':>10} {'peak KiB':>10} {'kept KiB':>10}"]
+    for name, result in results.items():
+        lines.append(
+            f"{name:<{width}} {result['ops_per_sec']:>12.2f} {result['seconds_per_op'] * 1000:>10.3f} "
+            f"{result['alloc_peak_bytes'] / 1024:>10.1f} {result['alloc_retained_bytes'] / 1024:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def compare_with_baseline(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    """Returns a description of every stage that got slower, or allocates more, beyond `tolerance`."""
+
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+
+        if result["ops_per_sec"] < previous["ops_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['ops_per_sec']:.2f} ops/s vs baseline {previous['ops_per_sec']:.2f} ops/s")
+
+        if result["alloc_peak_bytes"] > previous["alloc_peak_bytes"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: peak allocation {result['alloc_peak_bytes'] / 1024:.1f} KiB "
+                f"vs baseline {previous['alloc_peak_bytes'] / 1024:.1f} KiB"
+            )
+
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the CPU-bound pipeline stages.")
+    parser.add_argument("--stage", action="append", help="Run only this stage (repeatable). Default: all stages.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing rounds per stage; the best round is reported.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument(
+        "--baseline",
+        default=DEFAULT_BASELINE,
+        help="JSON results of an earlier run to compare against (default: the committed baseline; empty to skip)."
+    )
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression against the baseline.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="deepchain-microbench-") as work_dir:
+        configure_environment(work_dir)
+        loop = asyncio.new_event_loop()
+        try:
+            stages = build_stages(build_corpus(), loop)
+            unknown = sorted(set(args.stage or []) - set(stages))
+            if unknown:
+                parser.error(f"unknown stage(s): {', '.join(unknown)}; available: {', '.join(stages)}")
+
+            results = {}
+            for name, operation in stages.items():
+                if args.stage and name not in args.stage:
+                    continue
+                print(f"Benchmarking {name}...", file=sys.stderr, flush=True)
+                results[name] = measure_stage(operation, args.repeat)
+        finally:
+            loop.close()
+
+    print(format_report(results))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "stages": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_with_baseline(results, json.load(f)["stages"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+Offline end-to-end load test for POST /api/v1/document/generate.
+
+Usage:
+    python -m app.loadtest.run [--concurrency 1,4,16] [--requests 16] [--output results.json]
+                               [--baseline previous.json [--tolerance 0.25]]
+
+No network access is needed. The app runs in-process with the fake chat model and fake
+search backend (LLM_PROVIDER=fake, SEARCH_BACKENDS=["fake"]); search hits and reference URLs
+point at a local fixture server started in a separate process. Caches, blobs and
+checkpoints go to a fresh temporary directory, and every request uses a new topic, so
+each request is a full graph run. The provider rate limits default to off; any other
+setting (e.g. GRAPH_RUN_MAX_CONCURRENCY) is taken from the environment as usual.
+
+For each concurrency level it reports p50/p95/p99 latency, throughput and the peak RSS
+of this process (HTML extraction workers run in child processes and are not included).
+With --baseline, exits with status 1 when a level's p95 latency or throughput is worse
+than the baseline's by more than the tolerance.
+"""
+
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+GENERATE_PATH = "/api/v1/document/generate"
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values."""
+
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process (peak RSS where /proc is not available)."""
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class RSSSampler:
+    """Samples this process's RSS in the background and keeps the maximum."""
+
+    def __init__(self, interval_seconds: float = 0.05):
+        self.interval_seconds = interval_seconds
+        self.peak_bytes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _sample(self) -> None:
+        while True:
+            self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+            await asyncio.sleep(self.interval_seconds)
+
+    def __enter__(self) -> "RSSSampler":
+        self.peak_bytes = current_rss_bytes()
+        self._task = asyncio.create_task(self._sample())
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._task.cancel()
+        self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fixture_server(port: int, timeout_seconds: float = 10.0) -> subprocess.Popen:
+    """Starts the fixture server in a child process and waits until it accepts connections."""
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.loadtest.fixture_server", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Fixture server exited with status {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process
+        except OSError:
+            time.sleep(0.05)
+
+    process.terminate()
+    raise RuntimeError("Fixture server did not start in time")
+
+
+def configure_environment(args: argparse.Namespace, fixture_base_url: str, work_dir: str) -> None:
+    """
+    Points the settings at the fakes and the temporary directory.
+    Must run before any `app` module reads the settings.
+    """
+
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["SEARCH_BACKENDS"] = '["fake"]'
+    os.environ["FAKE_SEARCH_BASE_URL"] = fixture_base_url
+    os.environ["FAKE_LLM_LATENCY_SECONDS"] = str(args.llm_latency)
+    os.environ["FAKE_SEARCH_LATENCY_SECONDS"] = str(args.search_latency)
+    os.environ["FAKE_SEARCH_PAGE_SIZES"] = json.dumps(args.page_sizes)
+
+    for name, filename in (
+        ("SEARCH_CACHE_PATH", "search_cache.sqlite3"),
+        ("LLM_CACHE_PATH", "llm_cache.sqlite3"),
+        ("HTTP_CACHE_DIR", "http"),
+        ("BLOB_STORE_DIR", "blobs"),
+        ("CHECKPOINT_PATH", "checkpoints.sqlite3"),
+        ("LOCAL_INDEX_PATH", "local_index.sqlite3"),
+    ):
+        os.environ[name] = os.path.join(work_dir, filename)
+
+    os.environ.setdefault("LLM_RATE_PER_SECOND", "0")
+    os.environ.setdefault("SEARCH_RATE_PER_SECOND", "1000")
+    os.environ.setdefault("SEARCH_RATE_BURST", "1000")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+async def run_level(client, concurrency: int, total_requests: int, topic_prefix: str, reference_urls: List[str]) -> Dict[str, Any]:
+    """Sends `total_requests` requests with at most `concurrency` in flight and summarizes them."""
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    async def send(index: int) -> None:
+        payload = {"topic": f"{topic_prefix} {index}", "reference_urls": reference_urls}
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                response = await client.post(GENERATE_PATH, json=payload)
+                elapsed = time.perf_counter() - started_at
+                if response.status_code != 200:
+                    errors.append(f"HTTP {response.status_code}")
+                elif response.json().get("error_message"):
+                    errors.append(response.json()["error_message"])
+                else:
+                    latencies.append(elapsed)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    with RSSSampler() as rss:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(send(index) for index in range(total_requests)))
+        wall_seconds = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "succeeded": len(latencies),
+        "failed": len(errors),
+        "errors": sorted(set(errors))[:5],
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(latencies) / wall_seconds, 3) if wall_seconds else 0.0,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+        "peak_rss_mb": round(rss.peak_bytes / (1024 * 1024), 1),
+    }
+
+
+async def run_load_test(args: argparse.Namespace, fixture_base_url: str) -> List[Dict[str, Any]]:
+    # Imported after configure_environment(), so the app sees the load-test settings
+    import httpx
+    from app.main import app
+
+    run_tag = uuid.uuid4().hex[:8]
+    reference_urls = [
+        f"{fixture_base_url}/pages/reference-{run_tag}-{index}-{args.page_sizes[index % len(args.page_sizes)]}.html"
+        for index in range(args.reference_urls)
+    ]
+
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            # Warm-up run (not measured): first use of the extraction pool, caches and graph
+            await run_level(client, 1, 1, f"load test warm-up {run_tag}", reference_urls)
+
+            for level_index, concurrency in enumerate(args.concurrency):
+                requests = args.requests or max(concurrency * 2, 8)
+                print(f"Running {requests} requests at concurrency {concurrency}...", flush=True)
+                results.append(await run_level(
+                    client, concurrency, requests, f"load test {run_tag} level {level_index}", reference_urls
+                ))
+
+    return results
+
+
+def format_report(results: List[Dict[str, Any]]) -> str:
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value * 1000:.0f}"
+
+    lines = [
+        f"{'conc':>5} {'ok':>5} {'fail':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'peak RSS MB':>12}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result['concurrency']:>5} {result['succeeded']:>5} {result['failed']:>5} "
+            f"{ms(result['latency_p50']):>8} {ms(result['latency_p95']):>8} {ms(result['latency_p99']):>8} "
+            f"{result['throughput_rps']:>8.2f} {result['peak_rss_mb']:>12.1f}"
+        )
+        for error in result["errors"]:
+            lines.append(f"      error: {error}")
+    return "\n".join(lines)
+
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Returns a description of every level whose p95 latency or throughput regressed beyond `tolerance`."""
+
+    baseline_by_concurrency = {result["concurrency"]: result for result in baseline}
+    regressions = []
+
+    for result in results:
+        previous = baseline_by_concurrency.get(result["concurrency"])
+        if previous is None:
+            continue
+
+        if previous.get("latency_p95") and result["latency_p95"] is not None:
+            if result["latency_p95"] > previous["latency_p95"] * (1 + tolerance):
+                regressions.append(
+                    f"concurrency {result['concurrency']}: p95 {result['latency_p95'] * 1000:.0f} ms "
+                    f"vs baseline {previous['latency_p95'] * 1000:.0f} ms"
+                )
+
+        if previous.get("throughput_rps") and result["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"concurrency {result['concurrency']}: {result['throughput_rps']:.2f} req/s "
+                f"vs baseline {previous['throughput_rps']:.2f} req/s"
+            )
+
+    return regressions
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test for the document generation API.")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16], help="Comma-separated concurrency levels.")
+    parser.add_argument("--requests", type=int, default=0, help="Requests per level (default: 2x concurrency, at least 8).")
+    parser.add_argument("--reference-urls", type=int, default=2, help="Fixture reference URLs per request.")
+    parser.add_argument("--page-sizes", type=_int_list, default=[2_000, 20_000, 200_000], help="Fixture page sizes in bytes.")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake LLM latency per call, in seconds.")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="Fake search latency per query, in seconds.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression against the baseline.")
+    args = parser.parse_args(argv)
+
+    port = _free_port()
+    fixture_server = start_fixture_server(port)
+    try:
+        with tempfile.TemporaryDirectory(prefix="deepchain-loadtest-") as work_dir:
+            fixture_base_url = f"http://127.0.0.1:{port}"
+            configure_environment(args, fixture_base_url, work_dir)
+            results = asyncio.run(run_load_test(args, fixture_base_url))
+    finally:
+        fixture_server.terminate()
+        fixture_server.wait()
+
+    print(format_report(results))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Measures worker startup: importing `app.main` plus running its lifespan startup.
+
+Usage:
+    python -m app.loadtest.startup [--runs 5]
+
+Each run is a fresh interpreter, so import caches do not carry over between runs. Reports
+the median and best import time, lifespan time (the `startup_ms` the lifespan hook logs)
+and their total. Run it from the repository root with the application's dependencies installed.
+"""
+
+from typing import Dict, List
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+_RESULT_PREFIX = "STARTUP "
+
+
+def measure_once() -> Dict[str, float]:
+    """Imports the application and runs its lifespan startup and shutdown in this process."""
+
+    started_at = time.perf_counter()
+    import app.main as main
+    imported_at = time.perf_counter()
+
+    async def _lifespan() -> None:
+        async with main.app.router.lifespan_context(main.app):
+            pass
+
+    asyncio.run(_lifespan())
+    finished_at = time.perf_counter()
+
+    return {
+        "import_ms": (imported_at - started_at) * 1000,
+        "lifespan_ms": (finished_at - imported_at) * 1000,
+        "total_ms": (finished_at - started_at) * 1000,
+    }
+
+
+def run_fresh() -> Dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-m", "app.loadtest.startup", "--child"],
+        check=True, capture_output=True, text=True
+    ).stdout
+    for line in output.splitlines():
+        if line.startswith(_RESULT_PREFIX):
+            return json.loads(line[len(_RESULT_PREFIX):])
+    raise RuntimeError("Startup run printed no result.")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measures application import and lifespan startup time.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreter runs to measure.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(_RESULT_PREFIX + json.dumps(measure_once()), flush=True)
+        return 0
+
+    runs = []
+    for run in range(args.runs):
+        print(f"Run {run + 1}/{args.runs}...", file=sys.stderr, flush=True)
+        runs.append(run_fresh())
+
+    print(f"{'phase':<12} {'median ms':>10} {'best ms':>10}")
+    for phase in ("import_ms", "lifespan_ms", "total_ms"):
+        values = [result[phase] for result in runs]
+        print(f"{phase[:-3]:<12} {statistics.median(values):>10.1f} {min(values):>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
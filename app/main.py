@@ -1,18 +1,66 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from contextlib import asynccontextmanager
+import time
 
 from app.api.v1 import router_document_generation
+from app.core.config import get_settings
+from app.core.jobs import get_job_manager
+from app.core.llm import get_llm
+from app.core.log import configure_logging, get_logger
+from app.core.metrics import PROMETHEUS_CONTENT_TYPE, render_metrics
+from app.core.request_cache import get_request_cache
+from app.graph.master_orchestrator_graph import get_compiled_master_orchestrator_graph
+from app.tools.html_extractor import get_extraction_pool, shutdown_extraction_pool
+from app.tools.http_client import close_http_client, get_http_client
+from app.tools.search_executor import get_search_executor
+from app.utils.blob_store import get_blob_store
+from app.utils.checkpointer import get_checkpointer
+from app.utils.local_index import get_local_index
+
+logger = get_logger("app")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Builds the shared clients and compiles the graphs once per worker at startup,
+    so no request pays for it and nothing heavy happens at import time.
+    """
+
+    started_at = time.perf_counter()
+
+    get_settings()
+    configure_logging()
+    get_llm()
+    get_search_executor()
+    get_http_client()
+    get_extraction_pool()
+    get_blob_store()
+    get_checkpointer()
+    get_local_index()
+    get_compiled_master_orchestrator_graph()
+
+    app.state.startup_seconds = time.perf_counter() - started_at
+    logger.info("Startup complete: clients and graphs ready", extra={"startup_ms": round(app.state.startup_seconds * 1000, 1)})
+
+    yield
+
+    await get_job_manager().shutdown()
+    await get_request_cache().shutdown()
+    await close_http_client()
+    shutdown_extraction_pool()
+
 
 app = FastAPI(
     title="DeepChain - Multi-Agent Document Generator",
     version="0.1.0",
-    description="An application for generating documents through deep research by a multi-agent system."
+    description="An application for generating documents through deep research by a multi-agent system.",
+    lifespan=lifespan
 )
 
 app.include_router(
     router_document_generation.router,
     prefix="/api/v1",
-    tags=["Document Generation"] 
+    tags=["Document Generation"]
 )
 
 @app.get("/", tags=["Root"])
@@ -22,7 +70,14 @@ async def read_root():
     """
     return {"message": "Welcome to the DeepChain Multi-Agent Document Generation API!"}
 
+@app.get("/metrics", tags=["Monitoring"], include_in_schema=False)
+async def metrics():
+    """
+    Node, LLM, search, fetch and cache metrics in the Prometheus text format.
+    """
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     print("Starting Uvicorn server directly from main.py (for development only)...")
-    uvicorn.run(app, host="0.0.0.0", port=8001, reload=True)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8001, reload=True)
@@ -1,13 +1,50 @@
 # In: app/schemas/document_schemas.py
 
-from typing import List, Optional, Dict, Any
+from typing import Annotated, List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 
+
+# State reducers: how LangGraph merges updates to the same key, e.g. from parallel branches
+
+def keep_latest(current: Any, update: Any) -> Any:
+    """The most recent update wins (the default behaviour, but allowed from parallel branches)."""
+    return update
+
+
+def merge_error_messages(current: Optional[str], update: Optional[str]) -> Optional[str]:
+    """
+    Keeps every distinct error message, joined with '; '. An explicit None still clears every
+    error, so nodes only report error_message when they have one (never None on success);
+    a resumed run re-runs from before the step that reported the first error instead.
+    """
+    if update is None:
+        return None
+    if not current or update in current.split("; "):
+        return update if not current else current
+    return f"{current}; {update}"
+
+
+def append_items(current: Optional[List[Any]], update: Optional[List[Any]]) -> List[Any]:
+    """
+    Appends a node's new items to the list, so nodes return only what they added
+    instead of copying (and re-validating) the whole list on every update.
+    """
+    return list(current or []) + list(update or [])
+
 class ScrapedPage(BaseModel):
-    """Represents content scraped from a single URL."""
+    """
+    Represents content scraped from a single URL.
+    Either the extracted `title` and `extracted_text` (search result pages) or, for pages
+    extracted by a later node (reference URLs), `content_ref`: the raw body's key in the
+    blob store (see `app.utils.blob_store`). The raw body itself is never in the state.
+    """
     url: str
-    content: str
+    content_ref: Optional[str] = None
     title: Optional[str] = None
+    extracted_text: Optional[str] = None
+    content_type: Optional[str] = None
+    bytes_downloaded: Optional[int] = None
+    truncated: bool = False
     error: Optional[str] = None
 
 class ResearchState(BaseModel):
@@ -32,7 +69,7 @@ class ResearchState(BaseModel):
         None,
         description="The current sub-topic or refined question being actively researched in an iteration."
     )
-    search_queries_history: List[Dict[str, Any]] = Field(
+    search_queries_history: Annotated[List[Dict[str, Any]], append_items] = Field(
         default_factory=list,
         description="History of all search queries used and their raw results. E.g. [{'query': '...', 'results': [...]}]"
     )
@@ -52,15 +89,19 @@ class ResearchState(BaseModel):
     )
     # Storing raw search results directly. Each item in the list could be a dict from a search tool.
     # Example: [{'title': '...', 'link': '...', 'snippet': '...'}]
-    raw_search_results: List[Dict[str, Any]] = Field(
+    raw_search_results: Annotated[List[Dict[str, Any]], append_items] = Field(
+        default_factory=list,
+        description="Raw search engine results, accumulated across research iterations."
+    )
+    search_iteration_stats: Annotated[List[Dict[str, Any]], append_items] = Field(
         default_factory=list,
-        description="Raw search engine results collected for the current queries."
+        description="Per research iteration: queries run and skipped as repeats, and how many new (non-duplicate) tokens the results added."
     )
-    scraped_content_from_references: List[ScrapedPage] = Field(
+    scraped_content_from_references: Annotated[List[ScrapedPage], append_items] = Field(
         default_factory=list,
-        description="Content scraped from user-provided reference_urls."
+        description="Content scraped from user-provided reference_urls, as blob store references; the text is in extracted_text_from_references."
     )
-    scraped_content_from_search: List[ScrapedPage] = Field(
+    scraped_content_from_search: Annotated[List[ScrapedPage], append_items] = Field(
         default_factory=list,
         description="Content scraped from relevant URLs found during web search."
     )
@@ -78,6 +119,14 @@ class ResearchState(BaseModel):
         None,
         description="Feedback from a critique agent on the gathered information (e.g., gaps, inaccuracies, suggestions)."
     )
+    dedup_stats: Dict[str, int] = Field(
+        default_factory=dict,
+        description="What near-duplicate elimination removed before synthesis: units_total, units_removed, bytes_removed, tokens_removed, units_unchecked (past DEDUP_MAX_UNITS_PER_TEXT)."
+    )
+    context_chunks_used: List[Dict[str, Any]] = Field(
+        default_factory=list,
+        description="Source chunks packed into the synthesis prompt, e.g. {'source_type': 'reference', 'source': url, 'chunk_index': 0, 'tokens': 280, 'score': 3.1}."
+    )
     is_information_sufficient: bool = Field(
         False,
         description="Flag set by the critique agent indicating if the current information is sufficient to proceed with writing."
@@ -102,14 +151,22 @@ class ResearchState(BaseModel):
     )
 
     # Operational / Meta
-    error_message: Optional[str] = Field(
+    error_message: Annotated[Optional[str], merge_error_messages] = Field(
         None,
         description="Stores any critical error message encountered during the process."
     )
-    status_message: str = Field(
+    status_message: Annotated[str, keep_latest] = Field(
         "Initializing document generation process...",
         description="A human-readable status message indicating the current stage of the process."
     )
+    bypass_llm_cache: bool = Field(
+        False,
+        description="If True, LLM calls for this run skip cached responses (fresh responses still refresh the cache)."
+    )
+    bypass_local_index: bool = Field(
+        False,
+        description="If True, every query is searched on the web instead of being answered from the cross-run local index (results are still added to it)."
+    )
 
     class Config:
         """Pydantic model configuration."""
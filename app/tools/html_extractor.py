@@ -0,0 +1,166 @@
+from typing import Any, Callable, Dict, Optional, TypeVar, Union
+from concurrent.futures import Executor, ProcessPoolExecutor
+import asyncio
+import io
+
+from bs4 import BeautifulSoup
+
+from app.core.config import get_settings
+
+_extraction_pool: Optional[Executor] = None
+
+T = TypeVar("T")
+
+PDF_CONTENT_TYPE = "application/pdf"
+
+
+def _charset_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    if not content_type:
+        return None
+    for part in content_type.split(";")[1:]:
+        name, _, value = part.strip().partition("=")
+        if name.lower() == "charset" and value:
+            return value.strip().strip('"\'')
+    return None
+
+
+def extract_title_and_text(raw: Union[bytes, str], content_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Parses an HTML document once and returns its title, clean body text and the encoding used.
+    Works from raw bytes so the charset is taken from the Content-Type header or the
+    document itself, instead of running a separate detection pass.
+    Runs inside pool workers, so it must stay a picklable module-level function.
+    """
+
+    if isinstance(raw, bytes):
+        soup = BeautifulSoup(raw, "lxml", from_encoding=_charset_from_content_type(content_type))
+        encoding = soup.original_encoding
+    else:
+        soup = BeautifulSoup(raw, "lxml")
+        encoding = None
+
+    title_tag = soup.find("title")
+    title = title_tag.get_text(strip=True) if title_tag else ""
+
+    # Basic text extraction: get all text from the body
+    body = soup.find("body")
+    text_root = body if body else soup
+    # Get text and join paragraphs. Replace multiple newlines/spaces.
+    text = ' '.join(text_root.get_text(separator=' ', strip=True).split())
+
+    return {
+        "title": title or "N/A",
+        "text": text,
+        "encoding": encoding,
+    }
+
+
+def extract_plain_text(raw: bytes, content_type: Optional[str] = None) -> Dict[str, Any]:
+    """Extracts normalized text from a text/plain body."""
+
+    encoding = _charset_from_content_type(content_type) or "utf-8"
+    text = decode_html(raw, encoding)
+    return {
+        "title": "N/A",
+        "text": ' '.join(text.split()),
+        "encoding": encoding,
+    }
+
+
+def extract_pdf_text(raw: bytes, max_pages: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Extracts text from a complete, fully buffered PDF (already bounded by the download cap),
+    up to `max_pages` pages. A PDF cut off at the cap lacks its cross-reference table and
+    cannot be parsed, so callers skip truncated PDFs.
+    Requires the optional `pypdf` package.
+    """
+
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("PDF extraction requires the optional 'pypdf' package.")
+
+    reader = PdfReader(io.BytesIO(raw))
+    metadata_title = reader.metadata.title if reader.metadata and reader.metadata.title else None
+
+    page_texts = []
+    for page_number, page in enumerate(reader.pages):
+        if max_pages is not None and page_number >= max_pages:
+            break
+        page_text = page.extract_text() or ""
+        page_texts.append(' '.join(page_text.split()))
+
+    return {
+        "title": metadata_title or "N/A",
+        "text": ' '.join(text for text in page_texts if text),
+        "encoding": None,
+    }
+
+
+def extract_document(raw: Union[bytes, str], content_type: Optional[str] = None, max_pdf_pages: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Dispatches to the right extractor for the media type: PDF, plain text, or HTML (the default).
+    Runs inside pool workers, so it must stay a picklable module-level function.
+    """
+
+    bare_type = (content_type or "").split(";")[0].strip().lower()
+    if isinstance(raw, bytes):
+        if bare_type == PDF_CONTENT_TYPE:
+            return extract_pdf_text(raw, max_pdf_pages)
+        if bare_type == "text/plain":
+            return extract_plain_text(raw, content_type)
+    return extract_title_and_text(raw, content_type)
+
+
+def decode_html(raw: bytes, encoding: Optional[str]) -> str:
+    """Decodes raw HTML with the encoding found during extraction (UTF-8 if unknown)."""
+
+    try:
+        return raw.decode(encoding or "utf-8", errors="replace")
+    except LookupError:
+        return raw.decode("utf-8", errors="replace")
+
+
+def get_extraction_pool() -> Optional[Executor]:
+    """
+    Returns the shared extraction process pool, or None when HTML_EXTRACTION_WORKERS is 0
+    (extraction then runs in a worker thread instead).
+    """
+
+    global _extraction_pool
+    if _extraction_pool is None:
+        workers = get_settings().HTML_EXTRACTION_WORKERS
+        if workers > 0:
+            _extraction_pool = ProcessPoolExecutor(max_workers=workers)
+    return _extraction_pool
+
+
+def shutdown_extraction_pool() -> None:
+    global _extraction_pool
+    if _extraction_pool is not None:
+        _extraction_pool.shutdown(wait=False, cancel_futures=True)
+        _extraction_pool = None
+
+
+async def run_in_extraction_pool(func: Callable[..., T], *args: Any) -> T:
+    """
+    Runs a CPU-bound, picklable module-level function off the event loop: in the extraction
+    process pool when configured (so it does not hold the server's GIL), otherwise in a thread.
+    """
+
+    pool = get_extraction_pool()
+    if pool is None:
+        return await asyncio.to_thread(func, *args)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, func, *args)
+
+
+async def extract_html(raw: Union[bytes, str], content_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Runs `extract_document` off the event loop, in the process pool when configured.
+    Despite the name, non-HTML bodies (plain text, PDF) are handled too.
+    """
+
+    max_pdf_pages = get_settings().SCRAPER_MAX_PDF_PAGES
+    return await run_in_extraction_pool(extract_document, raw, content_type, max_pdf_pages)
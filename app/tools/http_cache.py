@@ -0,0 +1,454 @@
+from typing import Any, Dict, Optional, Sequence, Tuple
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import httpx
+
+# Header names are compared lower-case
+_UPDATABLE_HEADERS = ("etag", "last-modified", "cache-control", "expires", "date", "age")
+
+# RFC 9111 4.2.2: heuristic freshness is a fraction of the time since last modification
+_HEURISTIC_FRACTION = 0.1
+_HEURISTIC_MAX_SECONDS = 86400
+
+CACHE_STATUS_HEADER = "x-cache"
+TRUNCATED_HEADER = "x-truncated"
+
+
+class ContentTypeNotAllowedError(Exception):
+    """Raised when a response's Content-Type is not one the caller accepts; the body is never downloaded."""
+
+    def __init__(self, url: str, content_type: Optional[str]):
+        self.url = url
+        self.content_type = content_type
+        super().__init__(f"Content type '{content_type}' is not allowed for {url}")
+
+
+def media_type(content_type: Optional[str]) -> str:
+    """Returns the bare, lower-case media type of a Content-Type header ('' if missing)."""
+
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def content_type_allowed(content_type: Optional[str], allowed_content_types: Optional[Sequence[str]]) -> bool:
+    """
+    Checks a Content-Type against allowed media types; entries ending in '/' match a whole family.
+    A missing Content-Type is allowed (the body is sniffed later), as is everything when no list is given.
+    """
+
+    if allowed_content_types is None:
+        return True
+    bare_type = media_type(content_type)
+    if not bare_type:
+        return True
+    return any(
+        bare_type.startswith(allowed) if allowed.endswith("/") else bare_type == allowed
+        for allowed in allowed_content_types
+    )
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Parses a Cache-Control header into {directive: argument-or-None}."""
+
+    directives: Dict[str, Optional[str]] = {}
+    if not value:
+        return directives
+
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, argument = part.partition("=")
+        directives[name.strip().lower()] = argument.strip().strip('"') or None
+    return directives
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _parse_seconds(value: Optional[str]) -> Optional[int]:
+    try:
+        return max(int(value), 0) if value is not None else None
+    except ValueError:
+        return None
+
+
+def freshness_lifetime(headers: Dict[str, str]) -> float:
+    """
+    Computes how long a stored response stays fresh, following RFC 9111 4.2.1
+    (max-age, then Expires, then a Last-Modified based heuristic).
+    This is a private cache, so s-maxage is ignored.
+    """
+
+    cache_control = parse_cache_control(headers.get("cache-control"))
+    if "no-cache" in cache_control:
+        return 0
+
+    max_age = _parse_seconds(cache_control.get("max-age"))
+    if max_age is not None:
+        return max_age
+
+    date = _parse_http_date(headers.get("date"))
+    expires = headers.get("expires")
+    if expires is not None:
+        expires_at = _parse_http_date(expires)
+        # An invalid Expires value (e.g. "0") means already expired
+        if expires_at is None or date is None:
+            return 0
+        return max(expires_at - date, 0)
+
+    last_modified = _parse_http_date(headers.get("last-modified"))
+    if last_modified is not None and date is not None:
+        return min(max(date - last_modified, 0) * _HEURISTIC_FRACTION, _HEURISTIC_MAX_SECONDS)
+
+    return 0
+
+
+def is_storable(response: httpx.Response) -> bool:
+    """Only complete (untruncated) 200 responses to GET without no-store / Vary: * are stored."""
+
+    if response.request.method != "GET" or response.status_code != 200:
+        return False
+    if response.headers.get(TRUNCATED_HEADER) == "true":
+        return False
+    if "no-store" in parse_cache_control(response.headers.get("cache-control")):
+        return False
+    if response.headers.get("vary", "").strip() == "*":
+        return False
+    return True
+
+
+class DiskHTTPCache:
+    """
+    Stores response bodies as files on disk with a small JSON metadata file next to each.
+    The total body size is kept under `max_bytes` by evicting the least recently used entries.
+    Sizes and recency live in an in-memory index, built from the directory once at startup and
+    kept up to date on every read, write and delete, so a write never scans the directory.
+    Entries written by other processes sharing the directory are counted once they are read here.
+    Blocking file IO is done in worker threads.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # key -> body size, least recently used first
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._load_index()
+
+    def _load_index(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-len(".json")]
+            body_path, meta_path = self._paths(key)
+            try:
+                entries.append((os.path.getmtime(meta_path), key, os.path.getsize(body_path)))
+            except OSError:
+                continue
+
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def _track(self, key: str, size: int) -> None:
+        """Records `key` as the most recently used entry with the given body size. Caller holds the lock."""
+
+        self._total_bytes += size - self._index.pop(key, 0)
+        self._index[key] = size
+
+    @staticmethod
+    def cache_key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return f"{base}.body", f"{base}.json"
+
+    def _read(self, key: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+
+        with self._lock:
+            self._track(key, len(body))
+        # Touch the metadata file so the index built after a restart keeps the recency order
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+        return metadata, body
+
+    def _replace_file(self, path: str, data: bytes) -> None:
+        """
+        Writes `data` to a uniquely named temp file in the cache directory and renames it over
+        `path`, so readers never see a partial file and concurrent writers of one key never
+        share (or promote each other's half-written) temp files. The last rename wins.
+        """
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _write(self, key: str, metadata: Dict[str, Any], body: Optional[bytes]) -> None:
+        body_path, meta_path = self._paths(key)
+
+        if body is not None:
+            self._replace_file(body_path, body)
+        self._replace_file(meta_path, json.dumps(metadata).encode("utf-8"))
+
+        with self._lock:
+            if body is not None:
+                self._track(key, len(body))
+                self._evict()
+            elif key in self._index:
+                self._index.move_to_end(key)
+
+    def _remove_files(self, key: str) -> None:
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _delete(self, key: str) -> None:
+        self._remove_files(key)
+        with self._lock:
+            self._total_bytes -= self._index.pop(key, 0)
+
+    def _evict(self) -> None:
+        """Removes least recently used entries until the bodies fit in `max_bytes`. Caller holds the lock."""
+
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self._remove_files(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._index), "bytes": self._total_bytes}
+
+    async def get(self, url: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        return await asyncio.to_thread(self._read, self.cache_key(url))
+
+    async def set(self, url: str, metadata: Dict[str, Any], body: Optional[bytes] = None) -> None:
+        """Stores an entry; with body=None only the metadata is replaced (after a 304)."""
+
+        await asyncio.to_thread(self._write, self.cache_key(url), metadata, body)
+
+    async def delete(self, url: str) -> None:
+        await asyncio.to_thread(self._delete, self.cache_key(url))
+
+
+class CachingHTTPClient:
+    """
+    A private HTTP cache in front of a shared httpx.AsyncClient.
+    Fresh entries are served from disk without any network traffic, stale entries are
+    revalidated with If-None-Match / If-Modified-Since, and a 304 reuses the stored body.
+    Every returned response carries an `x-cache` header: HIT, REVALIDATED or MISS.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, cache: Optional[DiskHTTPCache] = None):
+        self.client = client
+        self.cache = cache
+
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    @staticmethod
+    def _vary_values(vary: Optional[str], request_headers: httpx.Headers) -> Dict[str, Optional[str]]:
+        if not vary:
+            return {}
+        return {
+            name.strip().lower(): request_headers.get(name.strip())
+            for name in vary.split(",") if name.strip()
+        }
+
+    @staticmethod
+    def _cached_response(
+        request: httpx.Request,
+        metadata: Dict[str, Any],
+        body: bytes,
+        cache_status: str,
+        max_bytes: Optional[int] = None
+    ) -> httpx.Response:
+        headers = dict(metadata["headers"])
+        headers[CACHE_STATUS_HEADER] = cache_status
+        # The stored body is already decoded, so the original encoding headers no longer apply
+        headers.pop("content-encoding", None)
+        headers.pop("transfer-encoding", None)
+        if max_bytes is not None and len(body) > max_bytes:
+            body = body[:max_bytes]
+            headers[TRUNCATED_HEADER] = "true"
+        headers["content-length"] = str(len(body))
+        return httpx.Response(status_code=metadata["status_code"], headers=headers, content=body, request=request)
+
+    def _metadata_for(self, response: httpx.Response, request: httpx.Request) -> Dict[str, Any]:
+        return {
+            "url": str(request.url),
+            "final_url": str(response.url),
+            "status_code": response.status_code,
+            "headers": {name.lower(): value for name, value in response.headers.items()},
+            "vary": self._vary_values(response.headers.get("vary"), request.headers),
+            "stored_at": time.time(),
+        }
+
+    async def _fetch(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]],
+        max_bytes: Optional[int],
+        allowed_content_types: Optional[Sequence[str]],
+        **kwargs: Any
+    ) -> httpx.Response:
+        """
+        Streams a response from the network without ever buffering more than `max_bytes` of body.
+        Successful responses whose Content-Type is not allowed are aborted before the body is read.
+        Bodies over the cap are cut off and the response is marked with `x-truncated: true`.
+        """
+
+        async with self.client.stream("GET", url, headers=headers, **kwargs) as response:
+            content_type = response.headers.get("content-type")
+            if response.is_success and not content_type_allowed(content_type, allowed_content_types):
+                raise ContentTypeNotAllowedError(url, content_type)
+
+            chunks = []
+            size = 0
+            truncated = False
+            async for chunk in response.aiter_bytes():
+                if max_bytes is not None and size + len(chunk) > max_bytes:
+                    chunks.append(chunk[:max_bytes - size])
+                    size = max_bytes
+                    truncated = True
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+
+        body = b"".join(chunks)
+
+        # aiter_bytes() already decoded the transfer, so the encoding headers no longer apply
+        response_headers = httpx.Headers(response.headers)
+        for name in ("content-encoding", "transfer-encoding"):
+            if name in response_headers:
+                del response_headers[name]
+        response_headers["content-length"] = str(len(body))
+        if truncated:
+            response_headers[TRUNCATED_HEADER] = "true"
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response_headers,
+            content=body,
+            request=response.request
+        )
+
+    async def get(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        max_bytes: Optional[int] = None,
+        allowed_content_types: Optional[Sequence[str]] = None,
+        **kwargs: Any
+    ) -> httpx.Response:
+        """
+        Performs a cached, streamed GET. Extra keyword arguments are passed to httpx.
+        `max_bytes` caps the body kept in memory and `allowed_content_types` (media types,
+        or prefixes ending in '/') rejects other successful responses with ContentTypeNotAllowedError.
+        """
+
+        request = self.client.build_request("GET", url, headers=headers)
+
+        if self.cache is None:
+            return await self._fetch(url, headers, max_bytes, allowed_content_types, **kwargs)
+
+        cached = await self.cache.get(url)
+        if cached is not None:
+            metadata, body = cached
+            if metadata.get("vary") != self._vary_values(metadata["headers"].get("vary"), request.headers):
+                cached = None
+            elif not content_type_allowed(metadata["headers"].get("content-type"), allowed_content_types):
+                raise ContentTypeNotAllowedError(url, metadata["headers"].get("content-type"))
+
+        request_cache_control = parse_cache_control(request.headers.get("cache-control"))
+        conditional_headers: Dict[str, str] = {}
+
+        if cached is not None:
+            stored_headers = metadata["headers"]
+            age = time.time() - metadata["stored_at"] + (_parse_seconds(stored_headers.get("age")) or 0)
+
+            if "no-cache" not in request_cache_control and age < freshness_lifetime(stored_headers):
+                self.hits += 1
+                return self._cached_response(request, metadata, body, "HIT", max_bytes)
+
+            if "etag" in stored_headers:
+                conditional_headers["If-None-Match"] = stored_headers["etag"]
+            if "last-modified" in stored_headers:
+                conditional_headers["If-Modified-Since"] = stored_headers["last-modified"]
+
+        response = await self._fetch(
+            url,
+            {**(headers or {}), **conditional_headers},
+            max_bytes,
+            allowed_content_types,
+            **kwargs
+        )
+
+        if cached is not None and response.status_code == 304:
+            # RFC 9111 4.3.4: refresh the stored headers from the 304 response
+            for name in _UPDATABLE_HEADERS:
+                if name in response.headers:
+                    metadata["headers"][name] = response.headers[name]
+            metadata["stored_at"] = time.time()
+            await self.cache.set(url, metadata)
+
+            self.revalidated += 1
+            return self._cached_response(request, metadata, body, "REVALIDATED", max_bytes)
+
+        self.misses += 1
+        if is_storable(response):
+            await self.cache.set(url, self._metadata_for(response, request), response.content)
+        elif cached is not None and response.status_code < 500:
+            await self.cache.delete(url)
+
+        response.headers[CACHE_STATUS_HEADER] = "MISS"
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.revalidated) / lookups if lookups else 0.0,
+        }
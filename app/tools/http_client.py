@@ -0,0 +1,73 @@
+from typing import Optional
+import httpx
+
+from app.core.config import get_settings
+from app.core.log import get_logger
+from app.tools.http_cache import CachingHTTPClient, DiskHTTPCache
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+_http_client: Optional[CachingHTTPClient] = None
+
+logger = get_logger("http")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def create_http_client() -> CachingHTTPClient:
+    """
+    Builds the application-scoped, connection-pooled HTTP client from the settings,
+    wrapped in the on-disk HTTP cache when it is enabled.
+    """
+
+    settings = get_settings()
+
+    http2 = settings.HTTP_ENABLE_HTTP2
+    if http2 and not _http2_available():
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed; falling back to HTTP/1.1.")
+        http2 = False
+
+    client = httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+        ),
+        timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS),
+        headers={"User-Agent": DEFAULT_USER_AGENT},
+        follow_redirects=True
+    )
+
+    cache = None
+    if settings.HTTP_CACHE_ENABLED:
+        cache = DiskHTTPCache(settings.HTTP_CACHE_DIR, max_bytes=settings.HTTP_CACHE_MAX_BYTES)
+
+    return CachingHTTPClient(client, cache)
+
+
+def get_http_client() -> CachingHTTPClient:
+    """
+    Returns the shared HTTP client, creating it on first use.
+    Normally created in the application lifespan hook and closed on shutdown.
+    """
+
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client()
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Closes the shared HTTP client and its connection pool."""
+
+    global _http_client
+    if _http_client is not None:
+        await _http_client.client.aclose()
+        _http_client = None
@@ -0,0 +1,48 @@
+from typing import Any, Dict, Optional
+import json
+import re
+import unicodedata
+
+from app.tools.web_search import make_search_result
+from app.utils.sqlite_cache import SQLiteTTLCache
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n\"'`.,;:!?()[]{}"
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a search query so trivially different spellings share a cache entry.
+    Applies unicode normalization, case folding, whitespace collapsing and strips
+    quotes/punctuation from both ends (LLM-generated queries are often quoted).
+    """
+
+    normalized = unicodedata.normalize("NFKC", query).casefold()
+    normalized = _WHITESPACE_RE.sub(" ", normalized)
+    return normalized.strip(_EDGE_PUNCTUATION)
+
+
+class SearchResultCache(SQLiteTTLCache):
+    """
+    Persistent cache of structured web search results keyed by the normalized query text.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = 86400, max_entries: int = 5000):
+        super().__init__(path, table="search_results", ttl_seconds=ttl_seconds, max_entries=max_entries)
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        value = super().get(normalize_query(query))
+        if value is None:
+            return None
+        try:
+            result = json.loads(value)
+        except ValueError:
+            result = None
+        # Entries written before results were structured hold only the snippet text
+        return result if isinstance(result, dict) else make_search_result(value)
+
+    def set(self, query: str, value: Dict[str, Any]) -> None:
+        super().set(normalize_query(query), json.dumps(value))
+
+    def delete(self, query: str) -> None:
+        super().delete(normalize_query(query))
@@ -0,0 +1,225 @@
+from typing import AsyncIterator, Dict, List, Any, Optional
+from functools import lru_cache
+import asyncio
+import random
+import threading
+import time
+
+from app.core.config import get_settings
+from app.core.log import get_logger
+from app.core.metrics import CACHE_REQUESTS, SEARCH_RETRIES
+from app.tools.search_cache import SearchResultCache
+from app.tools.search_provider import (
+    MultiBackendSearch,
+    SearchUnavailableError,
+    create_search_provider,
+    is_rate_limit_signal,
+)
+
+logger = get_logger("search")
+
+
+class TokenBucketRateLimiter:
+    """
+    A token bucket shared by every search call in the process.
+    Tokens refill at `rate_per_second` up to `capacity`, so short bursts are allowed
+    while the long-run request rate stays bounded.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate_per_second = max(rate_per_second, 1e-6)
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+
+        # A thread lock (not an asyncio lock) so the bucket can be shared across event loops
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Takes one token and returns how long the caller must wait before using it."""
+
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_refill
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_second)
+            self._last_refill = now
+
+            # The token may go negative; the debt is paid by sleeping
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate_per_second
+
+    async def acquire(self) -> None:
+        """Waits until a token is available."""
+
+        wait_seconds = self._reserve()
+        if wait_seconds > 0:
+            await asyncio.sleep(wait_seconds)
+
+
+class SearchExecutor:
+    """
+    Runs search queries concurrently through the multi-backend search provider
+    (failover, hedging and per-backend circuit breakers; see `MultiBackendSearch`).
+    Concurrency is bounded by a semaphore, the request rate by a token bucket (one token per
+    query attempt; a hedge does not take another), and queries every backend rate-limited
+    are retried with jittered exponential backoff. A query refused because every circuit is
+    open waits for the first circuit to let a trial call through (capped by the backoff maximum).
+    When a result cache is configured, cached queries skip the provider (and the rate limiter) entirely.
+    """
+
+    def __init__(
+        self,
+        search_provider: MultiBackendSearch,
+        max_concurrency: int = 3,
+        rate_limiter: Optional[TokenBucketRateLimiter] = None,
+        max_retries: int = 3,
+        backoff_base_seconds: float = 1.0,
+        backoff_max_seconds: float = 16.0,
+        cache: Optional[Any] = None,
+    ):
+        self.search_provider = search_provider
+        self.max_concurrency = max(max_concurrency, 1)
+        self.rate_limiter = rate_limiter
+        self.max_retries = max(max_retries, 0)
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.cache = cache
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+
+        ceiling = min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """How long to wait before retrying after `error`; open circuits are waited out, up to the backoff maximum."""
+
+        delay = self._backoff_delay(attempt)
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            delay = min(self.backoff_max_seconds, max(delay, retry_after))
+        return delay
+
+    def _is_retryable(self, error: Exception) -> bool:
+        return is_rate_limit_signal(error) or isinstance(error, SearchUnavailableError)
+
+    async def _invoke_search(self, query: str) -> Dict[str, Any]:
+        return await self.search_provider.search(query)
+
+    def _is_cacheable(self, result: Dict[str, Any]) -> bool:
+        """Only real results are cached; empty or 'no result' answers are worth retrying later."""
+
+        summary = result.get("content_summary") or ""
+        return bool(summary.strip()) and "no good duckduckgo search result was found" not in summary.lower()
+
+    async def run_query(self, query: str) -> Dict[str, Any]:
+        """
+        Runs a single query, answering from the cache when possible.
+        """
+
+        if self.cache is not None:
+            # SQLite reads and writes run in a thread so they never block the event loop
+            cached_result = await asyncio.to_thread(self.cache.get, query)
+            CACHE_REQUESTS.inc(cache="search", result="miss" if cached_result is None else "hit")
+            if cached_result is not None:
+                return cached_result
+
+        result = await self._run_uncached(query)
+
+        if self.cache is not None and self._is_cacheable(result):
+            await asyncio.to_thread(self.cache.set, query, result)
+
+        return result
+
+    async def _run_uncached(self, query: str) -> Dict[str, Any]:
+        """
+        Runs a single query against the provider, retrying on rate limits and open circuits.
+        Other errors are raised straight away.
+        """
+
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
+
+            try:
+                return await self._invoke_search(query)
+
+            except Exception as e:
+                if not self._is_retryable(e) or attempt >= self.max_retries:
+                    raise
+
+                delay = self._retry_delay(e, attempt)
+                SEARCH_RETRIES.inc()
+                logger.warning(
+                    "%s; retrying in %.2fs (attempt %d/%d)",
+                    "Search backends unavailable" if isinstance(e, SearchUnavailableError) else "Rate limited",
+                    delay, attempt + 1, self.max_retries,
+                    extra={"query": query}
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def iter_queries(self, queries: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Runs all queries concurrently and yields each outcome as soon as it is ready.
+        Each outcome is {'query': ..., 'index': ..., 'result': ...} or {'query': ..., 'index': ..., 'error': ...}.
+        """
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _run(index: int, query: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return {"query": query, "index": index, "result": await self.run_query(query)}
+                except Exception as e:
+                    return {"query": query, "index": index, "error": e}
+
+        tasks = [asyncio.create_task(_run(index, query)) for index, query in enumerate(queries)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run_queries(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """
+        Runs all queries concurrently and returns one outcome per query, in input order.
+        """
+
+        outcomes = [outcome async for outcome in self.iter_queries(queries)]
+        return sorted(outcomes, key=lambda outcome: outcome["index"])
+
+
+@lru_cache()
+def get_search_executor() -> SearchExecutor:
+    """
+    Returns the process-wide search executor, built from the application settings.
+    The rate limiter and result cache are shared by every request in the process.
+    """
+
+    settings = get_settings()
+
+    search_cache = None
+    if settings.SEARCH_CACHE_ENABLED:
+        search_cache = SearchResultCache(
+            settings.SEARCH_CACHE_PATH,
+            ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS,
+            max_entries=settings.SEARCH_CACHE_MAX_ENTRIES
+        )
+
+    return SearchExecutor(
+        create_search_provider(settings),
+        max_concurrency=settings.SEARCH_MAX_CONCURRENCY,
+        rate_limiter=TokenBucketRateLimiter(
+            rate_per_second=settings.SEARCH_RATE_PER_SECOND,
+            capacity=settings.SEARCH_RATE_BURST
+        ),
+        max_retries=settings.SEARCH_MAX_RETRIES,
+        backoff_base_seconds=settings.SEARCH_BACKOFF_BASE_SECONDS,
+        backoff_max_seconds=settings.SEARCH_BACKOFF_MAX_SECONDS,
+        cache=search_cache
+    )
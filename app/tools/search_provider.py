@@ -0,0 +1,386 @@
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+from collections import deque
+from dataclasses import dataclass
+import asyncio
+import time
+
+from app.core.log import get_logger
+from app.core.metrics import SEARCH_BACKEND_CIRCUIT_OPEN, SEARCH_HEDGED_REQUESTS, SEARCH_REQUEST_DURATION
+
+logger = get_logger("search")
+
+# Circuit breaker states
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# A backend's recent latencies decide when to hedge once this many are known
+MIN_LATENCY_SAMPLES = 20
+
+
+class SearchRateLimitError(Exception):
+    """Raised when the search provider reports that we are being rate-limited."""
+
+
+class SearchUnavailableError(Exception):
+    """
+    Raised when no search backend can be tried because every circuit breaker is open.
+    `retry_after` is how many seconds until the first circuit lets a trial call through, when known.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# What DuckDuckGo puts in place of results when it throttles us; matched exactly, never as free text
+RATE_LIMIT_RESULT_MARKER = "202 Ratelimit"
+
+
+def is_rate_limit_signal(value: Any) -> bool:
+    """
+    Checks whether an exception is a provider rate limit, by its type or its message.
+    Only meant for errors: result text is checked with `is_rate_limit_result`, since
+    ordinary snippets can talk about rate limits.
+    """
+
+    if isinstance(value, SearchRateLimitError):
+        return True
+
+    if isinstance(value, BaseException):
+        if "ratelimit" in type(value).__name__.lower():
+            return True
+        lowered = str(value).lower()
+        return "ratelimit" in lowered or "rate limit" in lowered
+
+    return False
+
+
+def is_rate_limit_result(content_summary: Any) -> bool:
+    """Checks whether a search result's text is DuckDuckGo's '202 Ratelimit' marker instead of results."""
+
+    return isinstance(content_summary, str) and RATE_LIMIT_RESULT_MARKER in content_summary
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing backend for a while.
+    Opens after `rate_limit_threshold` consecutive rate limits or `failure_threshold` consecutive
+    errors, so one transient throttle does not take the backend out for a whole cooldown.
+    While open, calls are refused for the cooldown, which doubles each time the circuit re-opens
+    (up to `max_cooldown_seconds`). After the cooldown one trial call is let through
+    (half-open): success closes the circuit, failure opens it again. Each allowed call gets a
+    permit to report back with, so only the call that owns the trial can end it.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+        max_cooldown_seconds: float = 300.0,
+        rate_limit_threshold: int = 2,
+    ):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.rate_limit_threshold = max(rate_limit_threshold, 1)
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max(max_cooldown_seconds, cooldown_seconds)
+
+        self.consecutive_failures = 0
+        self.consecutive_opens = 0
+        self.open_until = 0.0
+        self._trial_permit: Optional[object] = None
+
+    def state(self, now: Optional[float] = None) -> str:
+        if self.consecutive_opens == 0:
+            return CIRCUIT_CLOSED
+        if (now if now is not None else time.monotonic()) < self.open_until:
+            return CIRCUIT_OPEN
+        return CIRCUIT_HALF_OPEN
+
+    def allow(self) -> Optional[object]:
+        """
+        A permit for a call made now, or None if the circuit refuses it.
+        In the half-open state only one trial call at a time gets a permit.
+        """
+
+        state = self.state()
+        if state == CIRCUIT_CLOSED:
+            return object()
+        if state == CIRCUIT_HALF_OPEN and self._trial_permit is None:
+            self._trial_permit = object()
+            return self._trial_permit
+        return None
+
+    def release_trial(self, permit: Optional[object]) -> None:
+        """Gives back an unfinished trial call (e.g. a cancelled hedge); other permits are ignored."""
+
+        if permit is not None and permit is self._trial_permit:
+            self._trial_permit = None
+
+    def record_success(self, permit: Optional[object] = None) -> None:
+        self.consecutive_failures = 0
+        self.consecutive_opens = 0
+        self._trial_permit = None
+
+    def record_failure(self, permit: Optional[object] = None, rate_limited: bool = False) -> None:
+        self.consecutive_failures += 1
+        half_open = permit is not None and permit is self._trial_permit
+        if half_open:
+            self._trial_permit = None
+
+        threshold = self.rate_limit_threshold if rate_limited else self.failure_threshold
+        if half_open or self.consecutive_failures >= threshold:
+            cooldown = min(self.max_cooldown_seconds, self.cooldown_seconds * (2 ** self.consecutive_opens))
+            self.open_until = time.monotonic() + cooldown
+            self.consecutive_opens += 1
+            self.consecutive_failures = 0
+
+
+class BackendHealth:
+    """Call counters and recent successful latencies of one backend."""
+
+    def __init__(self, window: int = 100):
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.timeouts = 0
+        self.recent_latencies: Deque[float] = deque(maxlen=window)
+
+    def latency_percentile(self, fraction: float) -> Optional[float]:
+        """The given percentile of recent latencies, or None until enough calls succeeded."""
+
+        if len(self.recent_latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.recent_latencies)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+@dataclass
+class _BackendSlot:
+    name: str
+    backend: Any
+    breaker: CircuitBreaker
+    health: BackendHealth
+
+
+class MultiBackendSearch:
+    """
+    Routes each query over several search backends, tried in the given priority order.
+
+    - Circuit breaker per backend (see `CircuitBreaker`): a throttled or failing backend is
+      skipped instead of being hit again.
+    - Failover: when a backend fails, the next available one is tried straight away.
+    - Hedging: when the backend has not answered after the hedge delay (its recent p95
+      latency, or `hedge_delay_seconds` until enough calls are known), the next available
+      backend is started too and the first successful answer wins. At most one hedge per query.
+
+    Backends are synchronous objects with `search(query) -> {'content_summary': str, 'links': [...]}`;
+    calls run in worker threads. A losing call's thread finishes in the background and its
+    answer is discarded.
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[Tuple[str, Any]],
+        hedge_delay_seconds: float = 2.0,
+        timeout_seconds: float = 15.0,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+        max_cooldown_seconds: float = 300.0,
+        rate_limit_threshold: int = 2,
+    ):
+        if not backends:
+            raise ValueError("At least one search backend is required")
+
+        self.hedge_delay_seconds = hedge_delay_seconds
+        self.timeout_seconds = timeout_seconds
+        self._slots = [
+            _BackendSlot(
+                name,
+                backend,
+                CircuitBreaker(failure_threshold, cooldown_seconds, max_cooldown_seconds, rate_limit_threshold),
+                BackendHealth()
+            )
+            for name, backend in backends
+        ]
+
+    def _hedge_delay(self, slot: _BackendSlot) -> float:
+        p95 = slot.health.latency_percentile(0.95)
+        return p95 if p95 is not None else self.hedge_delay_seconds
+
+    def seconds_until_available(self) -> float:
+        """How long until some backend's circuit lets a call through again (0 if one does now)."""
+
+        now = time.monotonic()
+        return max(0.0, min(
+            slot.breaker.open_until - now if slot.breaker.state(now) == CIRCUIT_OPEN else 0.0
+            for slot in self._slots
+        ))
+
+    def _start_next(self, query: str, started: List[_BackendSlot], tasks: Dict[asyncio.Task, _BackendSlot]) -> bool:
+        """Starts the first backend not tried yet whose circuit allows a call. Returns False if there is none."""
+
+        for slot in self._slots:
+            if slot in started:
+                continue
+            permit = slot.breaker.allow()
+            if permit is None:
+                continue
+            started.append(slot)
+            tasks[asyncio.create_task(self._call(slot, query, permit))] = slot
+            return True
+        return False
+
+    async def _call(self, slot: _BackendSlot, query: str, permit: object) -> Dict[str, Any]:
+        started_at = time.perf_counter()
+        status = "error"
+        slot.health.requests += 1
+        try:
+            result = await asyncio.wait_for(asyncio.to_thread(slot.backend.search, query), self.timeout_seconds)
+            if is_rate_limit_result(result.get("content_summary")):
+                raise SearchRateLimitError(f"Search backend '{slot.name}' rate-limited query: {query}")
+
+            status = "ok"
+            slot.health.successes += 1
+            slot.health.recent_latencies.append(time.perf_counter() - started_at)
+            slot.breaker.record_success(permit)
+            return result
+
+        except asyncio.CancelledError:
+            status = "cancelled"
+            slot.breaker.release_trial(permit)
+            raise
+
+        except Exception as e:
+            rate_limited = is_rate_limit_signal(e)
+            if rate_limited:
+                status = "rate_limited"
+                slot.health.rate_limited += 1
+            elif isinstance(e, asyncio.TimeoutError):
+                status = "timeout"
+                slot.health.timeouts += 1
+            slot.health.failures += 1
+
+            slot.breaker.record_failure(permit, rate_limited=rate_limited)
+            if slot.breaker.state() == CIRCUIT_OPEN:
+                logger.warning(
+                    "Search backend circuit opened after %s",
+                    status,
+                    extra={"backend": slot.name, "open_seconds": round(slot.breaker.open_until - time.monotonic(), 1)}
+                )
+            raise
+
+        finally:
+            SEARCH_REQUEST_DURATION.observe(time.perf_counter() - started_at, backend=slot.name, status=status)
+            SEARCH_BACKEND_CIRCUIT_OPEN.set(1 if slot.breaker.state() == CIRCUIT_OPEN else 0, backend=slot.name)
+
+    async def search(self, query: str) -> Dict[str, Any]:
+        """
+        Answers `query` from the first backend that succeeds.
+        Raises SearchUnavailableError when every circuit is open, SearchRateLimitError when every
+        backend tried was rate-limited, and otherwise the last backend error.
+        """
+
+        started: List[_BackendSlot] = []
+        tasks: Dict[asyncio.Task, _BackendSlot] = {}
+        errors: List[BaseException] = []
+        hedged = False
+
+        if not self._start_next(query, started, tasks):
+            raise SearchUnavailableError(
+                "No search backend is available; every backend's circuit breaker is open",
+                retry_after=self.seconds_until_available()
+            )
+
+        try:
+            while tasks:
+                hedge_after = None
+                if not hedged and self.hedge_delay_seconds > 0 and len(started) < len(self._slots):
+                    hedge_after = self._hedge_delay(started[-1])
+
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedged = True
+                    if self._start_next(query, started, tasks):
+                        SEARCH_HEDGED_REQUESTS.inc()
+                        logger.debug("Hedging slow search with another backend", extra={"backend": started[-1].name})
+                    continue
+
+                for task in done:
+                    tasks.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(task.exception())
+
+                # Fail over once nothing else is in flight
+                if not tasks:
+                    self._start_next(query, started, tasks)
+
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if errors and all(is_rate_limit_signal(error) for error in errors):
+            raise SearchRateLimitError(f"Every search backend tried rate-limited query: {query}")
+        raise errors[-1] if errors else SearchUnavailableError(
+            "No search backend is available", retry_after=self.seconds_until_available()
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Health and circuit state per backend."""
+
+        return {
+            slot.name: {
+                "circuit": slot.breaker.state(),
+                "requests": slot.health.requests,
+                "successes": slot.health.successes,
+                "failures": slot.health.failures,
+                "rate_limited": slot.health.rate_limited,
+                "timeouts": slot.health.timeouts,
+                "latency_p50": slot.health.latency_percentile(0.5),
+                "latency_p95": slot.health.latency_percentile(0.95),
+            }
+            for slot in self._slots
+        }
+
+
+def create_search_backend(name: str, settings: Any) -> Any:
+    """Builds one named backend: ddgs, duckduckgo, duckduckgo_run, stub or fake (load testing)."""
+
+    # Backends are imported here so only the configured ones are loaded
+    from app.tools import web_search
+
+    if name == "ddgs":
+        return web_search.DDGSSearchBackend(max_results=settings.SEARCH_MAX_RESULTS)
+    if name == "duckduckgo":
+        return web_search.DuckDuckGoSearchBackend(max_results=settings.SEARCH_MAX_RESULTS)
+    if name == "duckduckgo_run":
+        return web_search.DuckDuckGoSearchRunBackend()
+    if name == "stub":
+        return web_search.StubSearchBackend()
+    if name == "fake":
+        from app.loadtest.fakes import FakeSearchBackend
+
+        return FakeSearchBackend(
+            settings.FAKE_SEARCH_BASE_URL,
+            latency_seconds=settings.FAKE_SEARCH_LATENCY_SECONDS,
+            results_per_query=settings.FAKE_SEARCH_RESULTS_PER_QUERY,
+            page_sizes=settings.FAKE_SEARCH_PAGE_SIZES
+        )
+    raise ValueError(f"Unknown search backend: {name!r}")
+
+
+def create_search_provider(settings: Any) -> MultiBackendSearch:
+    """Builds the multi-backend search from SEARCH_BACKENDS and the circuit/hedging settings."""
+
+    return MultiBackendSearch(
+        [(name, create_search_backend(name, settings)) for name in settings.SEARCH_BACKENDS],
+        hedge_delay_seconds=settings.SEARCH_HEDGE_DELAY_SECONDS,
+        timeout_seconds=settings.SEARCH_BACKEND_TIMEOUT_SECONDS,
+        failure_threshold=settings.SEARCH_CIRCUIT_FAILURE_THRESHOLD,
+        cooldown_seconds=settings.SEARCH_CIRCUIT_COOLDOWN_SECONDS,
+        max_cooldown_seconds=settings.SEARCH_CIRCUIT_MAX_COOLDOWN_SECONDS,
+        rate_limit_threshold=settings.SEARCH_CIRCUIT_RATE_LIMIT_THRESHOLD
+    )
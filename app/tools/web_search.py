@@ -0,0 +1,100 @@
+from typing import Any, Dict, List, Optional
+
+# Same wording the LangChain DuckDuckGo tool uses, so existing checks keep working
+NO_RESULTS_MESSAGE = "No good DuckDuckGo Search Result was found"
+
+
+def make_search_result(content_summary: str, links: List[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    The structured result every search backend returns:
+    the joined snippets (what `DuckDuckGoSearchRun` used to return) plus the result links.
+    """
+
+    return {
+        "content_summary": content_summary,
+        "links": links or [],
+    }
+
+
+class DuckDuckGoSearchBackend:
+    """
+    DuckDuckGo search through LangChain's API wrapper, keeping the result URLs
+    (the plain `DuckDuckGoSearchRun` tool only returns the joined snippet text).
+    Synchronous; the search executor calls it from worker threads.
+    """
+
+    def __init__(self, max_results: int = 10):
+        # Imported here so importing this module does not pull in the search backend
+        from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
+
+        self.max_results = max_results
+        self._wrapper = DuckDuckGoSearchAPIWrapper(max_results=max_results)
+
+    def search(self, query: str) -> Dict[str, Any]:
+        results = [
+            result for result in self._wrapper.results(query, max_results=self.max_results)
+            if result.get("link")
+        ]
+        if not results:
+            return make_search_result(NO_RESULTS_MESSAGE)
+
+        return make_search_result(
+            " ".join(result.get("snippet", "") for result in results),
+            [{"title": result.get("title", ""), "url": result["link"]} for result in results]
+        )
+
+
+class DDGSSearchBackend:
+    """
+    DuckDuckGo text search through the `duckduckgo_search` package's DDGS client directly,
+    without the LangChain wrapper. A client is created per call, so calls from several
+    worker threads do not share one.
+    """
+
+    def __init__(self, max_results: int = 10, timeout_seconds: float = 10.0):
+        # Imported here so importing this module does not pull in the search backend
+        from duckduckgo_search import DDGS
+
+        self.max_results = max_results
+        self.timeout_seconds = timeout_seconds
+        self._client_class = DDGS
+
+    def search(self, query: str) -> Dict[str, Any]:
+        client = self._client_class(timeout=self.timeout_seconds)
+        results = [result for result in client.text(query, max_results=self.max_results) or [] if result.get("href")]
+        if not results:
+            return make_search_result(NO_RESULTS_MESSAGE)
+
+        return make_search_result(
+            " ".join(result.get("body", "") for result in results),
+            [{"title": result.get("title", ""), "url": result["href"]} for result in results]
+        )
+
+
+class DuckDuckGoSearchRunBackend:
+    """
+    LangChain's `DuckDuckGoSearchRun` tool. It only returns the joined snippet text,
+    so its results have no links (and nothing for the search-hit scraper).
+    """
+
+    def __init__(self):
+        # Imported here so importing this module does not pull in the search backend
+        from langchain_community.tools import DuckDuckGoSearchRun
+
+        self._tool = DuckDuckGoSearchRun()
+
+    def search(self, query: str) -> Dict[str, Any]:
+        return make_search_result(self._tool.invoke(query) or NO_RESULTS_MESSAGE)
+
+
+class StubSearchBackend:
+    """
+    Offline backend for development and tests: answers queries from `results`
+    (keyed by the exact query text) and every other query with "no results".
+    """
+
+    def __init__(self, results: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.results = results or {}
+
+    def search(self, query: str) -> Dict[str, Any]:
+        return self.results.get(query) or make_search_result(NO_RESULTS_MESSAGE)
@@ -0,0 +1,215 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Union
+import asyncio
+import hashlib
+import mmap
+import os
+import threading
+
+from app.core.config import get_settings
+from app.core.log import get_logger
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency; spilled blobs are stored uncompressed without it
+    zstandard = None
+
+_COMPRESSED_SUFFIX = ".zst"
+_RAW_SUFFIX = ".blob"
+
+logger = get_logger("blob_store")
+
+
+class BlobStore:
+    """
+    Content-addressed store for large payloads (e.g. raw page bodies), so the graph state
+    only carries short references instead of the payloads themselves.
+    Blobs are keyed by the SHA-256 of their bytes, so identical payloads are stored once.
+    Recently used blobs stay in memory up to `memory_max_bytes`; older ones are spilled to
+    files under `directory` (zstd-compressed when the optional `zstandard` package is
+    installed) and read back through mmap. Spilled files are kept under `disk_max_bytes`
+    by removing the least recently written ones.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        memory_max_bytes: int = 64 * 1024 * 1024,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+        compress: bool = True,
+        compression_level: int = 3,
+    ):
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.compress = compress and zstandard is not None
+        self.compression_level = compression_level
+
+        self.spills = 0
+        self.disk_reads = 0
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        # key -> (path, size on disk); blobs spilled by earlier processes are reused
+        self._disk: "OrderedDict[str, tuple]" = OrderedDict()
+        self._disk_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_disk_index()
+
+    @staticmethod
+    def blob_key(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def _load_disk_index(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            key, suffix = os.path.splitext(name)
+            if suffix not in (_COMPRESSED_SUFFIX, _RAW_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((os.path.getmtime(path), key, path, os.path.getsize(path)))
+            except OSError:
+                continue
+
+        for _, key, path, size in sorted(entries):
+            self._disk[key] = (path, size)
+            self._disk_bytes += size
+
+    def put(self, data: Union[bytes, str]) -> str:
+        """Stores `data` (str is stored as UTF-8) and returns its key."""
+
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        key = self.blob_key(data)
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return key
+            if key in self._disk:
+                return key
+
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            self._spill()
+        return key
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns the blob's bytes, or None if it is unknown (or was evicted from disk)."""
+
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+            disk_entry = self._disk.get(key)
+
+        if disk_entry is None:
+            return None
+        return self._read_file(key, disk_entry[0])
+
+    def get_text(self, key: str, encoding: str = "utf-8") -> Optional[str]:
+        data = self.get(key)
+        return None if data is None else data.decode(encoding, errors="replace")
+
+    async def put_async(self, data: Union[bytes, str]) -> str:
+        """`put` in a worker thread (hashing and spilling large blobs would block the event loop)."""
+
+        return await asyncio.to_thread(self.put, data)
+
+    async def get_async(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self.get, key)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._memory or key in self._disk
+
+    def _spill(self) -> None:
+        """Moves least recently used blobs to disk until memory is under its limit. Caller holds the lock."""
+
+        while self._memory_bytes > self.memory_max_bytes and self._memory:
+            key, data = self._memory.popitem(last=False)
+            self._memory_bytes -= len(data)
+            try:
+                path, size = self._write_file(key, data)
+            except OSError as e:
+                logger.warning("Could not spill blob %s to disk (%s); dropping it.", key[:12], e)
+                continue
+            self._disk[key] = (path, size)
+            self._disk_bytes += size
+            self.spills += 1
+
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            _, (path, size) = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _write_file(self, key: str, data: bytes) -> tuple:
+        if self.compress:
+            payload = zstandard.ZstdCompressor(level=self.compression_level).compress(data)
+            path = os.path.join(self.directory, key + _COMPRESSED_SUFFIX)
+        else:
+            payload = data
+            path = os.path.join(self.directory, key + _RAW_SUFFIX)
+
+        # Write to a temp file and rename so readers never see a partial blob
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(payload)
+        os.replace(f"{path}.tmp", path)
+        return path, len(payload)
+
+    def _read_file(self, key: str, path: str) -> Optional[bytes]:
+        compressed = path.endswith(_COMPRESSED_SUFFIX)
+        if compressed and zstandard is None:
+            logger.error("Blob %s is zstd-compressed but 'zstandard' is not installed.", key[:12])
+            return None
+
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    data = b""
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        data = zstandard.ZstdDecompressor().decompress(mapped) if compressed else mapped[:]
+        except OSError:
+            # The file is gone (e.g. removed by hand); forget it
+            with self._lock:
+                entry = self._disk.pop(key, None)
+                if entry is not None:
+                    self._disk_bytes -= entry[1]
+            return None
+
+        self.disk_reads += 1
+        return data
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "memory_blobs": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_blobs": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "spills": self.spills,
+                "disk_reads": self.disk_reads,
+                "compression": "zstd" if self.compress else None,
+            }
+
+
+@lru_cache()
+def get_blob_store() -> BlobStore:
+    """Returns the process-wide blob store configured from the settings."""
+
+    settings = get_settings()
+    return BlobStore(
+        settings.BLOB_STORE_DIR,
+        memory_max_bytes=settings.BLOB_STORE_MEMORY_MAX_BYTES,
+        disk_max_bytes=settings.BLOB_STORE_DISK_MAX_BYTES,
+        compress=settings.BLOB_STORE_COMPRESS,
+    )
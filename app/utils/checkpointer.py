@@ -0,0 +1,377 @@
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from functools import lru_cache
+import asyncio
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+
+from app.core.config import get_settings
+
+# Serialized type of channels that were written but hold no value
+_EMPTY_TYPE = "empty"
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """
+    Durable LangGraph checkpointer backed by a local SQLite file, keyed by thread (run) id.
+
+    Checkpoints are kept compact: a checkpoint row only records channel versions, and each
+    channel value is stored once per version as a content-addressed blob. Unchanged channels
+    are not rewritten on every step, and identical values (e.g. the same lists in the master
+    graph and a sub-graph) share one blob. Runs not updated for `ttl_seconds` are garbage
+    collected, together with blobs no checkpoint references any more.
+    Sub-graphs invoked inside master-graph nodes inherit this checkpointer under their own
+    checkpoint namespace, so a resumed run continues inside the sub-graph too.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = 7 * 86400, gc_interval_seconds: float = 3600, *, serde: Any = None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.gc_interval_seconds = gc_interval_seconds
+        self._last_gc = 0.0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # One connection shared by all threads, serialized by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+            "parent_checkpoint_id TEXT, type TEXT NOT NULL, checkpoint BLOB NOT NULL, "
+            "metadata_type TEXT NOT NULL, metadata BLOB NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id));"
+            "CREATE TABLE IF NOT EXISTS channel_values ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL, "
+            "version TEXT NOT NULL, blob_hash TEXT NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, channel, version));"
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            "hash TEXT PRIMARY KEY, type TEXT NOT NULL, data BLOB NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS writes ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+            "task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, "
+            "type TEXT NOT NULL, value BLOB NOT NULL, task_path TEXT NOT NULL DEFAULT '', "
+            "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx));"
+            "CREATE INDEX IF NOT EXISTS checkpoints_created_at ON checkpoints (thread_id, created_at);"
+        )
+
+    # Helpers
+
+    @staticmethod
+    def _config_keys(config: RunnableConfig) -> Tuple[str, str, Optional[str]]:
+        configurable = config["configurable"]
+        return configurable["thread_id"], configurable.get("checkpoint_ns", ""), configurable.get("checkpoint_id")
+
+    def _store_blob(self, value_type: str, data: bytes) -> str:
+        """Stores a serialized value once, keyed by its hash. Caller holds the lock."""
+
+        blob_hash = hashlib.sha256(value_type.encode("utf-8") + b"\x00" + data).hexdigest()
+        self._conn.execute(
+            "INSERT OR IGNORE INTO blobs (hash, type, data) VALUES (?, ?, ?)",
+            (blob_hash, value_type, data)
+        )
+        return blob_hash
+
+    def _load_channel_values(self, thread_id: str, checkpoint_ns: str, channel_versions: ChannelVersions) -> Dict[str, Any]:
+        """Caller holds the lock."""
+
+        channel_values = {}
+        for channel, version in channel_versions.items():
+            row = self._conn.execute(
+                "SELECT b.type, b.data FROM channel_values c JOIN blobs b ON b.hash = c.blob_hash "
+                "WHERE c.thread_id = ? AND c.checkpoint_ns = ? AND c.channel = ? AND c.version = ?",
+                (thread_id, checkpoint_ns, channel, str(version))
+            ).fetchone()
+            if row is not None and row[0] != _EMPTY_TYPE:
+                channel_values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return channel_values
+
+    def _row_to_tuple(self, row: tuple) -> CheckpointTuple:
+        """Builds a CheckpointTuple from a `checkpoints` row. Caller holds the lock."""
+
+        thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, value_type, data, metadata_type, metadata = row
+        checkpoint = self.serde.loads_typed((value_type, data))
+        checkpoint = {
+            **checkpoint,
+            "channel_values": self._load_channel_values(thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+        }
+
+        pending_writes = [
+            (task_id, channel, self.serde.loads_typed((write_type, value)))
+            for task_id, channel, write_type, value in self._conn.execute(
+                "SELECT task_id, channel, type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id)
+            )
+        ]
+
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=checkpoint,
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+                if parent_checkpoint_id else None
+            ),
+            pending_writes=pending_writes,
+        )
+
+    # BaseCheckpointSaver interface
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id, checkpoint_ns, checkpoint_id = self._config_keys(config)
+        columns = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+
+        with self._lock:
+            if checkpoint_id:
+                row = self._conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id)
+                ).fetchone()
+            else:
+                # Checkpoint ids are time-ordered, so the largest one is the latest
+                row = self._conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns)
+                ).fetchone()
+            return self._row_to_tuple(row) if row is not None else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if config is not None:
+            configurable = config["configurable"]
+            clauses.append("thread_id = ?")
+            params.append(configurable["thread_id"])
+            if "checkpoint_ns" in configurable:
+                clauses.append("checkpoint_ns = ?")
+                params.append(configurable["checkpoint_ns"])
+            if configurable.get("checkpoint_id"):
+                clauses.append("checkpoint_id = ?")
+                params.append(configurable["checkpoint_id"])
+        if before is not None and before["configurable"].get("checkpoint_id"):
+            clauses.append("checkpoint_id < ?")
+            params.append(before["configurable"]["checkpoint_id"])
+
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+            "FROM checkpoints"
+            + (" WHERE " + " AND ".join(clauses) if clauses else "")
+            + " ORDER BY checkpoint_id DESC"
+        )
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        returned = 0
+        for row in rows:
+            if limit is not None and returned >= limit:
+                break
+            with self._lock:
+                checkpoint_tuple = self._row_to_tuple(row)
+            if filter and not all(checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()):
+                continue
+            returned += 1
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id, checkpoint_ns, parent_checkpoint_id = self._config_keys(config)
+
+        # Only channels with a new version are serialized; the rest are already stored
+        checkpoint_copy = dict(checkpoint)
+        channel_values = checkpoint_copy.pop("channel_values", {})
+        serialized_channels = [
+            (
+                channel,
+                str(version),
+                self.serde.dumps_typed(channel_values[channel]) if channel in channel_values else (_EMPTY_TYPE, b"")
+            )
+            for channel, version in new_versions.items()
+        ]
+        value_type, data = self.serde.dumps_typed(checkpoint_copy)
+        metadata_type, metadata_data = self.serde.dumps_typed(metadata)
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for channel, version, (channel_type, channel_data) in serialized_channels:
+                    blob_hash = self._store_blob(channel_type, channel_data)
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO channel_values (thread_id, checkpoint_ns, channel, version, blob_hash) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (thread_id, checkpoint_ns, channel, version, blob_hash)
+                    )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                    "type, checkpoint, metadata_type, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], parent_checkpoint_id,
+                     value_type, data, metadata_type, metadata_data, time.time())
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            if time.time() - self._last_gc > self.gc_interval_seconds:
+                self._gc()
+
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id, checkpoint_ns, checkpoint_id = self._config_keys(config)
+        rows = [
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel,
+             *self.serde.dumps_typed(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+
+        # Special channels (errors, interrupts, ...) replace earlier writes; regular ones are written once
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        with self._lock:
+            self._conn.executemany(
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Deletes every checkpoint and write of a run; unreferenced blobs go at the next GC."""
+
+        with self._lock:
+            for table in ("checkpoints", "channel_values", "writes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def get_next_version(self, current: Optional[str], channel: Any = None) -> str:
+        """Sortable string versions (as LangGraph's in-memory saver uses)."""
+
+        if current is None:
+            current_version = 0
+        elif isinstance(current, int):
+            current_version = current
+        else:
+            current_version = int(current.split(".")[0])
+        return f"{current_version + 1:032}.{random.random():016}"
+
+    # Async interface: the same SQLite work, in a worker thread
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # Garbage collection
+
+    def _gc(self) -> Dict[str, int]:
+        """Drops runs idle for longer than the TTL, then unreferenced blobs. Caller holds the lock."""
+
+        self._last_gc = time.time()
+        threads_deleted = 0
+        if self.ttl_seconds is not None:
+            expired_threads = [
+                row[0] for row in self._conn.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?",
+                    (self._last_gc - self.ttl_seconds,)
+                )
+            ]
+            for thread_id in expired_threads:
+                for table in ("checkpoints", "channel_values", "writes"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            threads_deleted = len(expired_threads)
+
+        blobs_deleted = self._conn.execute(
+            "DELETE FROM blobs WHERE hash NOT IN (SELECT blob_hash FROM channel_values)"
+        ).rowcount
+        return {"threads_deleted": threads_deleted, "blobs_deleted": blobs_deleted}
+
+    def gc(self) -> Dict[str, int]:
+        with self._lock:
+            return self._gc()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "runs": self._conn.execute("SELECT COUNT(DISTINCT thread_id) FROM checkpoints").fetchone()[0],
+                "checkpoints": self._conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0],
+                "blobs": self._conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0],
+                "blob_bytes": self._conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM blobs").fetchone()[0],
+            }
+
+
+@lru_cache()
+def get_checkpointer() -> Optional[SQLiteCheckpointSaver]:
+    """Returns the process-wide checkpointer, or None when checkpointing is disabled."""
+
+    settings = get_settings()
+    if not settings.CHECKPOINT_ENABLED:
+        return None
+    return SQLiteCheckpointSaver(settings.CHECKPOINT_PATH, ttl_seconds=settings.CHECKPOINT_TTL_SECONDS)
@@ -0,0 +1,284 @@
+from typing import Any, Dict, List, Optional
+from collections import Counter
+from dataclasses import dataclass, field
+import math
+import re
+
+from app.utils.dedup import split_into_units
+from app.utils.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+SOURCE_TYPE_SEARCH = "search"
+SOURCE_TYPE_REFERENCE = "reference"
+SOURCE_TYPE_SEARCH_PAGE = "search_page"
+
+_SECTION_TITLES = {
+    SOURCE_TYPE_SEARCH: "Information from Web Search Snippets: ",
+    SOURCE_TYPE_REFERENCE: "Information from Scraped Reference URLs: ",
+    SOURCE_TYPE_SEARCH_PAGE: "Information from Pages Found by Web Search: ",
+}
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what when "
+    "where which who why will with how".split()
+)
+
+
+def tokenize_terms(text: str) -> List[str]:
+    """Lower-cased word terms without common stopwords, for lexical ranking."""
+
+    return [term for term in (t.lower() for t in _TERM_RE.findall(text)) if term not in _STOPWORDS]
+
+
+@dataclass
+class ContextChunk:
+    """A piece of one source, small enough to be ranked and packed independently."""
+
+    source_type: str
+    source_index: int
+    source_id: str
+    source_header: str
+    chunk_index: int
+    text: str
+    tokens: int
+    score: float = 0.0
+    terms: List[str] = field(default_factory=list, repr=False)
+
+    def describe(self) -> Dict[str, Any]:
+        """Small, JSON-friendly record of the chunk (without its text) for the state."""
+
+        return {
+            "source_type": self.source_type,
+            "source": self.source_id,
+            "chunk_index": self.chunk_index,
+            "tokens": self.tokens,
+            "score": round(self.score, 4),
+        }
+
+
+def _split_oversized_units(units: List[str], chunk_tokens: int) -> List[str]:
+    """Breaks units longer than a chunk (e.g. text without punctuation) into word windows."""
+
+    result = []
+    for unit in units:
+        if estimate_tokens(unit) <= chunk_tokens:
+            result.append(unit)
+            continue
+
+        max_chars = chunk_tokens * CHARS_PER_TOKEN
+        window: List[str] = []
+        window_chars = 0
+        for word in unit.split():
+            if window and window_chars + len(word) > max_chars:
+                result.append(" ".join(window))
+                window, window_chars = [], 0
+            window.append(word)
+            window_chars += len(word) + 1
+        if window:
+            result.append(" ".join(window))
+    return result
+
+
+def _chunk_text(text: str, chunk_tokens: int) -> List[str]:
+    """Groups sentence units into chunks of roughly `chunk_tokens` tokens."""
+
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+    for unit in _split_oversized_units(split_into_units(text), chunk_tokens):
+        unit_tokens = estimate_tokens(unit)
+        if current and current_tokens + unit_tokens > chunk_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def chunk_sources(
+    search_results: List[Dict[str, Any]],
+    reference_texts: List[Dict[str, str]],
+    chunk_tokens: int = 300,
+    search_page_texts: Optional[List[Dict[str, str]]] = None
+) -> List[ContextChunk]:
+    """
+    Splits every search snippet set, reference text and scraped search-result page into chunks, in source order.
+    """
+
+    sources = []
+    for res in search_results:
+        if res.get('content_summary'):
+            sources.append((
+                SOURCE_TYPE_SEARCH,
+                res.get('query', 'N/A'),
+                f"Source (Search Query: '{res.get('query', 'N/A')}'):",
+                res['content_summary']
+            ))
+    for ref in reference_texts:
+        if ref.get('extracted_text'):
+            sources.append((
+                SOURCE_TYPE_REFERENCE,
+                ref.get('url', 'N/A'),
+                f"Source (Reference URL: {ref.get('url', 'N/A')}, Title: '{ref.get('title', 'N/A')}'):",
+                ref['extracted_text']
+            ))
+    for page in search_page_texts or []:
+        if page.get('extracted_text'):
+            sources.append((
+                SOURCE_TYPE_SEARCH_PAGE,
+                page.get('url', 'N/A'),
+                f"Source (Search Result URL: {page.get('url', 'N/A')}, Title: '{page.get('title', 'N/A')}'):",
+                page['extracted_text']
+            ))
+
+    chunks = []
+    for source_index, (source_type, source_id, header, text) in enumerate(sources):
+        for chunk_index, chunk_text in enumerate(_chunk_text(text, chunk_tokens)):
+            chunks.append(ContextChunk(
+                source_type=source_type,
+                source_index=source_index,
+                source_id=source_id,
+                source_header=header,
+                chunk_index=chunk_index,
+                text=chunk_text,
+                tokens=estimate_tokens(chunk_text),
+                terms=tokenize_terms(chunk_text)
+            ))
+    return chunks
+
+
+def score_chunks_bm25(chunks: List[ContextChunk], query: str, k1: float = 1.5, b: float = 0.75) -> None:
+    """
+    Scores each chunk against `query` with Okapi BM25, treating the chunks as the corpus.
+    Scores are written to `chunk.score`.
+    """
+
+    query_terms = set(tokenize_terms(query))
+    if not chunks or not query_terms:
+        return
+
+    document_frequency: Counter = Counter()
+    for chunk in chunks:
+        document_frequency.update(query_terms.intersection(chunk.terms))
+
+    total_chunks = len(chunks)
+    average_length = sum(len(chunk.terms) for chunk in chunks) / total_chunks or 1.0
+    idf = {
+        term: math.log(1 + (total_chunks - frequency + 0.5) / (frequency + 0.5))
+        for term, frequency in document_frequency.items()
+    }
+
+    for chunk in chunks:
+        term_counts = Counter(term for term in chunk.terms if term in idf)
+        length_norm = k1 * (1 - b + b * len(chunk.terms) / average_length)
+        chunk.score = sum(
+            idf[term] * count * (k1 + 1) / (count + length_norm)
+            for term, count in term_counts.items()
+        )
+
+
+def pack_chunks(chunks: List[ContextChunk], token_budget: int) -> List[ContextChunk]:
+    """
+    Greedily selects the highest-scoring chunks that fit in `token_budget`
+    (counting each source's header once) and returns them in original source order.
+    """
+
+    selected = []
+    used_tokens = 0
+    sources_included = set()
+
+    # Stable sort: equal scores keep their original order
+    for chunk in sorted(chunks, key=lambda chunk: -chunk.score):
+        header_tokens = 0 if chunk.source_index in sources_included else estimate_tokens(chunk.source_header) + 1
+        cost = chunk.tokens + header_tokens
+        if used_tokens + cost > token_budget:
+            continue
+        selected.append(chunk)
+        used_tokens += cost
+        sources_included.add(chunk.source_index)
+
+    return sorted(selected, key=lambda chunk: (chunk.source_index, chunk.chunk_index))
+
+
+def batch_chunks(chunks: List[ContextChunk], batch_tokens: int) -> List[List[ContextChunk]]:
+    """
+    Splits chunks (kept in their given order) into consecutive batches of at most
+    about `batch_tokens` tokens each, e.g. for per-batch map calls.
+    """
+
+    batches: List[List[ContextChunk]] = []
+    current: List[ContextChunk] = []
+    current_tokens = 0
+    for chunk in chunks:
+        if current and current_tokens + chunk.tokens > batch_tokens:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(chunk)
+        current_tokens += chunk.tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def format_packed_context(chunks: List[ContextChunk]) -> str:
+    """
+    Renders selected chunks grouped by source, in the same layout the synthesis prompt always used.
+    """
+
+    sections: Dict[str, List[str]] = {source_type: [] for source_type in _SECTION_TITLES}
+
+    current_source: Optional[int] = None
+    current_parts: List[str] = []
+    current_type = None
+
+    def _flush():
+        if current_source is not None:
+            sections[current_type].append("\n".join(current_parts))
+
+    for chunk in chunks:
+        if chunk.source_index != current_source:
+            _flush()
+            current_source, current_type = chunk.source_index, chunk.source_type
+            current_parts = [chunk.source_header, chunk.text]
+        else:
+            current_parts.append(chunk.text)
+    _flush()
+
+    formatted_input_parts = [
+        f"{_SECTION_TITLES[source_type]}\n" + "\n\n".join(section)
+        for source_type, section in sections.items() if section
+    ]
+    return "\n\n".join(formatted_input_parts)
+
+
+def build_packed_context(
+    search_results: List[Dict[str, Any]],
+    reference_texts: List[Dict[str, str]],
+    topic: str,
+    token_budget: int,
+    chunk_tokens: int = 300,
+    search_page_texts: Optional[List[Dict[str, str]]] = None
+) -> Dict[str, Any]:
+    """
+    Chunks all sources, ranks the chunks against the topic with BM25 and packs them into the budget.
+    Returns the formatted context plus a record of what was kept and dropped.
+    """
+
+    chunks = chunk_sources(search_results, reference_texts, chunk_tokens, search_page_texts)
+    score_chunks_bm25(chunks, topic)
+    selected = pack_chunks(chunks, token_budget)
+
+    return {
+        "context": format_packed_context(selected),
+        "chunks": chunks,
+        "selected_chunks": selected,
+        "stats": {
+            "chunks_total": len(chunks),
+            "chunks_kept": len(selected),
+            "tokens_total": sum(chunk.tokens for chunk in chunks),
+            "tokens_kept": sum(chunk.tokens for chunk in selected),
+            "token_budget": token_budget,
+        },
+    }
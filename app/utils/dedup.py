@@ -0,0 +1,181 @@
+from typing import Dict, List, Optional, Set, Tuple
+import hashlib
+import re
+
+from app.utils.tokens import estimate_tokens
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# MinHash signature length and LSH banding (bands * rows == permutations).
+# With 16 bands of 2 rows, pairs at Jaccard 0.7 become candidates with probability > 0.9999;
+# candidates are then confirmed with the exact Jaccard similarity.
+MINHASH_PERMUTATIONS = 32
+LSH_BANDS = 16
+_LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_HASH_MASK = (1 << 32) - 1
+
+# Units shorter than this are too small for a meaningful similarity and are only dropped on exact repeats
+MIN_WORDS_FOR_MINHASH = 6
+
+
+def _make_permutations(count: int) -> List[Tuple[int, int]]:
+    """Deterministic (a, b) coefficients for the universal hash family used by MinHash."""
+
+    permutations = []
+    for i in range(count):
+        seed = hashlib.blake2b(f"minhash-{i}".encode("utf-8"), digest_size=16).digest()
+        a = int.from_bytes(seed[:8], "big") % (_MERSENNE_PRIME - 1) + 1
+        b = int.from_bytes(seed[8:], "big") % _MERSENNE_PRIME
+        permutations.append((a, b))
+    return permutations
+
+
+_PERMUTATIONS = _make_permutations(MINHASH_PERMUTATIONS)
+
+
+def split_into_units(text: str) -> List[str]:
+    """Splits text into sentence-like units (extracted page text has no paragraph breaks left)."""
+
+    return [unit.strip() for unit in _SENTENCE_SPLIT_RE.split(text) if unit and unit.strip()]
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shingle_hashes(words: List[str], shingle_size: int = 2) -> Set[int]:
+    """Hashes the set of word shingles of a unit."""
+
+    if len(words) <= shingle_size:
+        return {_hash64(" ".join(words))}
+    return {_hash64(" ".join(words[i:i + shingle_size])) for i in range(len(words) - shingle_size + 1)}
+
+
+def minhash_signature(shingles: Set[int]) -> Tuple[int, ...]:
+    """Computes the MinHash signature of a set of shingle hashes."""
+
+    return tuple(
+        min(((a * shingle + b) % _MERSENNE_PRIME) & _HASH_MASK for shingle in shingles)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def jaccard(first: Set[int], second: Set[int]) -> float:
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+class NearDuplicateFilter:
+    """
+    Remembers the units it has seen and flags exact or near-duplicate ones.
+    Near duplicates are units whose word-shingle sets have a Jaccard similarity of at least
+    `threshold`. Candidates are found with MinHash LSH buckets, so each check is close to
+    constant time instead of comparing against every unit seen so far.
+    """
+
+    def __init__(self, shingle_size: int = 2, threshold: float = 0.7):
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+
+        self._exact: Set[int] = set()
+        self._shingle_sets: List[Set[int]] = []
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(LSH_BANDS)]
+
+    def is_duplicate(self, unit: str) -> bool:
+        """Returns True if `unit` duplicates a seen unit; otherwise remembers it and returns False."""
+
+        words = [word.lower() for word in _WORD_RE.findall(unit)]
+        if not words:
+            return True
+
+        exact_key = _hash64(" ".join(words))
+        if exact_key in self._exact:
+            return True
+        self._exact.add(exact_key)
+
+        if len(words) < MIN_WORDS_FOR_MINHASH:
+            return False
+
+        shingles = shingle_hashes(words, self.shingle_size)
+        signature = minhash_signature(shingles)
+        bands = [signature[band * _LSH_ROWS:(band + 1) * _LSH_ROWS] for band in range(LSH_BANDS)]
+
+        checked: Set[int] = set()
+        for band, band_value in enumerate(bands):
+            for candidate in self._buckets[band].get(band_value, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if jaccard(shingles, self._shingle_sets[candidate]) >= self.threshold:
+                    return True
+
+        unit_id = len(self._shingle_sets)
+        self._shingle_sets.append(shingles)
+        for band, band_value in enumerate(bands):
+            self._buckets[band].setdefault(band_value, []).append(unit_id)
+        return False
+
+
+def deduplicate_texts(
+    texts: List[str],
+    dedup_filter: NearDuplicateFilter,
+    max_units_per_text: Optional[int] = None
+) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Removes duplicate and near-duplicate units from each text, sharing `dedup_filter`
+    so repeats across texts (and across calls with the same filter) are caught too.
+    Only the first `max_units_per_text` units of a text are checked; the rest are kept as they are.
+    Returns the cleaned texts in the same order and what was removed.
+    """
+
+    cleaned_texts = []
+    stats = {"units_total": 0, "units_removed": 0, "bytes_removed": 0, "tokens_removed": 0, "units_unchecked": 0}
+
+    for text in texts:
+        kept_units = []
+        for position, unit in enumerate(split_into_units(text or "")):
+            stats["units_total"] += 1
+            if max_units_per_text is not None and position >= max_units_per_text:
+                stats["units_unchecked"] += 1
+                kept_units.append(unit)
+            elif dedup_filter.is_duplicate(unit):
+                stats["units_removed"] += 1
+                stats["bytes_removed"] += len(unit.encode("utf-8"))
+                stats["tokens_removed"] += estimate_tokens(unit)
+            else:
+                kept_units.append(unit)
+        cleaned_texts.append(" ".join(kept_units))
+
+    return cleaned_texts, stats
+
+
+class NoveltyTracker:
+    """
+    Measures how much new content each research iteration adds, incrementally: the filter
+    keeps every text seen so far, so an iteration only shingles its own texts instead of
+    re-processing all earlier ones. `search_results_seen` and `pages_seen` are how many items
+    of the run's (append-only) search result and scraped page lists it has taken in.
+    """
+
+    def __init__(self, shingle_size: int = 2, threshold: float = 0.7):
+        self.dedup_filter = NearDuplicateFilter(shingle_size, threshold)
+        self.search_results_seen = 0
+        self.pages_seen = 0
+
+    def add(self, texts: List[str]) -> int:
+        """Takes in `texts` and returns the estimated tokens that were not (near-)duplicates of anything seen."""
+
+        novel_texts, _ = deduplicate_texts(texts, self.dedup_filter)
+        return sum(estimate_tokens(text) for text in novel_texts if text)
+
+
+def merge_dedup_stats(*all_stats: Dict[str, int]) -> Dict[str, int]:
+    merged: Dict[str, int] = {}
+    for stats in all_stats:
+        for key, value in stats.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
@@ -0,0 +1,187 @@
+from typing import Any, Dict, Iterator, Optional, Sequence
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+import asyncio
+import hashlib
+import json
+import threading
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from app.core.config import get_settings
+from app.core.log import get_logger
+from app.core.metrics import CACHE_REQUESTS
+from app.utils.sqlite_cache import SQLiteTTLCache
+
+# Set per request (per asyncio task) to skip cache reads for that request only
+_bypass_llm_cache: ContextVar[bool] = ContextVar("bypass_llm_cache", default=False)
+
+logger = get_logger("llm_cache")
+
+
+@contextmanager
+def llm_cache_bypass(enabled: bool = True) -> Iterator[None]:
+    """
+    Skips LLM cache lookups for calls made inside this block.
+    Fresh responses are still written back, so a bypass also refreshes the entry.
+    """
+
+    token = _bypass_llm_cache.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass_llm_cache.reset(token)
+
+
+def make_llm_cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Builds the cache key from the serialized prompt and the LLM string.
+    LangChain's llm_string already encodes the model name and its call parameters
+    (temperature, stop sequences, ...), so different settings never share an entry.
+    """
+
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class TieredLLMCache(BaseCache):
+    """
+    LangChain-compatible LLM response cache with two tiers:
+    a bounded in-process LRU in front of an optional on-disk SQLite store with TTL.
+    Disk hits are promoted into the memory tier.
+    """
+
+    def __init__(self, memory_max_entries: int = 256, disk_cache: Optional[SQLiteTTLCache] = None):
+        self.memory_max_entries = max(memory_max_entries, 1)
+        self.disk_cache = disk_cache
+
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    # Memory tier
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            return value
+
+    def _memory_set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_max_entries:
+                self._memory.popitem(last=False)
+
+    # Serialization
+
+    @staticmethod
+    def _dumps(return_val: Sequence[Generation]) -> str:
+        return json.dumps([dumps(generation) for generation in return_val])
+
+    @staticmethod
+    def _loads(value: str) -> Optional[Sequence[Generation]]:
+        try:
+            return [loads(generation) for generation in json.loads(value)]
+        except Exception as e:
+            logger.warning("Could not deserialize cached generations: %s", e)
+            return None
+
+    # BaseCache interface
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        if _bypass_llm_cache.get():
+            self.bypassed += 1
+            CACHE_REQUESTS.inc(cache="llm", result="bypass")
+            return None
+
+        key = make_llm_cache_key(prompt, llm_string)
+
+        value = self._memory_get(key)
+        if value is not None:
+            self.memory_hits += 1
+            CACHE_REQUESTS.inc(cache="llm", result="memory_hit")
+            return self._loads(value)
+
+        if self.disk_cache is not None:
+            value = self.disk_cache.get(key)
+            if value is not None:
+                self.disk_hits += 1
+                CACHE_REQUESTS.inc(cache="llm", result="disk_hit")
+                self._memory_set(key, value)
+                return self._loads(value)
+
+        self.misses += 1
+        CACHE_REQUESTS.inc(cache="llm", result="miss")
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = make_llm_cache_key(prompt, llm_string)
+        value = self._dumps(return_val)
+
+        self._memory_set(key, value)
+        if self.disk_cache is not None:
+            self.disk_cache.set(key, value)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.disk_cache is not None:
+            self.disk_cache.clear()
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        # asyncio.to_thread copies the current context, so the bypass flag is preserved
+        return await asyncio.to_thread(self.lookup, prompt, llm_string)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        await asyncio.to_thread(self.update, prompt, llm_string, return_val)
+
+    async def aclear(self, **kwargs: Any) -> None:
+        await asyncio.to_thread(self.clear, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters for both tiers."""
+
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+@lru_cache()
+def get_llm_cache() -> Optional[TieredLLMCache]:
+    """
+    Returns the process-wide LLM response cache, or None when caching is disabled.
+    """
+
+    settings = get_settings()
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+
+    disk_cache = None
+    if settings.LLM_CACHE_PATH:
+        disk_cache = SQLiteTTLCache(
+            settings.LLM_CACHE_PATH,
+            table="llm_responses",
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES
+        )
+
+    return TieredLLMCache(
+        memory_max_entries=settings.LLM_CACHE_MEMORY_MAX_ENTRIES,
+        disk_cache=disk_cache
+    )
@@ -0,0 +1,253 @@
+from typing import Any, Dict, Iterable, List, Optional
+from functools import lru_cache
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from app.core.config import get_settings
+from app.core.log import get_logger
+from app.utils.context_packing import tokenize_terms
+
+logger = get_logger("local_index")
+
+
+def fts5_available() -> bool:
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE probe USING fts5(text)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+class LocalRetrievalIndex:
+    """
+    Persistent full-text index over the content earlier runs gathered (search snippets,
+    scraped search-result pages and reference pages), ranked with BM25 by SQLite FTS5.
+
+    Documents are keyed by (source_type, source): adding a source again replaces its text,
+    or only refreshes its age when the text is unchanged. Documents older than
+    `max_age_seconds` are dropped, and the oldest go first while the indexed text is over
+    `max_bytes`. Each document remembers the run that added its current text, so a run's
+    searches can leave out what it indexed itself.
+    """
+
+    def __init__(self, path: str, max_age_seconds: Optional[float] = 30 * 86400, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # One connection shared by all threads, serialized by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id INTEGER PRIMARY KEY, "
+            "source_type TEXT NOT NULL, "
+            "source TEXT NOT NULL, "
+            "content_hash TEXT NOT NULL, "
+            "bytes INTEGER NOT NULL, "
+            "added_at REAL NOT NULL, "
+            "run_id TEXT, "
+            "UNIQUE (source_type, source))"
+        )
+        # Index files created before documents were tagged with their run
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}
+        if "run_id" not in columns:
+            self._conn.execute("ALTER TABLE documents ADD COLUMN run_id TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_added_at ON documents (added_at)")
+        # Full-text rows share their rowid with `documents.id`
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(title, text, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+    def _cutoff(self, now: float) -> float:
+        return now - self.max_age_seconds if self.max_age_seconds is not None else float("-inf")
+
+    def add_documents(self, documents: Iterable[Dict[str, Any]], run_id: Optional[str] = None) -> int:
+        """
+        Adds or refreshes documents, each a dict with source_type, source, title and text.
+        New or changed documents are tagged with `run_id`; unchanged ones keep the run that added them.
+        Documents without text are ignored. Returns how many were added or changed.
+        """
+
+        now = time.time()
+        changed = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for document in documents:
+                    text = (document.get("text") or "").strip()
+                    if not text:
+                        continue
+
+                    encoded = text.encode("utf-8")
+                    content_hash = hashlib.sha256(encoded).hexdigest()
+                    row = self._conn.execute(
+                        "SELECT id, content_hash FROM documents WHERE source_type = ? AND source = ?",
+                        (document["source_type"], document["source"])
+                    ).fetchone()
+
+                    if row is not None and row[1] == content_hash:
+                        self._conn.execute("UPDATE documents SET added_at = ? WHERE id = ?", (now, row[0]))
+                        continue
+
+                    if row is not None:
+                        document_id = row[0]
+                        self._conn.execute(
+                            "UPDATE documents SET content_hash = ?, bytes = ?, added_at = ?, run_id = ? WHERE id = ?",
+                            (content_hash, len(encoded), now, run_id, document_id)
+                        )
+                        self._conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (document_id,))
+                    else:
+                        document_id = self._conn.execute(
+                            "INSERT INTO documents (source_type, source, content_hash, bytes, added_at, run_id) VALUES (?, ?, ?, ?, ?, ?)",
+                            (document["source_type"], document["source"], content_hash, len(encoded), now, run_id)
+                        ).lastrowid
+
+                    self._conn.execute(
+                        "INSERT INTO documents_fts (rowid, title, text) VALUES (?, ?, ?)",
+                        (document_id, document.get("title") or "", text)
+                    )
+                    changed += 1
+
+                self._evict(now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return changed
+
+    def _delete(self, document_ids: List[int]) -> None:
+        for start in range(0, len(document_ids), 500):
+            batch = document_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            self._conn.execute(f"DELETE FROM documents WHERE id IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM documents_fts WHERE rowid IN ({placeholders})", batch)
+        self.evictions += len(document_ids)
+
+    def _evict(self, now: float) -> None:
+        """Drops expired documents, then the oldest ones while over `max_bytes`. Caller holds the lock."""
+
+        expired = [row[0] for row in self._conn.execute("SELECT id FROM documents WHERE added_at < ?", (self._cutoff(now),))]
+        if expired:
+            self._delete(expired)
+
+        (total_bytes,) = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM documents").fetchone()
+        if total_bytes <= self.max_bytes:
+            return
+
+        oldest = []
+        for document_id, size in self._conn.execute("SELECT id, bytes FROM documents ORDER BY added_at ASC"):
+            if total_bytes <= self.max_bytes:
+                break
+            oldest.append(document_id)
+            total_bytes -= size
+        self._delete(oldest)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 8,
+        snippet_tokens: int = 64,
+        exclude_run_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` documents containing every (non-stopword) term of `query`,
+        best BM25 match first, each with a snippet of up to `snippet_tokens` tokens around the match.
+        Documents added by run `exclude_run_id` are left out.
+        """
+
+        terms = tokenize_terms(query)
+        if not terms:
+            return []
+        match_expression = " AND ".join(f'"{term}"' for term in dict.fromkeys(terms))
+
+        run_clause = ""
+        params: List[Any] = [max(1, min(snippet_tokens, 64)), match_expression, self._cutoff(time.time())]
+        if exclude_run_id is not None:
+            run_clause = "AND (d.run_id IS NULL OR d.run_id != ?) "
+            params.append(exclude_run_id)
+        params.append(limit)
+
+        with self._lock:
+            self.lookups += 1
+            rows = self._conn.execute(
+                "SELECT d.source_type, d.source, f.title, snippet(documents_fts, 1, '', '', ' ... ', ?), bm25(documents_fts, 2.0, 1.0) AS rank "
+                "FROM documents_fts AS f JOIN documents AS d ON d.id = f.rowid "
+                f"WHERE documents_fts MATCH ? AND d.added_at >= ? {run_clause}"
+                "ORDER BY rank LIMIT ?",
+                params
+            ).fetchall()
+            if rows:
+                self.hits += 1
+
+        return [
+            {"source_type": source_type, "source": source, "title": title, "snippet": snippet, "score": -rank}
+            for source_type, source, title, snippet, rank in rows
+        ]
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()
+            return count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM documents").fetchone()
+        return {
+            "documents": count,
+            "bytes": total_bytes,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "evictions": self.evictions,
+        }
+
+
+@lru_cache()
+def get_local_index() -> Optional[LocalRetrievalIndex]:
+    """
+    Returns the process-wide cross-run index, or None when it is disabled
+    or this Python's SQLite was built without FTS5.
+    """
+
+    settings = get_settings()
+    if not settings.LOCAL_INDEX_ENABLED:
+        return None
+    if not fts5_available():
+        logger.warning("SQLite FTS5 is not available; the local retrieval index is disabled.")
+        return None
+
+    return LocalRetrievalIndex(
+        settings.LOCAL_INDEX_PATH,
+        max_age_seconds=settings.LOCAL_INDEX_MAX_AGE_SECONDS,
+        max_bytes=settings.LOCAL_INDEX_MAX_BYTES
+    )
+
+
+async def index_documents(documents: List[Dict[str, Any]], run_id: Optional[str] = None) -> None:
+    """
+    Adds documents gathered by run `run_id` to the process-wide index off the event loop.
+    Indexing is best effort: failures are logged and never fail the calling node.
+    """
+
+    local_index = get_local_index()
+    if local_index is None or not documents:
+        return
+
+    try:
+        await asyncio.to_thread(local_index.add_documents, documents, run_id)
+    except Exception as e:
+        logger.warning("Could not update the local retrieval index: %s", e)
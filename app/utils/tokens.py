@@ -0,0 +1,15 @@
+import math
+
+# Rough average for English text with Gemini/GPT-style tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap, local token estimate (about 4 characters per token).
+    Used for budgeting and reporting; calling the provider's tokenizer would cost a network round trip.
+    """
+
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
@@ -0,0 +1,323 @@
+"""
+Worker processes for the durable job queue (worker mode, JOB_QUEUE_ENABLED=true).
+
+Usage:
+    python -m app.worker [--processes 4] [--concurrency 2]
+
+Each process takes jobs from the queue at JOB_QUEUE_PATH and runs the master orchestrator
+graph, at most --concurrency (default WORKER_CONCURRENCY) jobs at a time. A job's lease is
+renewed every third of JOB_QUEUE_LEASE_SECONDS while it runs; if the process dies, the lease
+runs out and another worker retries the job. Attempts that fail with an exception (transient
+LLM/HTTP errors) are retried with backoff up to JOB_QUEUE_MAX_ATTEMPTS times; with checkpointing,
+a retry continues from the last completed node instead of starting over. A run that finishes
+with an error state failed permanently and is not retried. The parent process restarts workers that exit unexpectedly.
+On SIGTERM or Ctrl-C, workers stop taking jobs and hand their running jobs back to the queue.
+"""
+
+from typing import Any, Dict, List, Optional, Set
+import argparse
+import asyncio
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import socket
+import sys
+import time
+
+# Seconds between sweeps of finished jobs older than JOB_RESULT_TTL_SECONDS
+PRUNE_INTERVAL_SECONDS = 60.0
+
+
+class RunReportedError(RuntimeError):
+    """
+    The graph finished, but its final state carries an `error_message`. Job runs raise from
+    nodes on transient (LLM/HTTP) failures, so an error state is a permanent one (e.g.
+    NO_SEARCH_QUERIES_PROVIDED): another attempt would fail the same way, so it is not retried.
+    """
+
+    def __init__(self, final_state: Dict[str, Any]):
+        super().__init__(final_state.get("error_message"))
+        self.final_state = final_state
+
+
+class QueueWorker:
+    """Runs leased jobs of the durable queue in this process, `concurrency` at a time."""
+
+    def __init__(
+        self,
+        queue: Any,
+        get_graph: Any,
+        worker_id: str,
+        concurrency: int = 2,
+        lease_seconds: float = 60.0,
+        poll_interval_seconds: float = 0.25,
+        retry_backoff_seconds: float = 5.0,
+        result_ttl_seconds: float = 3600,
+        checkpointing: bool = False,
+    ):
+        from app.core.log import get_logger
+
+        self.logger = get_logger("worker")
+        self.queue = queue
+        self.get_graph = get_graph
+        self.worker_id = worker_id
+        self.concurrency = max(concurrency, 1)
+        self.lease_seconds = lease_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.checkpointing = checkpointing
+
+        self._last_prune = 0.0
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Takes and runs jobs until `stop` is set, then hands running jobs back to the queue."""
+
+        running: Set[asyncio.Task] = set()
+        stop_waiter = asyncio.create_task(stop.wait())
+
+        try:
+            while not stop.is_set():
+                lease = None
+                if len(running) < self.concurrency:
+                    try:
+                        lease = await asyncio.to_thread(self.queue.claim, self.worker_id, self.lease_seconds)
+                    except Exception as e:
+                        self.logger.warning("Could not claim a job: %s", e)
+
+                if lease is not None:
+                    task = asyncio.create_task(self._execute(lease))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                    continue
+
+                if not running:
+                    await self._maybe_prune()
+                # Wake up for the next poll, a finished job (free slot) or shutdown
+                await asyncio.wait({stop_waiter, *running}, timeout=self.poll_interval_seconds, return_when=asyncio.FIRST_COMPLETED)
+
+        finally:
+            stop_waiter.cancel()
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+    async def _maybe_prune(self) -> None:
+        if time.monotonic() - self._last_prune < PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = time.monotonic()
+        try:
+            await asyncio.to_thread(self.queue.prune, self.result_ttl_seconds)
+        except Exception as e:
+            self.logger.warning("Could not prune finished jobs: %s", e)
+
+    async def _graph_input(self, lease: Any) -> Dict[str, Any]:
+        """
+        Decides how to (re)start the run: {"resume_config": ...} to continue from a checkpoint
+        (see `find_resume_config`; a run that ended with an error re-runs from its first failed step),
+        {"final_state": ...} when an earlier attempt already finished the graph cleanly,
+        else {"input": ...}.
+        """
+
+        from app.core.jobs import JobNotResumableError, find_resume_config, run_config
+
+        if self.checkpointing:
+            graph = self.get_graph()
+            try:
+                resume_config = await find_resume_config(graph, lease.job_id)
+            except JobNotResumableError:
+                # Finished by an attempt that did not get to record it
+                return {"final_state": (await graph.aget_state(run_config(lease.job_id))).values}
+            if resume_config is not None:
+                return {"resume_config": resume_config}
+
+        if lease.input is None:
+            raise RuntimeError(f"No checkpoint to resume run '{lease.job_id}' from.")
+        return {"input": lease.input}
+
+    async def _run_graph(self, lease: Any) -> Dict[str, Any]:
+        from app.core.jobs import stream_graph_progress
+
+        start = await self._graph_input(lease)
+        if "final_state" in start:
+            return start["final_state"]
+
+        final_state: Dict[str, Any] = {}
+        stream = stream_graph_progress(self.get_graph(), start.get("input"), lease.job_id, start.get("resume_config"))
+        async for kind, payload in stream:
+            if kind == "values":
+                final_state = payload
+                continue
+            await asyncio.to_thread(self.queue.add_event, lease.job_id, payload)
+
+        if final_state.get("error_message"):
+            raise RunReportedError(final_state)
+        return final_state
+
+    async def _heartbeat(self, lease: Any, run_task: asyncio.Task) -> None:
+        """Renews the lease until the run ends; cancels the run if the lease was lost."""
+
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(self.queue.heartbeat, lease.job_id, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                self.logger.warning("Could not renew job lease: %s", e, extra={"job_id": lease.job_id})
+                continue
+            if not renewed:
+                self.logger.warning("Lost the lease on a running job; abandoning it", extra={"job_id": lease.job_id})
+                run_task.cancel()
+                return
+
+    async def _execute(self, lease: Any) -> None:
+        self.logger.info("Job started", extra={"job_id": lease.job_id, "attempt": lease.attempt, "worker": self.worker_id})
+        started_at = time.perf_counter()
+
+        run_task = asyncio.create_task(self._run_graph(lease))
+        heartbeat = asyncio.create_task(self._heartbeat(lease, run_task))
+        try:
+            final_state = await asyncio.shield(run_task)
+        except asyncio.CancelledError:
+            run_task.cancel()
+            await asyncio.gather(run_task, return_exceptions=True)
+            if heartbeat.done():
+                # Cancelled because another worker owns the job now
+                return
+            # Worker shutdown: hand the job back without using up an attempt
+            await asyncio.to_thread(self.queue.release, lease.job_id, self.worker_id)
+            raise
+        except RunReportedError as e:
+            self.logger.warning(
+                "Job failed permanently; not retrying",
+                extra={"job_id": lease.job_id, "attempt": lease.attempt, "error_message": str(e)}
+            )
+            status = await asyncio.to_thread(
+                self.queue.fail, lease.job_id, self.worker_id, str(e), self.retry_backoff_seconds, e.final_state, False
+            )
+            self.logger.info("Job attempt recorded as failed", extra={"job_id": lease.job_id, "status": status})
+            return
+        except Exception as e:
+            self.logger.exception("Job attempt failed", extra={"job_id": lease.job_id, "attempt": lease.attempt})
+            status = await asyncio.to_thread(
+                self.queue.fail, lease.job_id, self.worker_id, str(e), self.retry_backoff_seconds
+            )
+            self.logger.info("Job attempt recorded as failed", extra={"job_id": lease.job_id, "status": status})
+            return
+        finally:
+            heartbeat.cancel()
+
+        if await asyncio.to_thread(self.queue.complete, lease.job_id, self.worker_id, final_state):
+            self.logger.info(
+                "Job completed",
+                extra={"job_id": lease.job_id, "duration_ms": round((time.perf_counter() - started_at) * 1000, 1)}
+            )
+
+
+async def serve(worker_id: str, concurrency: Optional[int] = None) -> None:
+    """Runs one worker process until SIGTERM/SIGINT."""
+
+    from app.core.config import get_settings
+    from app.core.job_queue import get_job_queue
+    from app.core.llm import get_llm
+    from app.core.log import configure_logging, get_logger
+    from app.graph.master_orchestrator_graph import get_compiled_master_orchestrator_graph
+    from app.tools.html_extractor import get_extraction_pool, shutdown_extraction_pool
+    from app.tools.http_client import close_http_client, get_http_client
+    from app.tools.search_executor import get_search_executor
+    from app.utils.blob_store import get_blob_store
+    from app.utils.checkpointer import get_checkpointer
+    from app.utils.local_index import get_local_index
+
+    settings = get_settings()
+    configure_logging()
+    logger = get_logger("worker")
+
+    # Same shared clients as the API process, built once before the first job
+    get_llm()
+    get_search_executor()
+    get_http_client()
+    get_extraction_pool()
+    get_blob_store()
+    get_checkpointer()
+    get_local_index()
+    get_compiled_master_orchestrator_graph()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    worker = QueueWorker(
+        get_job_queue(),
+        get_compiled_master_orchestrator_graph,
+        worker_id,
+        concurrency=concurrency or settings.WORKER_CONCURRENCY,
+        lease_seconds=settings.JOB_QUEUE_LEASE_SECONDS,
+        poll_interval_seconds=settings.JOB_QUEUE_POLL_INTERVAL_SECONDS,
+        retry_backoff_seconds=settings.JOB_QUEUE_RETRY_BACKOFF_SECONDS,
+        result_ttl_seconds=settings.JOB_RESULT_TTL_SECONDS,
+        checkpointing=settings.CHECKPOINT_ENABLED
+    )
+    logger.info("Worker ready", extra={"worker": worker_id, "concurrency": worker.concurrency})
+    try:
+        await worker.run(stop)
+    finally:
+        await close_http_client()
+        shutdown_extraction_pool()
+        logger.info("Worker stopped", extra={"worker": worker_id})
+
+
+def run_worker_process(concurrency: Optional[int] = None) -> None:
+    asyncio.run(serve(f"{socket.gethostname()}:{os.getpid()}", concurrency))
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Worker processes for the durable document generation job queue.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count).")
+    parser.add_argument("--concurrency", type=int, default=None, help="Jobs per process (default: WORKER_CONCURRENCY).")
+    args = parser.parse_args(argv)
+
+    if args.processes <= 1:
+        run_worker_process(args.concurrency)
+        return 0
+
+    from app.core.log import configure_logging, get_logger
+
+    configure_logging()
+    logger = get_logger("worker")
+
+    context = multiprocessing.get_context("spawn")
+    stopping = False
+
+    def start() -> multiprocessing.Process:
+        process = context.Process(target=run_worker_process, args=(args.concurrency,), daemon=False)
+        process.start()
+        return process
+
+    def stop(signum: int, frame: Any) -> None:
+        nonlocal stopping
+        stopping = True
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    processes = [start() for _ in range(args.processes)]
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Restart workers that exit unexpectedly until asked to stop
+    while not stopping:
+        multiprocessing.connection.wait([process.sentinel for process in processes], timeout=1.0)
+        for index, process in enumerate(processes):
+            if not process.is_alive() and not stopping:
+                logger.warning("Worker process exited; restarting it", extra={"pid": process.pid, "exitcode": process.exitcode})
+                processes[index] = start()
+
+    for process in processes:
+        process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import asyncio
+import operator
+from typing import Annotated, List, Optional, TypedDict
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+from app.core.jobs import JobNotResumableError, find_resume_config, run_config
+from app.schemas.document_schemas import merge_error_messages
+from app.utils.checkpointer import SQLiteCheckpointSaver
+
+
+class State(TypedDict, total=False):
+    topic: str
+    visited: Annotated[List[str], operator.add]
+    error_message: Annotated[Optional[str], merge_error_messages]
+
+
+def build_graph(checkpointer, calls, fail_in=(), error_in=()):
+    """research -> synthesize; `fail_in` nodes raise once, `error_in` nodes return an error state once."""
+
+    def node(name):
+        async def run(state):
+            calls.append(name)
+            if name in fail_in and calls.count(name) == 1:
+                raise RuntimeError(f"{name} failed")
+            if name in error_in and calls.count(name) == 1:
+                return {"visited": [name], "error_message": f"{name} error"}
+            return {"visited": [name]}
+        return run
+
+    graph = StateGraph(State)
+    graph.add_node("research", node("research"))
+    graph.add_node("synthesize", node("synthesize"))
+    graph.add_edge(START, "research")
+    graph.add_edge("research", "synthesize")
+    graph.add_edge("synthesize", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+@pytest.fixture
+def saver(tmp_path):
+    return SQLiteCheckpointSaver(str(tmp_path / "checkpoints.sqlite3"))
+
+
+def test_resumes_after_the_last_completed_node(saver):
+    calls = []
+    graph = build_graph(saver, calls, fail_in=("synthesize",))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(graph.ainvoke({"topic": "t"}, config=run_config("run-1")))
+
+    resume_config = asyncio.run(find_resume_config(graph, "run-1"))
+    final_state = asyncio.run(graph.ainvoke(None, config=resume_config))
+
+    assert calls == ["research", "synthesize", "synthesize"]
+    assert final_state["visited"] == ["research", "synthesize"]
+
+
+def test_survives_a_new_saver_on_the_same_file(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    calls = []
+    with pytest.raises(RuntimeError):
+        asyncio.run(build_graph(SQLiteCheckpointSaver(path), calls, fail_in=("synthesize",)).ainvoke(
+            {"topic": "t"}, config=run_config("run-1")
+        ))
+
+    # A restarted process sees the same checkpoints
+    graph = build_graph(SQLiteCheckpointSaver(path), calls)
+    snapshot = asyncio.run(graph.aget_state(run_config("run-1")))
+    assert snapshot.next == ("synthesize",)
+    assert snapshot.values["visited"] == ["research"]
+
+
+def test_error_state_reruns_the_last_step(saver):
+    calls = []
+    graph = build_graph(saver, calls, error_in=("synthesize",))
+
+    final_state = asyncio.run(graph.ainvoke({"topic": "t"}, config=run_config("run-1")))
+    assert final_state["error_message"] == "synthesize error"
+
+    resume_config = asyncio.run(find_resume_config(graph, "run-1"))
+    assert resume_config["configurable"].get("checkpoint_id")
+    final_state = asyncio.run(graph.ainvoke(None, config=resume_config))
+
+    assert calls == ["research", "synthesize", "synthesize"]
+    assert final_state.get("error_message") is None
+    assert final_state["visited"] == ["research", "synthesize"]
+
+
+def test_error_state_of_an_earlier_step_is_kept_and_reruns_that_step(saver):
+    calls = []
+    graph = build_graph(saver, calls, error_in=("research",))
+
+    final_state = asyncio.run(graph.ainvoke({"topic": "t"}, config=run_config("run-1")))
+    # The step after the failed one does not clear its error
+    assert final_state["error_message"] == "research error"
+    assert final_state["visited"] == ["research", "synthesize"]
+
+    resume_config = asyncio.run(find_resume_config(graph, "run-1"))
+    final_state = asyncio.run(graph.ainvoke(None, config=resume_config))
+
+    assert calls == ["research", "synthesize", "research", "synthesize"]
+    assert final_state.get("error_message") is None
+    assert final_state["visited"] == ["research", "synthesize"]
+
+
+def test_clean_and_unknown_runs_are_not_resumable(saver):
+    graph = build_graph(saver, [])
+    asyncio.run(graph.ainvoke({"topic": "t"}, config=run_config("run-1")))
+
+    with pytest.raises(JobNotResumableError):
+        asyncio.run(find_resume_config(graph, "run-1"))
+    assert asyncio.run(find_resume_config(graph, "unknown")) is None
+
+
+def test_unchanged_channel_values_are_stored_once(saver):
+    graph = build_graph(saver, [])
+    asyncio.run(graph.ainvoke({"topic": "t"}, config=run_config("run-1")))
+    asyncio.run(graph.ainvoke({"topic": "t"}, config=run_config("run-2")))
+
+    stats = saver.stats()
+    assert stats["runs"] == 2
+    # The topic (and identical lists) of both runs share content-addressed blobs
+    assert stats["blobs"] < stats["checkpoints"] * len(State.__annotations__)
+
+
+def test_gc_drops_expired_runs_and_unreferenced_blobs(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "checkpoints.sqlite3"), ttl_seconds=3600)
+    graph = build_graph(saver, [])
+    asyncio.run(graph.ainvoke({"topic": "t"}, config=run_config("run-1")))
+    assert saver.stats()["runs"] == 1
+
+    # Expire it afterwards: puts also trigger the GC, which would drop the run while it executes
+    saver.ttl_seconds = 0
+    result = saver.gc()
+    assert result["threads_deleted"] == 1
+    assert saver.stats() == {"runs": 0, "checkpoints": 0, "blobs": 0, "blob_bytes": 0}
+    assert asyncio.run(graph.aget_state(run_config("run-1"))).values == {}
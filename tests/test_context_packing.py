@@ -0,0 +1,58 @@
+from app.utils.context_packing import (
+    SOURCE_TYPE_REFERENCE,
+    SOURCE_TYPE_SEARCH,
+    SOURCE_TYPE_SEARCH_PAGE,
+    build_packed_context,
+)
+
+RELEVANT = "Grid storage batteries smooth solar output for utilities."
+FILLER = "The museum opened a new wing dedicated to medieval tapestries."
+
+
+def test_relevant_chunks_are_kept_within_the_budget():
+    references = [{"url": "https://a.example", "title": "Museum", "extracted_text": " ".join([FILLER] * 6)}]
+    pages = [{"url": "https://b.example", "title": "Storage", "extracted_text": RELEVANT}]
+    results = [{"query": "grid storage", "content_summary": f"{FILLER} {RELEVANT}"}]
+
+    packed = build_packed_context(results, references, "grid storage batteries", token_budget=60, chunk_tokens=20, search_page_texts=pages)
+
+    kept = {(chunk.source_type, chunk.text) for chunk in packed["selected_chunks"]}
+    assert (SOURCE_TYPE_SEARCH_PAGE, RELEVANT) in kept
+    assert all(RELEVANT in text for source_type, text in kept)
+    assert SOURCE_TYPE_REFERENCE not in {source_type for source_type, _ in kept}
+
+    stats = packed["stats"]
+    assert stats["chunks_total"] == len(packed["chunks"]) > stats["chunks_kept"]
+    assert stats["tokens_kept"] <= stats["token_budget"] == 60
+    assert "tapestries" not in packed["context"]
+
+
+def test_everything_fits_in_source_order_with_the_original_layout():
+    references = [{"url": "https://a.example", "title": "Museum", "extracted_text": FILLER}]
+    results = [{"query": "grid storage", "content_summary": RELEVANT}, {"query": "empty", "content_summary": ""}]
+
+    packed = build_packed_context(results, references, "grid storage", token_budget=1000)
+
+    assert [chunk.source_type for chunk in packed["selected_chunks"]] == [SOURCE_TYPE_SEARCH, SOURCE_TYPE_REFERENCE]
+    assert packed["context"] == (
+        "Information from Web Search Snippets: \n"
+        f"Source (Search Query: 'grid storage'):\n{RELEVANT}\n\n"
+        "Information from Scraped Reference URLs: \n"
+        f"Source (Reference URL: https://a.example, Title: 'Museum'):\n{FILLER}"
+    )
+
+
+def test_unpunctuated_text_is_split_into_chunk_sized_windows():
+    text = " ".join(["storage"] * 200)
+
+    packed = build_packed_context([], [{"url": "u", "extracted_text": text}], "storage", token_budget=10_000, chunk_tokens=50)
+
+    assert len(packed["chunks"]) > 1
+    assert all(chunk.tokens <= 50 for chunk in packed["chunks"])
+    assert " ".join(chunk.text for chunk in packed["selected_chunks"]) == text
+
+
+def test_empty_sources_give_an_empty_context():
+    packed = build_packed_context([{"query": "q", "content_summary": ""}], [], "topic", token_budget=100)
+
+    assert packed["context"] == "" and packed["selected_chunks"] == []
@@ -0,0 +1,66 @@
+import asyncio
+
+from app.agents.synthesis_nodes import deduplicate_sources
+from app.tools import html_extractor
+from app.utils.dedup import NearDuplicateFilter, deduplicate_texts
+
+SENTENCE = "Lithium iron phosphate cells dominate new grid storage installations this year."
+
+
+def test_exact_and_near_duplicates_are_flagged():
+    dedup_filter = NearDuplicateFilter(threshold=0.7)
+
+    assert not dedup_filter.is_duplicate(SENTENCE)
+    assert dedup_filter.is_duplicate(SENTENCE.upper())
+    assert dedup_filter.is_duplicate("Lithium iron phosphate cells dominate new grid storage installations this year!")
+    assert dedup_filter.is_duplicate("Lithium iron phosphate cells dominate new grid storage installations this decade.")
+    assert not dedup_filter.is_duplicate("Sodium ion chemistry remains a niche choice for stationary batteries today.")
+
+
+def test_short_units_are_only_dropped_on_exact_repeats():
+    dedup_filter = NearDuplicateFilter()
+
+    assert not dedup_filter.is_duplicate("Prices fell sharply.")
+    assert not dedup_filter.is_duplicate("Prices fell slightly.")
+    assert dedup_filter.is_duplicate("prices fell sharply")
+    assert dedup_filter.is_duplicate("...")
+
+
+def test_units_past_the_cap_are_kept_unchecked():
+    text = f"{SENTENCE} {SENTENCE} {SENTENCE}"
+
+    cleaned, stats = deduplicate_texts([text], NearDuplicateFilter(), max_units_per_text=2)
+    assert cleaned == [f"{SENTENCE} {SENTENCE}"]
+    assert stats["units_total"] == 3 and stats["units_removed"] == 1 and stats["units_unchecked"] == 1
+
+
+def test_full_pages_win_over_overlapping_snippets():
+    other = "Pumped hydro still provides most of the stored energy capacity worldwide."
+    references = [{"url": "https://a.example", "extracted_text": f"{SENTENCE} {other}"}]
+    pages = [{"url": "https://b.example", "extracted_text": f"{other} Flow batteries are being piloted at several utilities."}]
+    results = [{"query": "grid storage", "content_summary": SENTENCE}]
+
+    deduped_results, deduped_references, deduped_pages, stats = deduplicate_sources(results, references, pages)
+
+    assert deduped_references[0] == {"url": "https://a.example", "extracted_text": f"{SENTENCE} {other}"}
+    assert deduped_pages[0]["extracted_text"] == "Flow batteries are being piloted at several utilities."
+    assert deduped_results == [{"query": "grid storage", "content_summary": ""}]
+    assert stats["units_total"] == 5 and stats["units_removed"] == 2
+    # The inputs are left untouched
+    assert results[0]["content_summary"] == SENTENCE
+
+
+def test_deduplication_runs_in_the_extraction_pool(monkeypatch):
+    monkeypatch.setattr(html_extractor.get_settings(), "HTML_EXTRACTION_WORKERS", 1)
+    html_extractor.shutdown_extraction_pool()
+    results = [{"query": "q", "content_summary": SENTENCE}, {"query": "q", "content_summary": SENTENCE}]
+
+    try:
+        deduped, _, _, stats = asyncio.run(
+            html_extractor.run_in_extraction_pool(deduplicate_sources, results, [], [])
+        )
+    finally:
+        html_extractor.shutdown_extraction_pool()
+
+    assert [res["content_summary"] for res in deduped] == [SENTENCE, ""]
+    assert stats["units_removed"] == 1
@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.agents.scrapping_agent_nodes import fetch_and_extract_content
+from app.tools.html_extractor import extract_document
+from app.tools.http_cache import TRUNCATED_HEADER
+
+
+def build_pdf(text: str) -> bytes:
+    """A minimal one-page PDF showing `text`, with a correct cross-reference table."""
+
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return pdf
+
+
+class FakeClient:
+    """Stands in for CachingHTTPClient.get with a fixed response."""
+
+    def __init__(self, content: bytes, content_type: str, truncated: bool = False):
+        headers = {"content-type": content_type}
+        if truncated:
+            headers[TRUNCATED_HEADER] = "true"
+        self.response = httpx.Response(200, headers=headers, content=content, request=httpx.Request("GET", "https://a.example"))
+
+    async def get(self, url, max_bytes=None, allowed_content_types=None):
+        return self.response
+
+
+def test_plain_text_uses_the_declared_charset():
+    extracted = extract_document("Café   au\n\nlait".encode("latin-1"), "text/plain; charset=latin-1")
+    assert extracted["text"] == "Café au lait"
+    assert extracted["encoding"] == "latin-1"
+
+
+def test_pdf_text_is_extracted():
+    pytest.importorskip("pypdf")
+
+    extracted = extract_document(build_pdf("Grid storage report"), "application/pdf")
+    assert "Grid storage report" in extracted["text"]
+
+
+def test_truncated_html_is_still_extracted():
+    client = FakeClient(b"<html><body><p>Partial page", "text/html", truncated=True)
+
+    page = asyncio.run(fetch_and_extract_content("https://a.example", client))
+    assert page.truncated and page.error is None
+    assert page.extracted_text == "Partial page"
+
+
+def test_truncated_pdf_is_skipped_with_a_reason():
+    client = FakeClient(build_pdf("Grid storage report")[:200], "application/pdf", truncated=True)
+
+    page = asyncio.run(fetch_and_extract_content("https://a.example", client, defer_extraction=True))
+    assert page.truncated and page.extracted_text is None and page.content_ref is None
+    assert "not extracted" in page.error
+    assert page.bytes_downloaded == 200
@@ -0,0 +1,137 @@
+import asyncio
+import os
+
+import httpx
+
+from app.tools.http_cache import CACHE_STATUS_HEADER, CachingHTTPClient, DiskHTTPCache, freshness_lifetime
+
+
+class Origin:
+    """An httpx mock transport serving one response per URL and recording the requests."""
+
+    def __init__(self, headers=None, body=b"<p>body</p>"):
+        self.headers = {"content-type": "text/html", **(headers or {})}
+        self.body = body
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        etag = self.headers.get("etag")
+        if etag and request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"etag": etag, "cache-control": "max-age=60"})
+        return httpx.Response(200, headers=self.headers, content=self.body)
+
+
+def make_client(tmp_path, origin, max_bytes=1024 * 1024):
+    cache = DiskHTTPCache(str(tmp_path / "http"), max_bytes=max_bytes)
+    return CachingHTTPClient(httpx.AsyncClient(transport=httpx.MockTransport(origin)), cache)
+
+
+def fetch_statuses(client, url="https://a.example/page", requests=2, headers_per_request=None):
+    async def scenario():
+        statuses = []
+        for index in range(requests):
+            headers = headers_per_request[index] if headers_per_request else None
+            response = await client.get(url, headers=headers)
+            statuses.append((response.headers[CACHE_STATUS_HEADER], response.content))
+        return statuses
+
+    return asyncio.run(scenario())
+
+
+def test_freshness_lifetime():
+    assert freshness_lifetime({"cache-control": "max-age=120"}) == 120
+    assert freshness_lifetime({"cache-control": "no-cache, max-age=120"}) == 0
+    assert freshness_lifetime({"date": "Mon, 01 Jan 2024 00:00:00 GMT", "expires": "Mon, 01 Jan 2024 00:10:00 GMT"}) == 600
+    assert freshness_lifetime({"date": "Mon, 01 Jan 2024 00:00:00 GMT", "expires": "0"}) == 0
+    # Heuristic: a tenth of the time since the last modification
+    assert freshness_lifetime({"date": "Mon, 01 Jan 2024 10:00:00 GMT", "last-modified": "Mon, 01 Jan 2024 00:00:00 GMT"}) == 3600
+
+
+def test_fresh_entries_are_served_without_network(tmp_path):
+    origin = Origin({"cache-control": "max-age=60"})
+    client = make_client(tmp_path, origin)
+
+    assert fetch_statuses(client) == [("MISS", b"<p>body</p>"), ("HIT", b"<p>body</p>")]
+    assert len(origin.requests) == 1
+
+
+def test_stale_entries_are_revalidated_and_304_reuses_the_body(tmp_path):
+    origin = Origin({"etag": '"v1"', "cache-control": "max-age=0"})
+    client = make_client(tmp_path, origin)
+
+    statuses = fetch_statuses(client, requests=3)
+    assert statuses == [("MISS", b"<p>body</p>"), ("REVALIDATED", b"<p>body</p>"), ("HIT", b"<p>body</p>")]
+    assert origin.requests[1].headers["if-none-match"] == '"v1"'
+    assert len(origin.requests) == 2
+
+
+def test_vary_mismatch_is_a_miss(tmp_path):
+    origin = Origin({"cache-control": "max-age=60", "vary": "Accept-Language"})
+    client = make_client(tmp_path, origin)
+
+    statuses = fetch_statuses(
+        client,
+        requests=3,
+        headers_per_request=[{"Accept-Language": "en"}, {"Accept-Language": "en"}, {"Accept-Language": "de"}]
+    )
+    assert [status for status, _ in statuses] == ["MISS", "HIT", "MISS"]
+
+
+def test_eviction_drops_least_recently_used_entries_without_scanning(tmp_path, monkeypatch):
+    cache = DiskHTTPCache(str(tmp_path / "http"), max_bytes=25)
+
+    def no_listdir(path):
+        raise AssertionError("writes must not scan the cache directory")
+
+    async def scenario():
+        monkeypatch.setattr(os, "listdir", no_listdir)
+        await cache.set("https://a.example", {"status_code": 200}, b"a" * 10)
+        await cache.set("https://b.example", {"status_code": 200}, b"b" * 10)
+        assert await cache.get("https://a.example") is not None
+        await cache.set("https://c.example", {"status_code": 200}, b"c" * 10)
+        monkeypatch.undo()
+
+    asyncio.run(scenario())
+    assert asyncio.run(cache.get("https://b.example")) is None
+    assert asyncio.run(cache.get("https://a.example")) is not None
+    assert cache.stats() == {"entries": 2, "bytes": 20}
+
+    # A new instance rebuilds the index from the directory
+    assert DiskHTTPCache(str(tmp_path / "http"), max_bytes=25).stats() == {"entries": 2, "bytes": 20}
+
+
+def test_concurrent_writes_of_one_key_do_not_collide(tmp_path):
+    cache = DiskHTTPCache(str(tmp_path / "http"))
+    bodies = [bytes([65 + index]) * 200_000 for index in range(16)]
+
+    async def scenario():
+        await asyncio.gather(*(
+            cache.set("https://a.example", {"status_code": 200, "writer": index}, body)
+            for index, body in enumerate(bodies)
+        ))
+        return await cache.get("https://a.example")
+
+    metadata, body = asyncio.run(scenario())
+    assert body in bodies and metadata["status_code"] == 200
+    assert sorted(os.listdir(tmp_path / "http")) == sorted(
+        f"{DiskHTTPCache.cache_key('https://a.example')}{suffix}" for suffix in (".body", ".json")
+    )
+    assert cache.stats() == {"entries": 1, "bytes": 200_000}
+
+
+def test_failed_write_leaves_no_temp_file(tmp_path, monkeypatch):
+    cache = DiskHTTPCache(str(tmp_path / "http"))
+
+    def failing_replace(source, destination):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+    try:
+        asyncio.run(cache.set("https://a.example", {"status_code": 200}, b"body"))
+    except OSError:
+        pass
+    monkeypatch.undo()
+
+    assert os.listdir(tmp_path / "http") == []
+    assert asyncio.run(cache.get("https://a.example")) is None
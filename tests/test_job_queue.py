@@ -0,0 +1,227 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.job_queue import QueuedJobManager, SQLiteJobQueue
+from app.core.jobs import JOB_COMPLETED, JOB_FAILED, JOB_PENDING, JOB_RUNNING, JobNotResumableError
+from app.worker import QueueWorker
+
+
+class FakeGraph:
+    """Streams one node update and the final state, like the compiled master graph with `subgraphs=True`."""
+
+    def __init__(self, final_states):
+        self.final_states = list(final_states)
+        self.inputs = []
+
+    async def astream(self, graph_input, config, stream_mode, subgraphs):
+        self.inputs.append(graph_input)
+        final_state = self.final_states.pop(0)
+        if isinstance(final_state, Exception):
+            raise final_state
+        yield (), "updates", {"research": {"status_message": "researched", "iteration_count": 1}}
+        yield (), "values", final_state
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteJobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2)
+
+
+def make_worker(queue, graph, **kwargs):
+    return QueueWorker(queue, lambda: graph, "worker-1", lease_seconds=30, retry_backoff_seconds=0, **kwargs)
+
+
+def test_claim_leases_the_oldest_job_once(queue):
+    first = queue.enqueue({"topic": "a"})
+    queue.enqueue({"topic": "b"})
+
+    lease = queue.claim("w1", lease_seconds=30)
+    assert lease.job_id == first.job_id and lease.input == {"topic": "a"} and lease.attempt == 1
+    assert queue.get(first.job_id).status == JOB_RUNNING
+    assert queue.claim("w2", lease_seconds=30).job_id != first.job_id
+    assert queue.claim("w3", lease_seconds=30) is None
+
+
+def test_claim_prefers_tenants_with_fewer_running_jobs(queue):
+    queue.enqueue({"n": 1}, tenant_id="busy")
+    queue.enqueue({"n": 2}, tenant_id="busy")
+    quiet = queue.enqueue({"n": 3}, tenant_id="quiet")
+
+    queue.claim("w1", lease_seconds=30)
+    assert queue.claim("w2", lease_seconds=30).job_id == quiet.job_id
+
+
+def test_expired_lease_makes_the_job_visible_again(queue):
+    job = queue.enqueue({"topic": "a"})
+    queue.claim("w1", lease_seconds=0.01)
+    time.sleep(0.02)
+
+    lease = queue.claim("w2", lease_seconds=30)
+    assert lease.job_id == job.job_id and lease.attempt == 2
+    # The old owner can no longer report on the job
+    assert not queue.heartbeat(job.job_id, "w1", 30)
+    assert not queue.complete(job.job_id, "w1", {"final_document": "stale"})
+    assert queue.complete(job.job_id, "w2", {"final_document": "doc"})
+    assert queue.get(job.job_id).result == {"final_document": "doc"}
+
+
+def test_fail_retries_with_backoff_then_gives_up(queue):
+    job = queue.enqueue({"topic": "a"})
+
+    queue.claim("w1", lease_seconds=30)
+    assert queue.fail(job.job_id, "w1", "boom", retry_backoff_seconds=60) == JOB_PENDING
+    assert queue.claim("w1", lease_seconds=30) is None, "not visible before the backoff ends"
+
+    queue.fail(job.job_id, "w1", "ignored")  # no lease held
+    with queue._lock:
+        queue._conn.execute("UPDATE jobs SET available_at = 0 WHERE job_id = ?", (job.job_id,))
+    assert queue.claim("w1", lease_seconds=30).attempt == 2
+    assert queue.fail(job.job_id, "w1", "boom again", result={"error_message": "boom again"}) == JOB_FAILED
+
+    failed = queue.get(job.job_id)
+    assert failed.error == "boom again" and failed.result == {"error_message": "boom again"}
+
+
+def test_release_does_not_use_an_attempt(queue):
+    job = queue.enqueue({"topic": "a"})
+    queue.claim("w1", lease_seconds=30)
+    assert queue.release(job.job_id, "w1")
+    assert queue.claim("w2", lease_seconds=30).attempt == 1
+
+
+def test_requeue_only_finished_jobs(queue):
+    job = queue.enqueue({"topic": "a"})
+    with pytest.raises(JobNotResumableError):
+        queue.requeue(job.job_id)
+
+    queue.claim("w1", lease_seconds=30)
+    queue.complete(job.job_id, "w1", {})
+    assert queue.requeue(job.job_id).status == JOB_PENDING
+    assert queue.requeue("unknown") is None
+
+
+def test_events_progress_and_prune(queue):
+    job = queue.enqueue({"topic": "a"})
+    queue.add_event(job.job_id, {"node": "research", "status_message": "searching", "iteration_count": 2})
+
+    events = queue.events_after(job.job_id)
+    assert [event["node"] for _, event in events] == [None, "research"]
+    assert queue.events_after(job.job_id, events[-1][0]) == []
+    assert queue.get(job.job_id).status_message == "searching"
+    assert queue.get(job.job_id).iteration_count == 2
+
+    queue.claim("w1", lease_seconds=30)
+    queue.complete(job.job_id, "w1", {})
+    assert queue.prune(3600) == 0
+    assert queue.prune(0) == 1
+    assert queue.get(job.job_id) is None and queue.events_after(job.job_id) == []
+
+
+def test_worker_runs_jobs_for_a_waiting_manager(queue):
+    graph = FakeGraph([{"final_document": "doc", "error_message": None}])
+    manager = QueuedJobManager(queue, lambda: graph, poll_interval_seconds=0.01)
+    worker = make_worker(queue, graph, poll_interval_seconds=0.01)
+
+    async def scenario():
+        stop = asyncio.Event()
+        worker_task = asyncio.create_task(worker.run(stop))
+        try:
+            run_id, final_state = await asyncio.wait_for(manager.run({"topic": "a"}), timeout=5)
+            events = [event async for event in manager.subscribe(queue.get(run_id))]
+        finally:
+            stop.set()
+            await worker_task
+        return run_id, final_state, events
+
+    run_id, final_state, events = asyncio.run(scenario())
+    assert final_state["final_document"] == "doc"
+    assert [event["status"] for event in events if event.get("node") is None] == [JOB_PENDING, JOB_RUNNING, JOB_COMPLETED]
+    assert queue.get(run_id).iteration_count == 1
+
+
+def test_worker_retries_a_raising_attempt(queue):
+    graph = FakeGraph([RuntimeError("SYNTHESIS_LLM_INVOCATION_ERROR: timeout"), {"final_document": "doc"}])
+    worker = make_worker(queue, graph)
+    job = queue.enqueue({"topic": "a"})
+
+    asyncio.run(worker._execute(queue.claim(worker.worker_id, 30)))
+    assert queue.get(job.job_id).status == JOB_PENDING
+    assert queue.get(job.job_id).error == "SYNTHESIS_LLM_INVOCATION_ERROR: timeout"
+
+    asyncio.run(worker._execute(queue.claim(worker.worker_id, 30)))
+    assert queue.get(job.job_id).status == JOB_COMPLETED
+    assert queue.get(job.job_id).result["final_document"] == "doc"
+
+
+def test_error_state_fails_the_job_without_retrying(queue):
+    graph = FakeGraph([{"error_message": "NO_SEARCH_QUERIES_PROVIDED"}])
+    manager = QueuedJobManager(queue, lambda: graph, poll_interval_seconds=0.01)
+    worker = make_worker(queue, graph)
+
+    async def scenario():
+        run = asyncio.create_task(manager.run({"topic": "a"}))
+        lease = None
+        while lease is None:
+            lease = await asyncio.to_thread(queue.claim, worker.worker_id, 30)
+        await worker._execute(lease)
+        return await asyncio.wait_for(run, timeout=5)
+
+    run_id, final_state = asyncio.run(scenario())
+    job = queue.get(run_id)
+    assert job.status == JOB_FAILED and len(graph.inputs) == 1
+    assert final_state == {"error_message": "NO_SEARCH_QUERIES_PROVIDED"}
+    assert queue.claim(worker.worker_id, 30) is None
+
+
+def test_worker_fails_a_raising_run_and_manager_returns_an_error_state(queue):
+    graph = FakeGraph([RuntimeError("boom"), RuntimeError("boom")])
+    manager = QueuedJobManager(queue, lambda: graph, poll_interval_seconds=0.01)
+    worker = make_worker(queue, graph, poll_interval_seconds=0.01)
+
+    async def scenario():
+        stop = asyncio.Event()
+        worker_task = asyncio.create_task(worker.run(stop))
+        try:
+            return await asyncio.wait_for(manager.run({"topic": "a"}), timeout=5)
+        finally:
+            stop.set()
+            await worker_task
+
+    run_id, final_state = asyncio.run(scenario())
+    assert len(graph.inputs) == 2
+    assert queue.get(run_id).status == JOB_FAILED
+    assert final_state == {"topic": "a", "error_message": "boom"}
+
+
+def test_manager_submit_does_not_block_the_event_loop_while_the_queue_is_locked(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = SQLiteJobQueue(path)
+    manager = QueuedJobManager(queue, lambda: None)
+    # Another process (e.g. a worker) holding the write lock
+    other = SQLiteJobQueue(path)
+    other._conn.execute("BEGIN IMMEDIATE")
+
+    async def scenario():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        submit = asyncio.create_task(manager.submit({"topic": "a"}))
+        await asyncio.sleep(0.2)
+        ticks_while_locked = ticks
+
+        other._conn.execute("COMMIT")
+        job = await asyncio.wait_for(submit, timeout=5)
+        ticker.cancel()
+        return ticks_while_locked, job, await manager.get(job.job_id)
+
+    ticks_while_locked, job, stored = asyncio.run(scenario())
+    assert ticks_while_locked >= 5
+    assert stored.job_id == job.job_id and stored.status == JOB_PENDING
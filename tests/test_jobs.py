@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from app.core.jobs import (
+    JOB_COMPLETED,
+    JOB_PENDING,
+    JOB_RUNNING,
+    RAISE_NODE_ERRORS_CONFIG_KEY,
+    JobManager,
+    raises_node_errors,
+    run_config,
+    stream_graph_progress,
+)
+from app.core.scheduler import FairScheduler
+
+
+class GatedGraph:
+    """Streams one node update, then waits for `release` before returning the final state."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.started = 0
+
+    async def astream(self, graph_input, config, stream_mode, subgraphs):
+        self.started += 1
+        yield (), "updates", {"research": {"status_message": "researched", "iteration_count": 1}}
+        await self.release.wait()
+        yield (), "values", {"initial_topic": graph_input["initial_topic"], "error_message": None}
+
+
+def test_jobs_wait_for_a_scheduler_slot_under_their_tenant():
+    async def scenario():
+        graph = GatedGraph()
+        scheduler = FairScheduler(max_concurrency=1)
+        manager = JobManager(lambda: graph, scheduler=scheduler)
+
+        first = await manager.submit({"initial_topic": "a"}, "tenant-a")
+        second = await manager.submit({"initial_topic": "b"}, "tenant-b")
+        await asyncio.sleep(0.05)
+
+        statuses = (first.status, second.status, graph.started)
+        waiting = scheduler.stats()["waiting_by_tenant"]
+
+        graph.release.set()
+        await asyncio.wait_for(asyncio.gather(first.task, second.task), timeout=5)
+        return statuses, waiting, first, second
+
+    statuses, waiting, first, second = asyncio.run(scenario())
+    assert statuses == (JOB_RUNNING, JOB_PENDING, 1)
+    assert waiting == {"tenant-b": 1}
+    assert first.status == second.status == JOB_COMPLETED
+    assert second.tenant_id == "tenant-b"
+    assert second.result["initial_topic"] == "b"
+
+
+def test_cancelled_waiters_leave_the_scheduler_queue():
+    from app.core.metrics import GRAPH_RUNS_WAITING
+
+    async def scenario():
+        scheduler = FairScheduler(max_concurrency=1)
+        release = asyncio.Event()
+        running = asyncio.create_task(scheduler.run("tenant-a", release.wait))
+        waiting = asyncio.create_task(scheduler.run("tenant-b", release.wait))
+        await asyncio.sleep(0.01)
+        before = scheduler.stats()["waiting_by_tenant"]
+
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        after = scheduler.stats()
+        gauge = GRAPH_RUNS_WAITING.render()[-1]
+
+        release.set()
+        await running
+        return before, after, gauge
+
+    before, after, gauge = asyncio.run(scenario())
+    assert before == {"tenant-b": 1}
+    assert after["waiting"] == 0 and after["waiting_by_tenant"] == {}
+    assert gauge.endswith(" 0")
+
+
+class FailingSubgraph:
+    async def ainvoke(self, subgraph_input):
+        raise RuntimeError("search backend down")
+
+
+def test_phase_failures_are_error_states_unless_the_job_runner_asks_to_raise(monkeypatch):
+    from app.graph import master_orchestrator_graph
+    from app.schemas.document_schemas import ResearchState
+
+    monkeypatch.setattr(master_orchestrator_graph, "get_compiled_research_subgraph", lambda: FailingSubgraph())
+    state = ResearchState(initial_topic="a")
+
+    api_output = asyncio.run(master_orchestrator_graph.invoke_research_subgraph_node(state, run_config("run-1")))
+    assert api_output["error_message"] == "Research Sub-Graph Error: search backend down"
+
+    job_config = run_config("run-1")
+    job_config["configurable"][RAISE_NODE_ERRORS_CONFIG_KEY] = True
+    with pytest.raises(RuntimeError, match="search backend down"):
+        asyncio.run(master_orchestrator_graph.invoke_research_subgraph_node(state, job_config))
+
+
+def test_job_runs_stream_with_failing_nodes_raising():
+    class RecordingGraph:
+        async def astream(self, graph_input, config, stream_mode, subgraphs):
+            self.config = config
+            yield (), "values", {}
+
+    async def drain(graph, config=None):
+        return [item async for item in stream_graph_progress(graph, None, "run-1", config)]
+
+    graph = RecordingGraph()
+    asyncio.run(drain(graph))
+    assert raises_node_errors(graph.config) and graph.config["configurable"]["thread_id"] == "run-1"
+
+    resume_config = {"configurable": {"thread_id": "run-1", "checkpoint_id": "c1"}}
+    asyncio.run(drain(graph, resume_config))
+    assert raises_node_errors(graph.config) and graph.config["configurable"]["checkpoint_id"] == "c1"
+    assert not raises_node_errors(resume_config)
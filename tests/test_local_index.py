@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+import pytest
+
+from app.agents import research_agent_nodes
+from app.agents.research_agent_nodes import LOCAL_INDEX_SOURCE, perform_search_node, search_local_index
+from app.core.config import get_settings
+from app.schemas.document_schemas import ResearchState
+from app.utils import local_index
+from app.utils.local_index import LocalRetrievalIndex, fts5_available
+
+pytestmark = pytest.mark.skipif(not fts5_available(), reason="SQLite was built without FTS5")
+
+
+def document(source, text, source_type="search"):
+    return {"source_type": source_type, "source": source, "title": source, "text": text}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return LocalRetrievalIndex(str(tmp_path / "index.sqlite3"))
+
+
+def test_upsert_replaces_changed_text_and_refreshes_unchanged(index):
+    assert index.add_documents([document("a", "pumped hydro storage"), document("b", "flow battery chemistry")]) == 2
+    assert index.add_documents([document("a", "pumped hydro storage")]) == 0
+    assert index.add_documents([document("a", "compressed air storage"), document("c", "")]) == 1
+
+    assert len(index) == 2
+    assert index.search("pumped hydro") == []
+    assert [hit["source"] for hit in index.search("compressed air")] == ["a"]
+
+
+def test_documents_past_the_max_age_are_dropped(tmp_path):
+    index = LocalRetrievalIndex(str(tmp_path / "index.sqlite3"), max_age_seconds=0.05)
+    index.add_documents([document("old", "lithium battery recycling")])
+    time.sleep(0.1)
+
+    assert index.search("lithium battery") == []
+    index.add_documents([document("new", "sodium battery recycling")])
+    assert len(index) == 1 and index.stats()["evictions"] == 1
+
+
+def test_oldest_documents_go_first_when_over_max_bytes(tmp_path):
+    index = LocalRetrievalIndex(str(tmp_path / "index.sqlite3"), max_bytes=60)
+    index.add_documents([document("first", "grid storage " * 2)])
+    index.add_documents([document("second", "grid storage " * 2)])
+    index.add_documents([document("third", "grid storage " * 2)])
+
+    assert {hit["source"] for hit in index.search("grid storage")} == {"second", "third"}
+    assert index.stats()["bytes"] <= 60
+
+
+def test_queries_need_min_hits_to_be_answered_locally(index, monkeypatch):
+    monkeypatch.setattr(research_agent_nodes, "get_local_index", lambda: index)
+    monkeypatch.setattr(get_settings(), "LOCAL_INDEX_MIN_HITS", 2)
+    index.add_documents([document("a", "thermal storage in molten salt"), document("b", "molten salt thermal plants")])
+
+    local_results, remaining = search_local_index(["molten salt thermal", "hydrogen storage"])
+
+    assert [res["query"] for res in local_results] == ["molten salt thermal"]
+    assert sorted(local_results[0]["local_sources"]) == ["a", "b"]
+    assert local_results[0]["source"] == LOCAL_INDEX_SOURCE
+    assert remaining == ["hydrogen storage"]
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.queries = []
+
+    async def iter_queries(self, queries):
+        for index, query in enumerate(queries):
+            self.queries.append(query)
+            yield {"query": query, "index": index, "result": {"content_summary": f"web results for {query}", "links": []}}
+
+
+@pytest.mark.parametrize("bypass_local_index, web_queries", [(False, []), (True, ["molten salt thermal"])])
+def test_bypass_local_index_forces_web_search_independently_of_the_llm_cache(index, monkeypatch, bypass_local_index, web_queries):
+    executor = FakeExecutor()
+
+    async def no_indexing(documents, run_id=None):
+        pass
+
+    monkeypatch.setattr(research_agent_nodes, "get_local_index", lambda: index)
+    monkeypatch.setattr(research_agent_nodes, "get_search_executor", lambda: executor)
+    monkeypatch.setattr(research_agent_nodes, "index_documents", no_indexing)
+    monkeypatch.setattr(get_settings(), "LOCAL_INDEX_MIN_HITS", 1)
+    monkeypatch.setattr(get_settings(), "SEARCH_HIT_SCRAPE_ENABLED", False)
+    index.add_documents([document("a", "thermal storage in molten salt")])
+
+    state = ResearchState(
+        initial_topic="storage",
+        generated_search_queries=["molten salt thermal"],
+        bypass_llm_cache=False,
+        bypass_local_index=bypass_local_index
+    )
+    asyncio.run(perform_search_node(state))
+
+    assert executor.queries == web_queries
+
+
+def test_later_iterations_of_a_run_are_not_answered_from_its_own_documents(index, monkeypatch):
+    executor = FakeExecutor()
+    monkeypatch.setattr(research_agent_nodes, "get_local_index", lambda: index)
+    monkeypatch.setattr(local_index, "get_local_index", lambda: index)
+    monkeypatch.setattr(research_agent_nodes, "get_search_executor", lambda: executor)
+    monkeypatch.setattr(get_settings(), "LOCAL_INDEX_MIN_HITS", 1)
+    monkeypatch.setattr(get_settings(), "SEARCH_HIT_SCRAPE_ENABLED", False)
+
+    def iteration(queries, thread_id, iteration_count):
+        state = ResearchState(initial_topic="storage", generated_search_queries=queries, iteration_count=iteration_count)
+        return asyncio.run(perform_search_node(state, {"configurable": {"thread_id": thread_id}}))
+
+    iteration(["molten salt thermal"], "run-1", 1)
+    second = iteration(["thermal molten salt"], "run-1", 2)
+
+    assert executor.queries == ["molten salt thermal", "thermal molten salt"]
+    assert second["search_iteration_stats"][0]["queries_answered_locally"] == 0
+
+    other_run = iteration(["thermal molten salt"], "run-2", 1)
+    assert other_run["search_iteration_stats"][0]["queries_answered_locally"] == 1
+    assert len(executor.queries) == 2
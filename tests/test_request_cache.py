@@ -0,0 +1,167 @@
+import asyncio
+
+from app.core.request_cache import (
+    CACHE_BYPASS,
+    CACHE_COALESCED,
+    CACHE_HIT,
+    CACHE_MISS,
+    CACHE_STALE,
+    RequestResultCache,
+    make_request_cache_key,
+)
+
+
+class Runner:
+    """Counts executions; each returns the next value after `delay` seconds."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return f"value-{self.calls}"
+
+
+def expire(cache, key, seconds):
+    cache._entries[key].created_at -= seconds
+
+
+def test_concurrent_requests_share_one_execution():
+    cache = RequestResultCache()
+    runner = Runner(delay=0.05)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_run("k", runner) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert runner.calls == 1
+    assert {value for value, _ in results} == {"value-1"}
+    assert sorted(status for _, status in results) == [CACHE_COALESCED] * 4 + [CACHE_MISS]
+
+
+def test_fresh_hit_then_stale_result_refreshed_in_the_background():
+    cache = RequestResultCache(ttl_seconds=60, stale_seconds=60)
+    runner = Runner()
+
+    async def scenario():
+        first = await cache.get_or_run("k", runner)
+        hit = await cache.get_or_run("k", runner)
+        expire(cache, "k", 90)
+        stale = await cache.get_or_run("k", runner)
+        await asyncio.gather(*cache._background)
+        refreshed = await cache.get_or_run("k", runner)
+        return first, hit, stale, refreshed
+
+    first, hit, stale, refreshed = asyncio.run(scenario())
+    assert first == ("value-1", CACHE_MISS)
+    assert hit == ("value-1", CACHE_HIT)
+    assert stale == ("value-1", CACHE_STALE)
+    assert refreshed == ("value-2", CACHE_HIT)
+    assert runner.calls == 2
+
+
+def test_entries_past_the_stale_window_run_again():
+    cache = RequestResultCache(ttl_seconds=60, stale_seconds=60)
+    runner = Runner()
+
+    async def scenario():
+        await cache.get_or_run("k", runner)
+        expire(cache, "k", 121)
+        return await cache.get_or_run("k", runner)
+
+    assert asyncio.run(scenario()) == ("value-2", CACHE_MISS)
+
+
+def test_bypass_ignores_and_replaces_the_cached_result():
+    cache = RequestResultCache()
+    runner = Runner()
+
+    async def scenario():
+        await cache.get_or_run("k", runner)
+        bypassed = await cache.get_or_run("k", runner, bypass=True)
+        return bypassed, await cache.get_or_run("k", runner)
+
+    bypassed, hit = asyncio.run(scenario())
+    assert bypassed == ("value-2", CACHE_BYPASS)
+    assert hit == ("value-2", CACHE_HIT)
+
+
+def test_bypass_does_not_join_a_regular_in_flight_run():
+    cache = RequestResultCache()
+    cached_runner = Runner(delay=0.05)
+    fresh_runner = Runner(delay=0.05)
+
+    async def scenario():
+        regular = asyncio.create_task(cache.get_or_run("k", cached_runner))
+        await asyncio.sleep(0)
+        bypassed = await asyncio.gather(
+            cache.get_or_run("k", fresh_runner, bypass=True),
+            cache.get_or_run("k", fresh_runner, bypass=True)
+        )
+        return await regular, bypassed
+
+    regular, bypassed = asyncio.run(scenario())
+    assert regular == ("value-1", CACHE_MISS)
+    assert sorted(bypassed) == [("value-1", CACHE_BYPASS), ("value-1", CACHE_COALESCED)]
+    assert cached_runner.calls == 1 and fresh_runner.calls == 1
+
+
+def test_rejected_results_reach_the_caller_but_are_not_stored():
+    cache = RequestResultCache(is_cacheable=lambda value: value != "value-1")
+    runner = Runner()
+
+    async def scenario():
+        return [await cache.get_or_run("k", runner) for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [("value-1", CACHE_MISS), ("value-2", CACHE_MISS), ("value-2", CACHE_HIT)]
+
+
+def test_failed_execution_is_not_cached_and_not_left_in_flight():
+    cache = RequestResultCache()
+
+    async def failing():
+        raise RuntimeError("boom")
+
+    async def scenario():
+        try:
+            await cache.get_or_run("k", failing)
+        except RuntimeError:
+            pass
+        return await cache.get_or_run("k", Runner())
+
+    assert asyncio.run(scenario()) == ("value-1", CACHE_MISS)
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_least_recently_used_entries_are_dropped():
+    cache = RequestResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get_fresh("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get_fresh("b") is None
+    assert cache.get_fresh("a") == 1 and cache.get_fresh("c") == 3
+
+
+def test_get_fresh_and_put():
+    cache = RequestResultCache(ttl_seconds=60, is_cacheable=lambda value: bool(value[1]))
+
+    assert not cache.put("empty", ("run-1", {}))
+    assert cache.get_fresh("empty") is None
+    assert cache.put("k", ("run-2", {"final_document": "doc"}))
+    assert cache.get_fresh("k") == ("run-2", {"final_document": "doc"})
+
+    # Stale entries are left to get_or_run, which refreshes them
+    expire(cache, "k", 90)
+    assert cache.get_fresh("k") is None
+    assert cache.stats()[CACHE_HIT] == 1
+
+
+def test_cache_key_ignores_trivial_request_differences():
+    key = make_request_cache_key("Quantum  Computing", ["https://example.com/a", "https://example.com/b"])
+    assert make_request_cache_key('"quantum computing"', ["https://example.com/b", "https://example.com/a", " "]) == key
+    assert make_request_cache_key("quantum computing", []) != key
+    assert make_request_cache_key("Quantum  Computing", ["https://example.com/a", "https://example.com/b"], bypass_local_index=True) != key
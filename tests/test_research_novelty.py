@@ -0,0 +1,33 @@
+from app.agents import research_agent_nodes
+from app.agents.research_agent_nodes import measure_new_tokens
+from app.schemas.document_schemas import ScrapedPage
+
+
+def result(text):
+    return {"query": text[:10], "content_summary": text, "links": []}
+
+
+FIRST = result("Pumped hydro storage provides most of the grid scale storage capacity installed worldwide today.")
+SECOND = result("Lithium iron phosphate batteries dominate new utility scale battery installations in recent years.")
+PAGE = ScrapedPage(url="https://a.example", extracted_text="Flow batteries decouple power and energy capacity for long duration storage needs.")
+
+
+def test_later_iterations_only_process_their_own_texts(monkeypatch):
+    assert measure_new_tokens("run-1", [], [], [FIRST], []) > 0
+
+    added = []
+    original_add = research_agent_nodes.NoveltyTracker.add
+    monkeypatch.setattr(
+        research_agent_nodes.NoveltyTracker, "add", lambda self, texts: added.append(texts) or original_add(self, texts)
+    )
+
+    assert measure_new_tokens("run-1", [FIRST], [], [FIRST], []) == 0
+    assert measure_new_tokens("run-1", [FIRST, FIRST], [], [SECOND], [PAGE]) > 0
+    assert len(added) == 2 and all(len(texts) <= 2 for texts in added)
+
+
+def test_tracker_is_rebuilt_when_it_does_not_match_the_state():
+    # Another run id, or a node retried after the tracker already took in its results
+    measure_new_tokens("run-2", [], [], [FIRST, SECOND], [])
+    assert measure_new_tokens("run-2", [FIRST], [], [SECOND], []) > 0
+    assert measure_new_tokens("run-3", [FIRST, SECOND], [PAGE], [SECOND], [PAGE]) == 0
@@ -0,0 +1,65 @@
+import asyncio
+
+from app.agents import scrapping_agent_nodes
+from app.agents.scrapping_agent_nodes import extract_text_from_scraped_content_node
+from app.schemas.document_schemas import ResearchState, ScrapedPage
+from app.utils.blob_store import BlobStore
+
+
+def test_reference_pages_are_extracted_from_the_blob_store(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path / "blobs"))
+    indexed = []
+
+    async def fake_index_documents(documents, run_id=None):
+        indexed.extend(documents)
+
+    monkeypatch.setattr(scrapping_agent_nodes, "get_blob_store", lambda: store)
+    monkeypatch.setattr(scrapping_agent_nodes, "index_documents", fake_index_documents)
+
+    html = b"<html><head><title>Storage</title></head><body><p>Pumped hydro stores energy.</p></body></html>"
+    state = ResearchState(
+        initial_topic="energy storage",
+        scraped_content_from_references=[
+            ScrapedPage(url="https://a.example", content_ref=store.put(html), content_type="text/html"),
+            ScrapedPage(url="https://b.example", content_ref="0" * 64, content_type="text/html"),
+            ScrapedPage(url="https://c.example", error="HTTP Error: 404 - Not Found"),
+        ]
+    )
+
+    texts = asyncio.run(extract_text_from_scraped_content_node(state))["extracted_text_from_references"]
+
+    assert texts[0]["title"] == "Storage"
+    assert "Pumped hydro stores energy." in texts[0]["extracted_text"]
+    assert "no longer in the blob store" in texts[1]["error"]
+    assert texts[2]["error"].startswith("HTTP Error")
+    assert [document["source"] for document in indexed] == ["https://a.example"]
+
+
+def test_per_domain_cap_counts_pages_from_earlier_iterations(monkeypatch):
+    fetched = []
+
+    async def fake_fetch(url, client, defer_extraction=False):
+        fetched.append(url)
+        return ScrapedPage(url=url, extracted_text="text")
+
+    monkeypatch.setattr(scrapping_agent_nodes, "fetch_and_extract_content", fake_fetch)
+
+    async def scenario():
+        scraper = scrapping_agent_nodes.SearchHitScraper(
+            client=None,
+            already_fetched=["https://ref.example/a"],
+            already_scraped=["https://a.example/1"],
+            top_k=5,
+            max_pages_per_domain=2
+        )
+        scraper.submit([
+            {"url": "https://a.example/1"},
+            {"url": "https://a.example/2"},
+            {"url": "https://a.example/3"},
+            {"url": "https://ref.example/a"},
+            {"url": "https://ref.example/b"},
+        ])
+        return await scraper.results()
+
+    asyncio.run(scenario())
+    assert fetched == ["https://a.example/2", "https://ref.example/b"]
@@ -0,0 +1,219 @@
+import asyncio
+import time
+
+import pytest
+
+from app.tools.search_executor import SearchExecutor
+from app.tools.search_provider import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    CircuitBreaker,
+    MultiBackendSearch,
+    SearchRateLimitError,
+    SearchUnavailableError,
+    is_rate_limit_result,
+    is_rate_limit_signal,
+)
+
+
+class FakeBackend:
+    def __init__(self, summary="results", delay=0.0, error=None):
+        self.summary = summary
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def search(self, query):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {"content_summary": f"{self.summary} for {query}", "links": []}
+
+
+class RatelimitException(Exception):
+    pass
+
+
+def search(provider, query="q"):
+    return asyncio.run(provider.search(query))
+
+
+def test_rate_limit_signal_checks_errors_only():
+    assert is_rate_limit_signal(SearchRateLimitError("x"))
+    assert is_rate_limit_signal(RatelimitException("https://duckduckgo.com 202"))
+    assert is_rate_limit_signal(RuntimeError("429: rate limit exceeded"))
+    assert not is_rate_limit_signal(RuntimeError("connection reset"))
+    assert not is_rate_limit_signal("How API rate limits and throttling work")
+
+
+def test_rate_limit_result_matches_only_the_ddg_marker():
+    assert is_rate_limit_result("DuckDuckGoSearchException: https://html.duckduckgo.com/html 202 Ratelimit")
+    assert not is_rate_limit_result("Rate limiting: HTTP 429 responses and ratelimit headers explained")
+    assert not is_rate_limit_result(None)
+
+
+def test_results_about_rate_limiting_are_not_throttling():
+    backend = FakeBackend(summary="Token bucket rate limit algorithms and HTTP 429")
+    provider = MultiBackendSearch([("a", backend)], hedge_delay_seconds=0)
+
+    for _ in range(5):
+        assert "rate limit" in search(provider)["content_summary"]
+    assert provider.stats()["a"]["circuit"] == CIRCUIT_CLOSED
+    assert provider.stats()["a"]["rate_limited"] == 0
+
+
+def test_fails_over_to_the_next_backend():
+    broken = FakeBackend(error=RuntimeError("boom"))
+    healthy = FakeBackend(summary="second")
+    provider = MultiBackendSearch([("a", broken), ("b", healthy)], hedge_delay_seconds=0)
+
+    assert search(provider)["content_summary"].startswith("second")
+    assert broken.calls == 1 and healthy.calls == 1
+
+
+def test_rate_limited_marker_opens_the_circuit_and_skips_the_backend():
+    throttled = FakeBackend(summary="202 Ratelimit")
+    healthy = FakeBackend(summary="second")
+    provider = MultiBackendSearch(
+        [("a", throttled), ("b", healthy)], hedge_delay_seconds=0, cooldown_seconds=60, rate_limit_threshold=1
+    )
+
+    search(provider)
+    search(provider)
+    assert throttled.calls == 1
+    assert provider.stats()["a"]["circuit"] == CIRCUIT_OPEN
+
+
+def test_all_backends_rate_limited_raises_rate_limit_then_unavailable():
+    provider = MultiBackendSearch(
+        [("a", FakeBackend(error=RatelimitException("202"))), ("b", FakeBackend(summary="202 Ratelimit"))],
+        hedge_delay_seconds=0,
+        cooldown_seconds=60,
+        rate_limit_threshold=1
+    )
+
+    with pytest.raises(SearchRateLimitError):
+        search(provider)
+    with pytest.raises(SearchUnavailableError) as excinfo:
+        search(provider)
+    assert 59 < excinfo.value.retry_after <= 60
+
+
+def test_single_rate_limit_does_not_open_the_circuit():
+    breaker = CircuitBreaker(cooldown_seconds=60, rate_limit_threshold=2)
+
+    breaker.record_failure(rate_limited=True)
+    assert breaker.state() == CIRCUIT_CLOSED
+    breaker.record_failure(rate_limited=True)
+    assert breaker.state() == CIRCUIT_OPEN
+
+
+class FlakyBackend:
+    """Rate-limits the first `throttled_calls` calls, then answers."""
+
+    def __init__(self, throttled_calls=1):
+        self.throttled_calls = throttled_calls
+        self.calls = 0
+
+    def search(self, query):
+        self.calls += 1
+        if self.calls <= self.throttled_calls:
+            raise RatelimitException("https://duckduckgo.com 202 Ratelimit")
+        return {"content_summary": f"results for {query}", "links": []}
+
+
+@pytest.mark.parametrize("backend_count", [1, 2])
+def test_executor_retries_a_query_rate_limited_once(backend_count):
+    backends = [(f"b{i}", FlakyBackend()) for i in range(backend_count)]
+    provider = MultiBackendSearch(backends, hedge_delay_seconds=0, cooldown_seconds=30)
+    executor = SearchExecutor(provider, max_retries=3, backoff_base_seconds=0.01, backoff_max_seconds=0.05)
+
+    result = asyncio.run(executor.run_query("q"))
+    assert result["content_summary"] == "results for q"
+
+
+def test_executor_waits_out_open_circuits():
+    backend = FlakyBackend(throttled_calls=1)
+    provider = MultiBackendSearch(
+        [("a", backend)], hedge_delay_seconds=0, cooldown_seconds=0.1, rate_limit_threshold=1
+    )
+    executor = SearchExecutor(provider, max_retries=3, backoff_base_seconds=0.01, backoff_max_seconds=1.0)
+
+    result = asyncio.run(executor.run_query("q"))
+    assert result["content_summary"] == "results for q"
+    assert backend.calls == 2
+
+
+def test_hedges_a_slow_backend():
+    slow = FakeBackend(summary="slow", delay=0.5)
+    fast = FakeBackend(summary="fast")
+    provider = MultiBackendSearch([("a", slow), ("b", fast)], hedge_delay_seconds=0.05)
+
+    async def timed_search():
+        started_at = time.perf_counter()
+        result = await provider.search("q")
+        return result, time.perf_counter() - started_at
+
+    # Timed inside the loop: asyncio.run also waits for the losing call's thread
+    result, elapsed = asyncio.run(timed_search())
+    assert result["content_summary"].startswith("fast")
+    assert elapsed < 0.4
+
+
+def test_timeout_counts_as_failure():
+    provider = MultiBackendSearch(
+        [("a", FakeBackend(delay=0.3))], hedge_delay_seconds=0, timeout_seconds=0.05, failure_threshold=1
+    )
+
+    with pytest.raises(asyncio.TimeoutError):
+        search(provider)
+    assert provider.stats()["a"]["timeouts"] == 1
+    assert provider.stats()["a"]["circuit"] == CIRCUIT_OPEN
+
+
+def test_circuit_breaker_half_open_trial():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=0.05, max_cooldown_seconds=1)
+
+    breaker.record_failure()
+    assert breaker.state() == CIRCUIT_CLOSED
+    breaker.record_failure()
+    assert breaker.state() == CIRCUIT_OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state() == CIRCUIT_HALF_OPEN
+    trial = breaker.allow()
+    assert trial is not None
+    assert breaker.allow() is None, "only one trial call while half-open"
+
+    # A failed trial re-opens with a doubled cooldown
+    breaker.record_failure(trial)
+    assert breaker.state() == CIRCUIT_OPEN
+    assert breaker.open_until - time.monotonic() > 0.05
+
+    time.sleep(0.11)
+    trial = breaker.allow()
+    assert trial is not None
+    breaker.record_success(trial)
+    assert breaker.state() == CIRCUIT_CLOSED
+
+
+def test_only_the_trial_owner_can_release_or_fail_the_trial():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=0.05, max_cooldown_seconds=1)
+    earlier = breaker.allow()
+    breaker.record_failure(rate_limited=True)
+    breaker.record_failure(rate_limited=True)
+    time.sleep(0.06)
+
+    trial = breaker.allow()
+    assert trial is not None
+
+    # A call allowed before the circuit opened (e.g. a cancelled hedge) ends without touching the trial
+    breaker.release_trial(earlier)
+    breaker.record_failure(earlier)
+    assert breaker.state() == CIRCUIT_HALF_OPEN
+    assert breaker.allow() is None, "the trial is still in flight"
+
+    breaker.release_trial(trial)
+    assert breaker.allow() is not None